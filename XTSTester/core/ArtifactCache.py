@@ -0,0 +1,138 @@
+"""
+签名HAP/HSP产物缓存模块
+
+构建前对项目源码（跳过项目和模块根目录下的build、oh_modules等生成目录）、配置脚本改写后的
+build-profile.json5/app.json5、SDK版本、buildMode、包名、签名配置和构建工具配置
+计算指纹。构建完成后将签名的entry HAP、ohosTest HAP和sharedLibrary HSP存入
+ARTIFACT_CACHE_DIR/<指纹>；下一次指纹相同时直接恢复这些产物，跳过全部hvigor调用。
+
+使用方法:
+    from core.ArtifactCache import artifact_fingerprint, restore_artifacts, store_artifacts
+    fingerprint = artifact_fingerprint(ctx, "debug")
+    if not restore_artifacts(ctx, fingerprint):
+        ...  # hvigor构建
+        store_artifacts(ctx, fingerprint, artifact_paths)
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from core.ChangeDetection import tool_config_hash
+from utils import config
+from utils.config import ARTIFACT_CACHE_DIR
+from utils.file_lock import FileLock
+
+# 计算源码指纹时在项目根目录和模块根目录下跳过的生成目录（模块源码中同名的目录仍参与指纹）
+_GENERATED_DIRS = {"build", "oh_modules", "node_modules", ".hvigor", ".preview"}
+
+# 计算源码指纹时在任意层级跳过的目录
+_SKIP_DIRS = {".git", ".idea"}
+
+# 存在其中任一文件的目录为项目或模块的根目录
+_MODULE_ROOT_FILES = ("oh-package.json5", "build-profile.json5", "hvigorfile.ts", "hvigorfile.js")
+
+# 缓存中记录产物列表的清单文件
+_MANIFEST = "manifest.json"
+
+
+def artifact_fingerprint(ctx, build_mode):
+    """
+    返回项目构建输入的指纹
+
+    参数:
+        ctx: ProjectContext
+        build_mode: "debug"或"release"
+    """
+    digest = hashlib.sha256()
+    build_config = {
+        "sdk_version": config.selected_sdk_version,
+        "build_mode": build_mode,
+        "bundle_name": ctx.bundle_name,
+        "signing_config": ctx.signing_config,
+        "tool_config_hash": tool_config_hash()
+    }
+    # 项目目录既不是仓库根目录也不是子目录库时（如aki），构建可能引用项目目录外的源码
+    if ctx.project_dir != ctx.repo_dir and not ctx.sub_dir:
+        build_config["commit"] = ctx.commit
+    digest.update(json.dumps(build_config, sort_keys=True, default=str).encode("utf-8"))
+
+    for root, dirs, files in os.walk(ctx.project_dir):
+        is_module_root = root == ctx.project_dir or any(name in files for name in _MODULE_ROOT_FILES)
+        dirs[:] = sorted(d for d in dirs
+                         if d not in _SKIP_DIRS and not (is_module_root and d in _GENERATED_DIRS))
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            if not os.path.isfile(file_path):
+                continue
+            digest.update(os.path.relpath(file_path, ctx.project_dir).replace(os.sep, "/").encode("utf-8"))
+            file_digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    file_digest.update(chunk)
+            digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+def restore_artifacts(ctx, fingerprint):
+    """
+    将缓存的签名产物恢复到项目的构建输出目录
+
+    返回:
+        缓存命中并恢复成功时返回True，否则返回False（调用方执行hvigor构建）
+    """
+    cache_dir = os.path.join(ARTIFACT_CACHE_DIR, fingerprint)
+    manifest_path = os.path.join(cache_dir, _MANIFEST)
+    if not os.path.exists(manifest_path):
+        return False
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            artifacts = json.load(f)["artifacts"]
+        for artifact in artifacts:
+            target = ctx.path(artifact)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(os.path.join(cache_dir, artifact), target)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"从产物缓存恢复失败，将重新构建: {str(e)}")
+        return False
+
+    print(f"产物缓存命中 ({fingerprint[:12]})，已恢复 {len(artifacts)} 个签名包，跳过hvigor构建")
+    return True
+
+
+def store_artifacts(ctx, fingerprint, artifacts):
+    """
+    将构建好的签名产物存入缓存
+
+    参数:
+        ctx: ProjectContext
+        fingerprint: 构建前计算的指纹
+        artifacts: 产物相对项目目录的路径列表，不存在的产物会被忽略
+    """
+    artifacts = [artifact.replace(os.sep, "/") for artifact in artifacts if os.path.isfile(ctx.path(artifact))]
+    cache_dir = os.path.join(ARTIFACT_CACHE_DIR, fingerprint)
+    if not artifacts or os.path.exists(os.path.join(cache_dir, _MANIFEST)):
+        return
+
+    try:
+        os.makedirs(ARTIFACT_CACHE_DIR, exist_ok=True)
+        with FileLock(cache_dir + ".lock", timeout=600):
+            if os.path.exists(os.path.join(cache_dir, _MANIFEST)):
+                return
+            tmp_dir = os.path.join(ARTIFACT_CACHE_DIR, f".tmp-{uuid.uuid4().hex}")
+            try:
+                for artifact in artifacts:
+                    target = os.path.join(tmp_dir, artifact)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(ctx.path(artifact), target)
+                with open(os.path.join(tmp_dir, _MANIFEST), "w", encoding="utf-8") as f:
+                    json.dump({"library": ctx.library_name, "artifacts": artifacts}, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_dir, cache_dir)
+            finally:
+                if os.path.exists(tmp_dir):
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"签名产物已存入缓存 ({fingerprint[:12]})")
+    except Exception as e:
+        print(f"写入产物缓存失败: {str(e)}")
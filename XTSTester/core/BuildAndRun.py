@@ -3,200 +3,180 @@ import os
 import shutil
 import subprocess
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from colorama import  Fore
-from reports.ExtractTestDetails import extract_test_details, display_test_details
-from core.ModifyConfig import _run_config_scripts, _determine_repo_type_and_config
+from reports.ExtractTestDetails import display_test_details
+from reports.TestRunResult import TestRunResult
+from core.ModifyConfig import _run_config_scripts
 from reports.ReportGenerator import generate_reports
-from utils.config import PROJECT_DIR, ohpm_path, node_path, hvigor_path, get_release_mode
-from core.ReadExcel import get_repo_info
+from utils.config import ohpm_path, get_release_mode, get_test_sharding, get_rerun_failed, \
+    TEST_SHARD_MAX_DEVICES, GIT_SPARSE_CHECKOUT, OHPM_CACHE_ENABLED, OHPM_REGISTRY, OHPM_REGISTRY_MIRROR, \
+    ARTIFACT_CACHE_ENABLED, INSTALL_IF_CHANGED
+from core.ProjectContext import ProjectContext
+from core.CommandRunner import run_command, CommandAborted
+from core.TestProgress import TestProgressMonitor
+from core.FlakyTests import record_rerun_results
+from core.TestTimeouts import compute_test_timeouts, record_test_timings
+from core.DeviceInstalls import package_set_hash, installed_package_hash, record_installed_packages, \
+    forget_installed_packages
+from core.DevicePool import get_device_pool, hdc_command, DeviceAcquireTimeout
+from core.GitMirror import ensure_mirror, mirror_url
+from core.OhpmCache import dependency_hash, restore_dependencies, store_dependencies
+from core.ArtifactCache import artifact_fingerprint, restore_artifacts, store_artifacts
+from core.BuildPlan import BuildPlan
+from core.HvigorDaemon import get_hvigor_daemon_manager
+from core.RepoPrefetch import get_repo_prefetcher
+from core.RepoRegistry import get_repo_registry, resolve_head
+from core.TestSharding import partition_test_classes
+from reports.GenerateTestReport import load_class_times
+from utils.stage_timing import stage_timer, get_library_timings
+
+# 仓库目录 -> 锁，串行化同一仓库的克隆和更新
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
 
 
 def clone_and_build(library_name):
-    _, _, BUNDLE_NAME = _determine_repo_type_and_config()
     """克隆仓库并构建项目，返回测试结果"""
+    prepared = prepare_library(library_name)
+    if isinstance(prepared, TestRunResult):
+        return prepared
+    return run_library_tests(library_name, prepared)
+
+
+def prepare_library(library_name):
+    """
+    准备阶段：克隆、配置并构建库（包括XTS测试包），不占用设备
+
+    各步骤都基于ProjectContext中的项目目录执行，不修改进程的当前工作目录，
+    因此多个库可以在同一进程的不同线程中同时准备。
+
+    返回:
+        成功时返回ProjectContext；失败或没有测试用例时返回TestRunResult
+    """
+    ctx = None
+    daemon = None
     try:
-        # 准备工作
-        os.environ["GIT_CLONE_PROTECTION_ACTIVE"] = "false"
-        
-        # 从ReadExcel获取仓库信息
-        owner, name, sub_dir = get_repo_info(library_name)
-        
-        if not owner or not name:
+        # 从三方库目录获取仓库信息并构建上下文
+        with stage_timer(library_name, "catalog"):
+            ctx = ProjectContext.for_library(library_name)
+
+        if ctx is None:
             print(f"错误：无法获取库 {library_name} 的仓库信息")
             # 修改为返回error状态
-            return {"test_results": {"ErrorTestClass": [{"name": "errorTest", "status": "error", "time": "1ms", "error_message": "无法获取仓库信息"}]},
-                    "summary": {"total": 1, "passed": 0, "failed": 0, "error": 1, "ignored": 0, "total_time_ms": 1},
-                    "class_times": {"ErrorTestClass": 1}}
-            
-        print(f"获取到仓库信息: owner={owner}, name={name}, sub_dir={sub_dir}, bundle_name ={BUNDLE_NAME}")
-        
-        # 1. 创建并进入Libraries目录
-        libraries_dir = os.path.abspath(os.path.join(os.getcwd(), "Libraries"))
-        os.makedirs(libraries_dir, exist_ok=True)
-        os.chdir(libraries_dir)
-        
+            return TestRunResult.from_error(library_name, "无法获取仓库信息")
+
+        print(f"获取到仓库信息: owner={ctx.owner}, name={ctx.repo}, sub_dir={ctx.sub_dir}, "
+              f"bundle_name ={ctx.bundle_name}")
+
+        # 1. 创建Libraries目录
+        os.makedirs(ctx.libraries_dir, exist_ok=True)
+
         # 2. 克隆或更新仓库
-        _clone_repo(library_name)
-        
-        # 3. 进入项目目录
-        # 特殊处理aki库，需要进入到特定的单元测试目录
-        if name == "aki":
-            target_dir = os.path.join(name, "test", "platform", "ohos", "unittests")
-            print(Fore.YELLOW + f"检测到aki库，将进入特定目录: {target_dir}" + Fore.RESET)
-        else:
-            target_dir = name if not sub_dir else os.path.join(name, sub_dir)
-            
-        if not os.path.exists(target_dir):
-            raise FileNotFoundError(f"目标目录 {target_dir} 不存在")
-            
-        os.chdir(target_dir)
-        print(f"当前工作目录: {os.getcwd()}")
+        with stage_timer(library_name, "clone"):
+            _clone_repo(ctx)
+
+        # 3. 检查项目目录
+        if not os.path.exists(ctx.project_dir):
+            raise FileNotFoundError(f"目标目录 {ctx.project_dir} 不存在")
+
+        print(f"项目目录: {ctx.project_dir}")
 
         # 6.启动DevEco Studio
         # _start_deveco_studio()
 
         # 7.执行配置脚本
-        _run_config_scripts()
+        with stage_timer(library_name, "config"):
+            _run_config_scripts(ctx)
 
         # 8.安装ohpm依赖
-        _install_ohpm_dependencies()
-
-        # 根据用户选择决定是否执行release模式编译
+        with stage_timer(library_name, "ohpm install"):
+            _install_ohpm_dependencies(ctx)
 
-        if get_release_mode():
-            print(Fore.YELLOW + "正在执行release模式编译..." + Fore.RESET)
-            _build_release()
+        # 根据编译模式调整混淆规则，规则文件属于构建输入，需在计算产物指纹之前调整
+        release_mode = get_release_mode()
+        if release_mode:
+            _remove_keep_rules(ctx)
         else:
-            print(Fore.YELLOW + "执行debug模式编译..." + Fore.RESET)
-            # 检查并确保混淆规则文件包含必要的-keep规则
-            obfuscation_file = os.path.join("entry", "obfuscation-rules.txt")
-            if os.path.exists(obfuscation_file):
-                with open(obfuscation_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 获取当前库的依赖项
-                dependencies = _get_ohos_name(library_name)
-                
-                # 检查是否已包含必要的-keep规则
-                needs_update = False
-                for dep in dependencies:
-                    if f"-keep ./oh_modules/{dep}" not in content:
-                        needs_update = True
-                        break
-                
-                if needs_update:
-                    print(Fore.YELLOW + "添加必要的-keep规则到混淆文件..." + Fore.RESET)
-                    with open(obfuscation_file, 'a', encoding='utf-8') as f:
-                        for dep in dependencies:
-                            f.write(f"\n-keep\n./oh_modules/{dep}\n")
-            
-            # 执行debug模式构建
-            subprocess.run([
-                node_path,
-                hvigor_path,
-                "--sync",
-                "-p", "product=default",
-                "-p", "buildMode=debug",
-                "--analyze=normal",
-                "--parallel",
-                "--incremental",
-                "--daemon"
-            ], check=True)
-
-        # 9.构建项目
-        _build_project()
-
-        # 10.运行Hap
-        # run_hap()
+            _add_keep_rules(ctx)
 
-        # 11.运行XTS并获取测试结果
-        test_names = extract_test_names()
-        if test_names:
-            # 调用run_xts函数执行测试
-            output = run_xts(library_name)
-            extracted_data = extract_test_details(output)
-            return extracted_data
-        else:
+        # 源码和构建配置都没有变化时直接使用缓存的签名产物，跳过全部hvigor调用
+        fingerprint = None
+        with stage_timer(library_name, "artifact cache"):
+            if ARTIFACT_CACHE_ENABLED:
+                fingerprint = artifact_fingerprint(ctx, "release" if release_mode else "debug")
+            cache_hit = fingerprint is not None and restore_artifacts(ctx, fingerprint)
+
+        # 9.检查测试用例，没有可执行的测试时不再构建
+        if not extract_test_names(ctx.project_dir):
             print(Fore.RED + "未找到可执行的测试用例" + Fore.RESET)
             # 修改为返回error状态
-            return {"test_results": {"ErrorTestClass": [{"name": "noTestsFound", "status": "error", "time": "1ms", "error_message": "未找到可执行的测试用例"}]},
-                    "summary": {"total": 1, "passed": 0, "failed": 0, "error": 1, "ignored": 0, "total_time_ms": 1},
-                    "class_times": {"ErrorTestClass": 1}}
+            return TestRunResult.from_error(library_name, "未找到可执行的测试用例", "noTestsFound",
+                                            commit=ctx.commit)
+
+        # 10.构建项目和XTS测试包
+        if not cache_hit:
+            # 工程配置和依赖都已就绪，预热hvigor守护进程，该库的所有hvigor调用复用它
+            daemon = get_hvigor_daemon_manager().lease(ctx.project_dir, library_name)
+            daemon.warm_up()
+            daemon.wait_ready()
+            _build_all(ctx, "release" if release_mode else "debug", daemon.enabled)
+            if fingerprint is not None:
+                store_artifacts(ctx, fingerprint, _signed_artifacts(ctx))
+
+        # 11.运行Hap
+        # run_hap()
+        return ctx
 
     except subprocess.CalledProcessError as e:
         print(f"执行命令失败: {e}")
         # 修改为返回error状态而非passed状态
-        return {"test_results": {"ErrorTestClass": [{"name": "errorTest", "status": "error", "time": "1ms", "error_message": str(e)}]},
-                "summary": {"total": 1, "passed": 0, "failed": 0, "error": 1, "ignored": 0, "total_time_ms": 1},
-                "class_times": {"ErrorTestClass": 1}}
+        return TestRunResult.from_error(library_name, str(e), commit=ctx.commit if ctx else None)
     finally:
-        # Return to original working directory
-        os.chdir(PROJECT_DIR)
+        # 库准备完成后确定地关闭守护进程，不在库之间累积
+        if daemon is not None:
+            daemon.stop()
 
 
-
-def _install_ohpm_dependencies():
-    """安装ohpm依赖"""
-    ohpm_registries = "https://ohpm.openharmony.cn/ohpm/"
-    subprocess.run([ohpm_path, "install", "--all", "--registry", ohpm_registries, "--strict_ssl", "false"],
-                   check=True)
-
-def _build_project():
-    """构建项目"""
-    # 并行构建参数
-    build_args = ["--analyze=normal", "--parallel", "--incremental"]
-
-    # 同步项目
-    subprocess.run([node_path, hvigor_path,
-                    "--sync",
-                    "-p", "product=default",
-                    *build_args,
-                    "--no-daemon",
-                    ], check=True)
-
-    # 检查项目结构，确定是否存在sharedLibrary模块
-    has_shared_library = os.path.exists("sharedlibrary") or os.path.exists("sharedLibrary")
-    shared_library_name = None
-    
-    # 确定正确的sharedLibrary目录名称（大小写敏感）
-    if os.path.exists("sharedlibrary"):
-        shared_library_name = "sharedlibrary"
-    elif os.path.exists("sharedLibrary"):
-        shared_library_name = "sharedLibrary"
-    
-    print(f"检测到{'存在' if has_shared_library else '不存在'} sharedLibrary 模块")
-
-    # 根据项目结构选择构建命令
-    if has_shared_library:
-        # 构建包含sharedLibrary的项目
-        try:
-            subprocess.run([node_path, hvigor_path,
-                            "--mode", "module",
-                            "-p", f"module=entry@default,{shared_library_name}@default",
-                            "-p", "product=default",
-                            "-p", "requireDeviceType=phone",
-                            "assembleHap", "assembleHsp", *build_args, "--daemon"
-                            ], check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"警告: 构建sharedLibrary模块失败: {e}")
-            print("尝试仅构建entry模块...")
-            subprocess.run([node_path, hvigor_path,
-                            "--mode", "module",
-                            "-p", "module=entry@default",
-                            "-p", "product=default",
-                            "-p", "requireDeviceType=phone",
-                            "assembleHap", *build_args, "--daemon"
-                            ], check=True)
-    else:
-        # 构建不包含sharedLibrary的项目
-        subprocess.run([node_path, hvigor_path,
-                        "--mode", "module",
-                        "-p", "product=default",
-                        "assembleHap", *build_args, "--daemon"
-                        ], check=True)
-
-def _get_ohos_name(library_name):
+def run_library_tests(library_name, ctx):
+    """测试阶段：从设备池租用一台设备，安装并运行已构建好的XTS测试，返回TestRunResult"""
+    try:
+        with get_device_pool().lease() as serial:
+            print(f"库 {library_name} 使用设备: {serial or '默认设备'}")
+            # 调用run_xts函数执行测试，直接返回解析好的TestRunResult
+            return run_xts(ctx, serial)
+    except subprocess.CalledProcessError as e:
+        print(f"执行命令失败: {e}")
+        return TestRunResult.from_error(library_name, str(e), commit=ctx.commit)
+    except DeviceAcquireTimeout as e:
+        print(Fore.RED + f"库 {library_name} 没有租用到设备: {e}" + Fore.RESET)
+        return TestRunResult.from_error(library_name, str(e), commit=ctx.commit)
+
+
+def _install_ohpm_dependencies(ctx):
+    """安装ohpm依赖，依赖声明未变化时从共享的依赖缓存恢复"""
+    # 配置了本地registry镜像时优先使用，公共registry作为后备
+    ohpm_registries = ",".join(filter(None, [OHPM_REGISTRY_MIRROR, OHPM_REGISTRY]))
+
+    deps_hash = dependency_hash(ctx.project_dir, ohpm_registries) if OHPM_CACHE_ENABLED else None
+    if deps_hash and restore_dependencies(ctx.project_dir, deps_hash):
+        return
+
+    run_command([ohpm_path, "install", "--all", "--registry", ohpm_registries, "--strict_ssl", "false"],
+                "ohpm", ctx.library_name, cwd=ctx.project_dir)
+    if deps_hash:
+        store_dependencies(ctx.project_dir, deps_hash, ohpm_registries)
+
+def _find_shared_library_dir(project_dir):
+    """返回sharedLibrary模块的目录名（大小写敏感），不存在时返回None"""
+    for dir_name in ("sharedlibrary", "sharedLibrary"):
+        if os.path.exists(os.path.join(project_dir, dir_name)):
+            return dir_name
+    return None
+
+def _get_ohos_name(ctx):
     """获取oh-package.json5中的主模块名称"""
     try:
         # 特殊库处理 - 可以在这里添加特殊库的路径
@@ -205,10 +185,10 @@ def _get_ohos_name(library_name):
         }
         
         # 确定oh-package.json5路径
-        if library_name in special_libs:
-            package_path = os.path.join(os.getcwd(), special_libs[library_name])
+        if ctx.library_name in special_libs:
+            package_path = ctx.path(special_libs[ctx.library_name])
         else:
-            package_path = os.path.join(os.getcwd(), "oh-package.json5")
+            package_path = ctx.path("oh-package.json5")
             
         if not os.path.exists(package_path):
             return ""
@@ -226,208 +206,306 @@ def _get_ohos_name(library_name):
         print(f"获取oh-package.json5主模块名称失败: {e}")
         return ""
 
-def _build_release():
-    """构建项目为release模式"""
-    try:
-        # 1. 检查并修改混淆规则文件
-        obfuscation_file = os.path.join("entry", "obfuscation-rules.txt")
-        if os.path.exists(obfuscation_file):
-            with open(obfuscation_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            modified = False
-            new_lines = []
-            i = 0
-            while i < len(lines):
-                if (isinstance(lines[i], str) and lines[i].strip() == "-keep" and 
-                    i+1 < len(lines) and 
-                    isinstance(lines[i+1], str) and 
-                    lines[i+1].strip().startswith("./oh_modules/@ohos/")):
-                    # Skip both lines
-                    i += 2
-                    modified = True
-                else:
-                    new_lines.append(lines[i])
-                    i += 1
-            
-            if modified:
-                with open(obfuscation_file, 'w', encoding='utf-8') as f:
-                    f.writelines(new_lines)
-                print(Fore.YELLOW + "已移除obfuscation-rules.txt中的特定规则" + Fore.RESET)
+def _add_keep_rules(ctx):
+    """debug模式：确保混淆规则文件包含主模块的-keep规则"""
+    obfuscation_file = ctx.path("entry", "obfuscation-rules.txt")
+    if not os.path.exists(obfuscation_file):
+        return
+    with open(obfuscation_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # 获取当前库的主模块名称
+    ohos_name = _get_ohos_name(ctx)
+    dependencies = [ohos_name] if ohos_name else []
+
+    # 只追加尚未包含的-keep规则，保证重复运行时规则文件不变
+    missing = [dep for dep in dependencies if f"-keep\n./oh_modules/{dep}\n" not in content]
+    if missing:
+        print(Fore.YELLOW + "添加必要的-keep规则到混淆文件..." + Fore.RESET)
+        with open(obfuscation_file, 'a', encoding='utf-8') as f:
+            for dep in missing:
+                f.write(f"\n-keep\n./oh_modules/{dep}\n")
+
+def _remove_keep_rules(ctx):
+    """release模式：移除混淆规则文件中针对oh_modules/@ohos的-keep规则"""
+    obfuscation_file = ctx.path("entry", "obfuscation-rules.txt")
+    if not os.path.exists(obfuscation_file):
+        return
+    with open(obfuscation_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    modified = False
+    new_lines = []
+    i = 0
+    while i < len(lines):
+        if (lines[i].strip() == "-keep" and
+                i + 1 < len(lines) and
+                lines[i + 1].strip().startswith("./oh_modules/@ohos/")):
+            # Skip both lines
+            i += 2
+            modified = True
+        else:
+            new_lines.append(lines[i])
+            i += 1
 
-        # 2. release模式构建
-        try:
-            subprocess.run([
-                node_path,
-                hvigor_path,
-                "--sync",
-                "-p", "product=default",
-                "-p", "buildMode=release",
-                "--analyze=normal",
-                "--parallel",
-                "--incremental",
-                "--daemon"
-            ], check=True)
-        except subprocess.CalledProcessError as build_error:
-            # 检查错误信息是否包含armeabi-v7a不支持的提示
-            error_output = str(build_error.stderr) if build_error.stderr else ""
-            if "armeabi-v7a" in error_output or "armeabi-v7a" in str(build_error):
-                print(Fore.YELLOW + "检测到armeabi-v7a不支持错误，尝试自动修复..." + Fore.RESET)
-                # 导入并调用_comment_armeabi_v7函数
-                from ModifyConfig import _comment_armeabi_v7
-                _comment_armeabi_v7()
-                # 重新尝试构建
-                print(Fore.YELLOW + "正在重新尝试构建..." + Fore.RESET)
-                subprocess.run([
-                    node_path,
-                    hvigor_path,
-                    "--sync",
-                    "-p", "product=default",
-                    "-p", "buildMode=release",
-                    "--analyze=normal",
-                    "--parallel",
-                    "--incremental",
-                    "--daemon"
-                ], check=True)
-            else:
-                # 如果不是armeabi-v7a错误，则继续抛出异常
-                raise
+    if modified:
+        with open(obfuscation_file, 'w', encoding='utf-8') as f:
+            f.writelines(new_lines)
+        print(Fore.YELLOW + "已移除obfuscation-rules.txt中的特定规则" + Fore.RESET)
 
+def _build_all(ctx, build_mode, use_daemon=True):
+    """按构建计划用最少的hvigor调用构建应用、sharedLibrary和XTS测试包，不占用设备"""
+    plan = BuildPlan(build_mode, _find_shared_library_dir(ctx.project_dir), daemon=use_daemon)
+    try:
+        _run_build_plan(ctx, plan)
+    except subprocess.CalledProcessError as build_error:
+        # 检查错误信息是否包含armeabi-v7a不支持的提示
+        error_output = str(build_error.output) if build_error.output else ""
+        if build_mode != "release" or ("armeabi-v7a" not in error_output and "armeabi-v7a" not in str(build_error)):
+            raise
+        print(Fore.YELLOW + "检测到armeabi-v7a不支持错误，尝试自动修复..." + Fore.RESET)
+        from core.ModifyConfig import _comment_armeabi_v7
+        _comment_armeabi_v7(ctx)
+        # 重新尝试构建
+        print(Fore.YELLOW + "正在重新尝试构建..." + Fore.RESET)
+        _run_build_plan(ctx, plan)
+    if build_mode == "release":
         print(Fore.GREEN + "Release模式构建完成" + Fore.RESET)
 
-    except subprocess.CalledProcessError as e:
-        print(Fore.RED + f"Release模式构建失败: {e}" + Fore.RESET)
-        raise
-
-def run_xts(library_name=None):
-    """运行XTS测试套件，返回测试输出结果"""
-    _, _, BUNDLE_NAME = _determine_repo_type_and_config()
+def _run_build_plan(ctx, plan):
+    """执行构建计划，并将每次hvigor调用的耗时记入该库的阶段耗时"""
+    try:
+        plan.run(ctx.project_dir, ctx.library_name)
+    finally:
+        timings = get_library_timings(ctx.library_name)
+        for name, elapsed in plan.timings:
+            timings.add(f"hvigor {name}", elapsed)
+
+def run_xts(ctx, serial=None):
+    """
+    在设备上安装并运行XTS测试套件（测试包需已在准备阶段构建），返回TestRunResult
+
+    参数:
+        ctx: ProjectContext
+        serial: 目标设备序列号，None表示hdc默认设备
+    """
     try:
         # 获取原始库名
-        from core.ReadExcel import read_libraries_from_excel
-        libraries, original_name, urls = read_libraries_from_excel(library_name)
-        
-        # 1.同步项目
-        subprocess.run([
-            node_path, hvigor_path,
-            "--sync",
-            "-p", "product=default",
-            "--analyze=normal",
-            "--parallel",
-            "--incremental",
-            "--daemon"
-        ], check=True)
-
-        # 2.构建XTS工程
-        subprocess.run([
-            node_path, hvigor_path,
-            "--mode", "module",
-            "-p", "module=entry@default",
-            "-p", "isOhosTest=true",
-            "-p", "product=default",
-            "-p", "buildMode=test",
-            "assembleHap", "assembleHsp",
-            "--analyze=normal",
-            "--parallel",
-            "--incremental",
-            "--daemon"
-        ], check=True)
-
-        subprocess.run([
-            node_path, hvigor_path,
-            "--mode", "module",
-            "-p", "module=entry@ohosTest",
-            "-p", "isOhosTest=true",
-            "-p", "buildMode=test",
-            "assembleHap",
-            "--analyze=normal",
-            "--parallel,"
-            "--incremental",
-            "--daemon"
-        ], check=True)
-
-        # 3.运行XTS
-        tmp_dir = "data/local/tmp/24141c3f96304b23aec112d51ed45ca5"
-
-        # 卸载已有应用
-        subprocess.run(["hdc", "uninstall", BUNDLE_NAME], check=True)
-        
-        # 创建临时目录
-        subprocess.run(["hdc", "shell", "mkdir", tmp_dir], check=True)
-        
-        # 发送entry模块HAP文件
-        subprocess.run([
-            "hdc", "file", "send",
-            "entry\\build\\default\\outputs\\default\\entry-default-signed.hap",
-            tmp_dir
-        ], check=True)
-        
-        # 发送测试HAP文件
-        subprocess.run([
-            "hdc", "file", "send",
-            "entry\\build\\default\\outputs\\ohosTest\\entry-ohosTest-signed.hap",
-            tmp_dir
-        ], check=True)
-        
-        # 检查是否存在sharedLibrary模块
-        has_shared_library = False
-        shared_library_path = None
-        
-        # 检查不同大小写的sharedLibrary目录
-        if os.path.exists("sharedlibrary"):
-            shared_library_path = "sharedlibrary\\build\\default\\outputs\\default\\sharedlibrary-default-signed.hsp"
-            has_shared_library = os.path.exists(shared_library_path)
-        elif os.path.exists("sharedLibrary"):
-            shared_library_path = "sharedLibrary\\build\\default\\outputs\\default\\sharedLibrary-default-signed.hsp"
-            has_shared_library = os.path.exists(shared_library_path)
-        
-        # 如果存在sharedLibrary模块，发送HSP文件
-        if has_shared_library and shared_library_path:
-            print(f"检测到sharedLibrary模块，发送HSP文件: {shared_library_path}")
-            try:
-                subprocess.run([
-                    "hdc", "file", "send",
-                    shared_library_path,
-                    tmp_dir
-                ], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"警告: 发送sharedLibrary HSP文件失败: {e}")
-        
-        # 安装应用
-        subprocess.run(["hdc", "shell", "bm", "install", "-p", tmp_dir], check=True)
-        
-        # 清理临时目录
-        subprocess.run(["hdc", "shell", "rm", "-rf", tmp_dir], check=True)
+        original_name = ctx.library_name
+
+        # 3.安装XTS
+        _install_on_device(ctx, serial)
 
         # 4.提取并运行测试
-        test_names = extract_test_names()
+        test_names = extract_test_names(ctx.project_dir)
         print(f"测试名称: {test_names}")
         if test_names:
-            output = run_in_new_cmd(test_names, original_name)  # 使用original_name
-            
-            # 修改这里，直接传递原始输出字符串，不调用display_test_tree
-            # display_test_tree(output)
-            
-            # 从输出中提取测试结果并显示
-            extracted_data = extract_test_details(output)
-            test_results = extracted_data["test_results"]
-            summary = extracted_data["summary"]
-            class_times = extracted_data["class_times"]
-            
+            if get_test_sharding() and len(test_names) > 1:
+                run_result = _run_sharded(test_names, ctx, serial)
+            else:
+                run_result = run_in_new_cmd(test_names, ctx, serial)  # 使用original_name
+
             # 使用ExtractTestDetails.py中的函数显示测试树
-            display_test_details(test_results, summary, class_times)
-            
-            return output
+            display_test_details(run_result.test_results(), run_result.summary(), run_result.class_times())
+
+            return run_result
         else:
             print(Fore.RED + "未找到可执行的测试用例" + Fore.RESET)
-            return ""
+            return TestRunResult(original_name, commit=ctx.commit)
 
     except subprocess.CalledProcessError as e:
         print(f"XTS测试失败: {e}")
-        return f"XTS测试失败: {e}"  # 返回错误信息
+        return TestRunResult.from_error(original_name, f"XTS测试失败: {e}", commit=ctx.commit)  # 返回错误信息
+
+def _signed_artifacts(ctx):
+    """返回安装到设备所需的签名包（相对项目目录的路径）"""
+    artifacts = [
+        os.path.join("entry", "build", "default", "outputs", "default", "entry-default-signed.hap"),
+        os.path.join("entry", "build", "default", "outputs", "ohosTest", "entry-ohosTest-signed.hap")
+    ]
+    shared_library_name = _find_shared_library_dir(ctx.project_dir)
+    if shared_library_name:
+        artifacts.append(os.path.join(shared_library_name, "build", "default", "outputs",
+                                      "default", f"{shared_library_name}-default-signed.hsp"))
+    return artifacts
+
+def _install_on_device(ctx, serial):
+    """
+    将entry、ohosTest（以及sharedLibrary）包安装到指定设备
+
+    签名包的内容与设备上记录的已安装版本相同且应用仍在设备上时，只清除应用数据，
+    跳过卸载、发送和安装；否则卸载旧版本，并发发送所有包后一次安装。
+    """
+    tmp_dir = "data/local/tmp/24141c3f96304b23aec112d51ed45ca5"
+
+    library_name = ctx.library_name
+    timings = get_library_timings(library_name)
+
+    # sharedLibrary模块的HSP只在构建成功时存在
+    packages = [ctx.path(artifact) for artifact in _signed_artifacts(ctx)]
+    shared_library_path = next((package for package in packages if package.endswith(".hsp")), None)
+    if shared_library_path and not os.path.exists(shared_library_path):
+        packages.remove(shared_library_path)
+        shared_library_path = None
 
-def run_in_new_cmd(test_names, library_name):
-    _, _, BUNDLE_NAME = _determine_repo_type_and_config()
+    packages_hash = None
+    if INSTALL_IF_CHANGED:
+        try:
+            packages_hash = package_set_hash(packages)
+        except OSError as e:
+            print(f"计算签名包哈希失败，将重新安装: {str(e)}")
+        if packages_hash and installed_package_hash(serial, ctx.bundle_name) == packages_hash \
+                and _is_bundle_installed(ctx, serial):
+            print(f"设备 {serial or '默认设备'} 上已安装相同的签名包，跳过安装")
+            # 保持与重新安装一致的干净状态
+            run_command(hdc_command(serial, "shell", "bm", "clean", "-n", ctx.bundle_name, "-d"), "hdc",
+                        library_name, check=False)
+            return
+        # 设备上的安装状态在安装成功前不确定
+        forget_installed_packages(serial, ctx.bundle_name)
+
+    # 卸载已有应用
+    with timings.measure("hdc uninstall"):
+        run_command(hdc_command(serial, "uninstall", ctx.bundle_name), "hdc", library_name)
+    
+    # 清理并创建临时目录，避免上次残留的包被一起安装
+    run_command(hdc_command(serial, "shell", f"rm -rf {tmp_dir} && mkdir -p {tmp_dir}"), "hdc", library_name)
+    
+    # 并发发送entry HAP、测试HAP和sharedLibrary HSP，共用同一个hdc server连接
+    if shared_library_path:
+        print(f"检测到sharedLibrary模块，发送HSP文件: {shared_library_path}")
+    with timings.measure("hdc send"), ThreadPoolExecutor(max_workers=len(packages)) as executor:
+        futures = {executor.submit(run_command, hdc_command(serial, "file", "send", package, tmp_dir),
+                                   "hdc", library_name): package
+                   for package in packages}
+        for future, package in futures.items():
+            try:
+                future.result()
+            except subprocess.CalledProcessError as e:
+                if package != shared_library_path:
+                    raise
+                print(f"警告: 发送sharedLibrary HSP文件失败: {e}")
+                packages_hash = None
+    
+    # 安装应用
+    with timings.measure("hdc install"):
+        run_command(hdc_command(serial, "shell", "bm", "install", "-p", tmp_dir), "hdc", library_name)
+    
+    # 清理临时目录
+    run_command(hdc_command(serial, "shell", "rm", "-rf", tmp_dir), "hdc", library_name)
+
+    if packages_hash:
+        record_installed_packages(serial, ctx.bundle_name, packages_hash, library_name)
+
+def _is_bundle_installed(ctx, serial):
+    """设备上是否安装了该应用（安装记录可能因设备被重置或手动卸载而过期）"""
+    result = run_command(hdc_command(serial, "shell", "bm", "dump", "-n", ctx.bundle_name), "hdc",
+                         ctx.library_name, check=False, echo=False)
+    output = result.output.strip()
+    return result.returncode == 0 and ctx.bundle_name in output and not output.lower().startswith("error")
+
+def _run_sharded(test_names, ctx, serial):
+    """
+    将测试类按历史耗时分片，在多台设备上并行运行后合并结果并生成报告
+
+    除当前库已租用的设备外，只借用设备池中空闲的设备；没有空闲设备时退化为单设备运行。
+    """
+    pool = get_device_pool()
+    max_shards = min(len(test_names), TEST_SHARD_MAX_DEVICES or len(pool))
+
+    # 借用空闲设备，不等待其他库释放
+    serials = [serial]
+    while len(serials) < max_shards:
+        extra_serial = pool.acquire(timeout=0)
+        if extra_serial is False:
+            break
+        serials.append(extra_serial)
+
+    try:
+        if len(serials) == 1:
+            print("没有空闲设备可用于分片，在单台设备上运行所有测试类")
+            return run_in_new_cmd(test_names, ctx, serial)
+
+        shards = partition_test_classes(test_names, load_class_times(ctx.library_name), len(serials))
+        for shard_serial, shard_names in zip(serials, shards):
+            print(f"分片 {shard_serial or '默认设备'}: {', '.join(shard_names)}")
+
+        def run_shard(shard_serial, shard_names):
+            # 额外借用的设备需要先安装测试包
+            if shard_serial != serial:
+                _install_on_device(ctx, shard_serial)
+            return _run_test_classes(shard_names, ctx, shard_serial)
+
+        shard_results = []
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(run_shard, shard_serial, shard_names)
+                       for shard_serial, shard_names in zip(serials, shards)]
+            for future, shard_serial in zip(futures, serials):
+                try:
+                    shard_results.append(future.result())
+                except subprocess.CalledProcessError as e:
+                    print(f"分片 {shard_serial} 执行失败: {e}")
+                    shard_results.append(TestRunResult.from_error(ctx.library_name, f"分片执行失败: {e}",
+                                                                  commit=ctx.commit))
+
+        # 合并各分片结果，在当前库的设备上重跑失败的测试类后只生成一次报告
+        run_result = TestRunResult.merge(ctx.library_name, shard_results)
+        _rerun_failed_classes(run_result, ctx, serial)
+        generate_reports(test_names, run_result, ctx.library_name)
+        return run_result
+    finally:
+        for extra_serial in serials[1:]:
+            pool.release(extra_serial)
+
+def run_in_new_cmd(test_names, ctx, serial=None):
+    """在设备上运行测试类、解析输出并生成该库的测试报告，返回TestRunResult"""
+    # 解析一次测试输出，结果在报告生成和调用方之间共享
+    run_result = _run_test_classes(test_names, ctx, serial)
+    _rerun_failed_classes(run_result, ctx, serial)
+
+    # 生成测试报告
+    generate_reports(test_names, run_result, ctx.library_name)
+
+    return run_result
+
+def _rerun_failed_classes(run_result, ctx, serial=None):
+    """
+    在已安装的包上重跑失败的测试类（最多get_rerun_failed()次），结果合并到run_result
+
+    重跑通过的测试标记为flaky，报告中同时显示首次和最终状态，分类累计记录到FlakyTests。
+    库级错误（如设备断开）不重跑。
+    """
+    attempts = get_rerun_failed()
+    if not attempts or "ErrorTestClass" in run_result.classes:
+        return
+    for attempt in range(1, attempts + 1):
+        failed_classes = run_result.failed_classes()
+        if not failed_classes:
+            break
+        print(Fore.YELLOW + f"第 {attempt}/{attempts} 次重跑失败的测试类: {', '.join(failed_classes)}" + Fore.RESET)
+        try:
+            rerun_result = _run_test_classes(failed_classes, ctx, serial)
+        except subprocess.CalledProcessError as e:
+            print(f"重跑失败的测试类时出错: {e}")
+            break
+        run_result.apply_rerun(rerun_result)
+        if "ErrorTestClass" in rerun_result.classes:
+            break
+
+    flaky_count = record_rerun_results(ctx.library_name, run_result)
+    if flaky_count:
+        print(Fore.YELLOW + f"{flaky_count} 个测试重跑后通过，已标记为flaky: "
+              + ", ".join(f"{class_name}.{test_name}" for class_name, test_name in run_result.flaky_tests())
+              + Fore.RESET)
+
+def _run_test_classes(test_names, ctx, serial=None):
+    """
+    通过aa test在设备上运行指定的测试类，返回解析后的TestRunResult（不生成报告）
+
+    输出边读边解析并打印每个测试的进度；测试类超过时间预算或设备断开时提前终止，
+    保留已经完成的测试结果。
+    """
+    library_name = ctx.library_name
     test_classes = ",".join(test_names)
     print(f"Running tests: {test_classes}")
 
@@ -436,7 +514,7 @@ def run_in_new_cmd(test_names, library_name):
 
     # 首先检查并修正TestRunner目录
     # 查找TestRunner目录的实际名称
-    search_dir = os.path.join("entry", "src", "ohosTest", "ets")
+    search_dir = ctx.path("entry", "src", "ohosTest", "ets")
     runner_dir = None
 
     if os.path.exists(search_dir):
@@ -452,7 +530,7 @@ def run_in_new_cmd(test_names, library_name):
         print(f"未找到TestRunner目录，使用默认值: {runner_dir}")
 
     # 定义module.json5文件路径
-    module_json5_path = os.path.join("entry", "src", "ohosTest", "module.json5")
+    module_json5_path = ctx.path("entry", "src", "ohosTest", "module.json5")
 
     # 检查并读取module.json5文件
     if os.path.exists(module_json5_path):
@@ -471,35 +549,44 @@ def run_in_new_cmd(test_names, library_name):
         print(f"警告： 未找到module.json5文件，使用默认的module名称： entry_test")
         module_name = "entry_test"
 
+    # 用例超时和测试类时间预算按历史耗时计算
+    timeout_ms, class_budgets = compute_test_timeouts(library_name, test_names)
+
     # 使用检测到的路径执行测试
-    cmd = (f'hdc shell aa test -b {BUNDLE_NAME} -m {module_name} '
-           f'-s unittest /ets/{runner_dir}/OpenHarmonyTestRunner -s class {test_classes} -s timeout 15000')
+    cmd = (f'hdc shell aa test -b {ctx.bundle_name} -m {module_name} '
+           f'-s unittest /ets/{runner_dir}/OpenHarmonyTestRunner -s class {test_classes} -s timeout {timeout_ms}')
 
     print(f"执行测试命令: {cmd}")
-    result = subprocess.run(
-        ['hdc', 'shell', cmd.split('shell ')[1]],
-        shell=True,
-        capture_output=True,
-        text=True,
-        encoding='utf-8'
-    )
+    monitor = TestProgressMonitor(library_name, serial, class_budgets=class_budgets, test_names=test_names)
+    with stage_timer(library_name, "aa test"):
+        try:
+            # 原始输出只写入库的日志，控制台显示解析后的测试进度
+            run_command(hdc_command(serial, 'shell', cmd.split('shell ')[1]), "aa test", library_name,
+                        check=False, echo=False, on_line=monitor.feed, should_abort=monitor.check)
+            abort_reason = monitor.abort_reason
+        except CommandAborted as e:
+            abort_reason = e.reason
+        # hdc输出设备断开的提示后通常会立即退出，此时run_command正常返回，同样按提前终止处理
+        if abort_reason:
+            monitor.mark_aborted(abort_reason)
+            # 终止hdc客户端不会停止设备上的测试进程，设备仍连接时强制停止应用
+            if not monitor.device_disconnected:
+                run_command(hdc_command(serial, "shell", "aa", "force-stop", ctx.bundle_name), "hdc", library_name,
+                            check=False)
 
     # 计算总执行时间
     end_time = time.time()
     total_time = end_time - start_time
     print(f"测试总执行时间: {total_time:.2f}秒")
 
-    print("STDOUT:", result.stdout)
-    print("STDERR:", result.stderr)
-
-    # 生成测试报告
-    generate_reports(test_names, result.stdout, library_name)
-    
-    return result.stdout
+    run_result = monitor.get_run_result()
+    run_result.commit = ctx.commit
+    record_test_timings(library_name, run_result, timeout_ms)
+    return run_result
 
-def extract_test_names():
+def extract_test_names(project_dir):
     """提取测试目录下所有.test.ets文件中的测试函数名称（递归查找），并排除被注释掉的测试"""
-    base_test_dir = os.path.join("entry", "src", "ohosTest", "ets", "test")
+    base_test_dir = os.path.join(project_dir, "entry", "src", "ohosTest", "ets", "test")
     test_names = []
     commented_tests = set()  # 存储被注释掉的测试函数名
 
@@ -514,7 +601,7 @@ def extract_test_names():
             for filename in files:
                 if filename.endswith(".test.ets") and "List" in filename:
                     filepath = os.path.join(root, filename)
-                    relative_path = os.path.relpath(filepath, os.getcwd())
+                    relative_path = os.path.relpath(filepath, project_dir)
 
                     try:
                         with open(filepath, "r", encoding="utf-8") as f:
@@ -573,7 +660,7 @@ def extract_test_names():
             for filename in files:
                 if filename.endswith(".test.ets"):
                     filepath = os.path.join(root, filename)
-                    relative_path = os.path.relpath(filepath, os.getcwd())
+                    relative_path = os.path.relpath(filepath, project_dir)
 
                     try:
                         with open(filepath, "r", encoding="utf-8") as f:
@@ -610,14 +697,49 @@ def extract_test_names():
     print(f"总共找到{len(test_names)}个有效的唯一测试名称")
     return test_names
 
-def _clone_repo(library_name):
-    """处理带子模块的仓库克隆"""
-    # 获取仓库信息
-    owner, name, sub_dir = get_repo_info(library_name)
-    if not owner or not name:
-        print(f"错误：无法获取库 {library_name} 的仓库信息")
-        return False
-
+def _get_repo_lock(repo_dir):
+    """获取仓库目录对应的锁，避免多个库（如openharmony_tpc_samples的不同子目录）同时克隆或更新同一仓库"""
+    with _repo_locks_guard:
+        lock = _repo_locks.get(repo_dir)
+        if lock is None:
+            lock = threading.Lock()
+            _repo_locks[repo_dir] = lock
+        return lock
+
+def _git_env():
+    """git子进程的环境变量，只对子进程关闭克隆保护，不修改本进程的环境变量"""
+    return dict(os.environ, GIT_CLONE_PROTECTION_ACTIVE="false")
+
+def _clone_repo(ctx):
+    """确保库的仓库已克隆并更新：优先等待预取阶段获取的仓库，然后检出库所需的子目录"""
+    prefetcher = get_repo_prefetcher()
+    if prefetcher is None or not prefetcher.wait(ctx):
+        sync_repo(ctx)
+    ctx.commit = get_repo_registry().commit(ctx.clone_url)
+
+    # 稀疏检出的仓库由多个子目录库共用，每个库只加入自己的子目录
+    if ctx.sub_dir and _is_sparse_checkout(ctx):
+        with _get_repo_lock(ctx.repo_dir):
+            _add_sparse_sub_dir(ctx, _git_env())
+    return True
+
+def sync_repo(ctx):
+    """
+    克隆或更新ctx对应的仓库（处理带子模块的仓库），不检出子目录库的子目录
+
+    每个仓库在一次运行中只同步一次，同步后的提交记录在RepoRegistry中。
+    """
+    registry = get_repo_registry()
+    with _get_repo_lock(ctx.repo_dir):
+        if registry.is_synced(ctx.clone_url) and os.path.exists(ctx.repo_dir):
+            print(f"仓库 {ctx.repo_dir} 本次运行已同步，跳过更新")
+            return True
+        _sync_repo_once(ctx)
+        registry.record(ctx.clone_url, resolve_head(ctx.repo_dir))
+    return True
+
+def _sync_repo_once(ctx):
+    """克隆或更新仓库"""
     # 需要递归克隆的仓库列表
     recurse_repos = {
         "openharmony_tpc_samples",
@@ -630,27 +752,85 @@ def _clone_repo(library_name):
     }
 
     # 构建克隆URL
-    base_url = f"https://gitcode.com/{owner}/{name}"
-    clone_url = f"{base_url}.git"
-    target_dir = name if not sub_dir else sub_dir
+    clone_url = ctx.clone_url
+    target_dir = ctx.repo_dir
+    git_env = _git_env()
+
+    # 每次运行只fetch一次共享镜像，工作区的克隆和更新都从本地镜像获取对象
+    mirror_dir = ensure_mirror(clone_url, env=git_env, library=ctx.library_name)
 
     # 检查并更新已存在的目录
     if os.path.exists(target_dir):
-        print(f"目录 {target_dir} 已存在，执行git pull更新")
-        os.chdir(target_dir)
+        if _is_sparse_checkout(ctx):
+            _update_sparse_repo(ctx, git_env)
+            return True
         try:
-            subprocess.run(["git", "pull"], check=True)
+            if mirror_dir:
+                print(f"目录 {target_dir} 已存在，从镜像仓库更新")
+                run_command(["git", "fetch", mirror_dir, "+refs/heads/*:refs/remotes/origin/*"],
+                            "git", ctx.library_name, cwd=target_dir, env=git_env)
+                run_command(["git", "merge", "--ff-only"], "git", ctx.library_name, cwd=target_dir, env=git_env)
+            else:
+                print(f"目录 {target_dir} 已存在，执行git pull更新")
+                run_command(["git", "pull"], "git", ctx.library_name, cwd=target_dir, env=git_env)
             print(f"成功更新仓库 {target_dir}")
         except subprocess.CalledProcessError as e:
             print(f"Git pull失败: {e}")
-        finally:
-            os.chdir("..")
+        return True
+
+    # 子目录库只检出所需的子目录
+    if GIT_SPARSE_CHECKOUT and ctx.sub_dir:
+        _sparse_clone_repo(ctx, mirror_dir, git_env)
         return True
 
     # 构建克隆命令
     cmd = ["git", "clone", clone_url]
-    if name in recurse_repos:
+    if mirror_dir:
+        # --dissociate复制镜像中的对象，工作区不依赖镜像目录
+        cmd.extend(["--reference", mirror_dir, "--dissociate"])
+    if ctx.repo in recurse_repos:
         cmd.append("--recurse-submodules")
         print(f"克隆仓库 {clone_url} 及其子模块...")
     else:
-        print(f"克隆仓库 {clone_url}...")
\ No newline at end of file
+        print(f"克隆仓库 {clone_url}...")
+
+    run_command(cmd, "git", ctx.library_name, cwd=ctx.libraries_dir, env=git_env)
+    return True
+
+def _is_sparse_checkout(ctx):
+    """库所在的仓库是否为稀疏检出"""
+    result = run_command(["git", "config", "--get", "core.sparseCheckout"], "git", ctx.library_name,
+                         cwd=ctx.repo_dir, check=False, echo=False)
+    return result.stdout.strip() == "true"
+
+def _sparse_clone_repo(ctx, mirror_dir, git_env):
+    """
+    blobless部分克隆并以cone模式稀疏检出，初始只检出仓库根目录的文件
+
+    有镜像时从镜像的file://地址克隆，缺失的对象按需从本地镜像获取；同一仓库的
+    所有子目录库共用这一个工作区和对象库，每个库只需把自己的子目录加入稀疏检出。
+    """
+    source_url = mirror_url(mirror_dir) if mirror_dir else ctx.clone_url
+    print(f"部分克隆仓库 {ctx.clone_url}（稀疏检出）...")
+    run_command(["git", "clone", "--filter=blob:none", "--sparse", source_url, ctx.repo],
+                "git", ctx.library_name, cwd=ctx.libraries_dir, env=git_env)
+
+def _update_sparse_repo(ctx, git_env):
+    """更新稀疏检出的仓库"""
+    print(f"目录 {ctx.repo_dir} 已存在（稀疏检出），执行git pull更新")
+    try:
+        run_command(["git", "pull", "--ff-only"], "git", ctx.library_name, cwd=ctx.repo_dir, env=git_env)
+        print(f"成功更新仓库 {ctx.repo_dir}")
+    except subprocess.CalledProcessError as e:
+        print(f"Git pull失败: {e}")
+
+def _add_sparse_sub_dir(ctx, git_env):
+    """将子目录加入稀疏检出，并只初始化该子目录下的子模块"""
+    print(f"稀疏检出子目录 {ctx.sub_dir}")
+    run_command(["git", "sparse-checkout", "add", ctx.sub_dir], "git", ctx.library_name,
+                cwd=ctx.repo_dir, env=git_env)
+    if os.path.exists(os.path.join(ctx.repo_dir, ".gitmodules")):
+        # origin可能指向本地镜像，相对路径的子模块地址需要按上游地址解析
+        run_command(["git", "-c", f"remote.origin.url={ctx.clone_url}",
+                     "submodule", "update", "--init", "--recursive", "--", ctx.sub_dir],
+                    "git", ctx.library_name, cwd=ctx.repo_dir, env=git_env)
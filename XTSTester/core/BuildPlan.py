@@ -0,0 +1,123 @@
+"""
+hvigor构建计划模块
+
+根据一个库需要的构建目标（应用HAP、sharedLibrary HSP、ohosTest测试HAP）生成
+最少的hvigor调用：一次--sync，加上一次合并了所有模块目标的assemble任务图。
+release模式额外执行一次release构建以验证release编译。设备上安装的entry HAP和
+ohosTest HAP都来自buildMode=test的构建，因此debug模式不再单独构建一遍应用。
+
+每次调用的命令和耗时都会打印，构建结束后输出耗时汇总。hvigor通过CommandRunner执行，
+输出写入库的日志，超过COMMAND_TIMEOUTS["hvigor"]时终止整个进程树。
+
+使用方法:
+    from core.BuildPlan import BuildPlan
+    plan = BuildPlan(build_mode="debug", shared_library="sharedLibrary", daemon=True)
+    plan.run(project_dir, library_name="commonmark")
+"""
+import subprocess
+import time
+from collections import namedtuple
+
+from colorama import Fore
+
+from core.CommandRunner import run_command, CommandTimeout
+from utils.config import node_path, hvigor_path
+
+# 所有hvigor调用共用的参数（另加--daemon或--no-daemon）
+HVIGOR_COMMON_ARGS = ("--analyze=normal", "--parallel", "--incremental")
+
+HvigorInvocation = namedtuple("HvigorInvocation", ["name", "args"])
+
+
+class BuildPlan:
+    """一个库的hvigor调用计划"""
+
+    def __init__(self, build_mode="debug", shared_library=None, daemon=True):
+        """
+        参数:
+            build_mode: 应用的编译模式，"debug"或"release"
+            shared_library: sharedLibrary模块目录名，没有该模块时为None
+            daemon: 是否复用hvigor守护进程，所有调用统一使用--daemon或--no-daemon
+        """
+        self.build_mode = build_mode
+        self.shared_library = shared_library
+        self.daemon = daemon
+        self.timings = []
+
+    def invocations(self, include_shared_library=True):
+        """返回按顺序执行的hvigor调用列表"""
+        shared_library = self.shared_library if include_shared_library else None
+        plan = [HvigorInvocation("sync", [
+            "--sync",
+            "-p", "product=default",
+            "-p", f"buildMode={self.build_mode}"
+        ])]
+
+        if self.build_mode == "release":
+            # release编译单独验证，测试包仍使用test模式构建
+            modules = ["entry@default"] + ([f"{shared_library}@default"] if shared_library else [])
+            plan.append(HvigorInvocation("assemble-release", [
+                "--mode", "module",
+                "-p", f"module={','.join(modules)}",
+                "-p", "product=default",
+                "-p", "buildMode=release",
+                "-p", "requireDeviceType=phone",
+                "assembleHap", *(["assembleHsp"] if shared_library else [])
+            ]))
+
+        # entry、sharedLibrary和ohosTest合并为一个任务图
+        modules = ["entry@default", "entry@ohosTest"] + ([f"{shared_library}@default"] if shared_library else [])
+        plan.append(HvigorInvocation("assemble-test", [
+            "--mode", "module",
+            "-p", f"module={','.join(modules)}",
+            "-p", "isOhosTest=true",
+            "-p", "product=default",
+            "-p", "buildMode=test",
+            "-p", "requireDeviceType=phone",
+            "assembleHap", "assembleHsp"
+        ]))
+        return plan
+
+    def _run_invocation(self, invocation, project_dir, library_name):
+        cmd = [node_path, hvigor_path, *invocation.args, *HVIGOR_COMMON_ARGS,
+               "--daemon" if self.daemon else "--no-daemon"]
+        print(Fore.YELLOW + f"[hvigor:{invocation.name}] {' '.join(invocation.args)}" + Fore.RESET)
+        start_time = time.time()
+        try:
+            run_command(cmd, "hvigor", library_name, cwd=project_dir)
+        finally:
+            elapsed = time.time() - start_time
+            self.timings.append((invocation.name, elapsed))
+            print(f"[hvigor:{invocation.name}] 耗时 {elapsed:.2f}秒")
+
+    def run(self, project_dir, library_name=None):
+        """
+        按计划执行hvigor调用
+
+        包含sharedLibrary的任务图构建失败时，与原流程一致，退回到不含sharedLibrary重新构建。
+
+        参数:
+            project_dir: 项目目录
+            library_name: 库名，hvigor输出写入该库的日志
+        """
+        self.timings = []
+        plan = self.invocations()
+        print(f"构建计划({self.build_mode}): {' -> '.join(invocation.name for invocation in plan)}")
+        try:
+            for idx, invocation in enumerate(plan):
+                try:
+                    self._run_invocation(invocation, project_dir, library_name)
+                except subprocess.CalledProcessError as e:
+                    # 超时说明构建卡住，不再重新构建
+                    if not self.shared_library or invocation.name == "sync" or isinstance(e, CommandTimeout):
+                        raise
+                    print(f"警告: 构建sharedLibrary模块失败: {e}")
+                    print("尝试不包含sharedLibrary模块重新构建...")
+                    # 从失败的调用开始，按不含sharedLibrary的计划继续
+                    for fallback in self.invocations(include_shared_library=False)[idx:]:
+                        self._run_invocation(fallback, project_dir, library_name)
+                    break
+        finally:
+            total = sum(elapsed for _, elapsed in self.timings)
+            details = ", ".join(f"{name} {elapsed:.2f}秒" for name, elapsed in self.timings)
+            print(f"hvigor调用 {len(self.timings)} 次, 共 {total:.2f}秒 ({details})")
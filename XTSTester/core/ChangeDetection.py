@@ -0,0 +1,165 @@
+"""
+库变化检测模块
+
+"只测试有变化的库"模式下，并发地对所有仓库执行`git ls-remote`获取上游HEAD，
+与TESTED_REVISIONS_FILE中记录的上次测试提交、SDK版本、release模式和工具配置
+哈希比较。全部相同且存在上次测试结果JSON的库不再克隆、构建和测试，直接复用
+上次的结果生成报告。
+
+每个库测试完成后通过record_tested_revision记录本次的提交和构建配置。
+
+使用方法:
+    from core.ChangeDetection import select_changed_libraries, record_tested_revision
+    changed, unchanged_results = select_changed_libraries(libraries)
+    ...
+    record_tested_revision(library_name, run_result)
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore
+
+from core.LibraryCatalog import get_library_catalog
+from core.ProjectContext import repo_clone_url
+from reports.GenerateTestReport import get_test_json_path
+from reports.TestRunResult import TestRunResult
+from utils import config
+from utils.config import TESTED_REVISIONS_FILE, LS_REMOTE_WORKERS
+from utils.file_lock import FileLock
+
+# 单个git ls-remote的超时时间（秒）
+LS_REMOTE_TIMEOUT = 60
+
+_state_lock = threading.Lock()
+
+
+def ls_remote_head(clone_url):
+    """返回上游仓库HEAD的提交SHA，失败时返回None"""
+    git_env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    try:
+        result = subprocess.run(["git", "ls-remote", clone_url, "HEAD"], capture_output=True, text=True,
+                                check=True, timeout=LS_REMOTE_TIMEOUT, env=git_env)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"git ls-remote {clone_url} 失败: {str(e)}")
+        return None
+    line = result.stdout.strip().splitlines()[0] if result.stdout.strip() else ""
+    return line.split()[0] if line else None
+
+
+def ls_remote_heads(clone_urls, workers=LS_REMOTE_WORKERS):
+    """并发获取多个仓库的HEAD提交，返回克隆地址到SHA（失败为None）的字典"""
+    clone_urls = list(dict.fromkeys(clone_urls))
+    if not clone_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ls-remote") as executor:
+        return dict(zip(clone_urls, executor.map(ls_remote_head, clone_urls)))
+
+
+def tool_config_hash():
+    """构建工具和签名配置的哈希，工具升级或配置变化后所有库都需要重新测试"""
+    tool_config = {
+        "deveco_dir": config.DEVECO_DIR,
+        "node_path": config.node_path,
+        "hvigor_path": config.hvigor_path,
+        "ohpm_path": config.ohpm_path,
+        "signing": [config.SIGNING_CONFIG_SIG, config.SIGNING_CONFIG_TPC, config.SIGNING_CONFIG_SAMPLES]
+    }
+    return hashlib.sha256(json.dumps(tool_config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def build_fingerprint(commit):
+    """本次运行中一个库的测试输入：提交、SDK版本、release模式和工具配置哈希"""
+    return {
+        "commit": commit,
+        "sdk_version": config.selected_sdk_version,
+        "release_mode": config.get_release_mode(),
+        "tool_config_hash": tool_config_hash()
+    }
+
+
+def _load_state():
+    if not os.path.exists(TESTED_REVISIONS_FILE):
+        return {}
+    try:
+        with open(TESTED_REVISIONS_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"警告：读取上次测试记录失败: {str(e)}")
+        return {}
+
+
+def _load_cached_result(library_name, commit):
+    """读取库上次的测试结果JSON，结果不是该提交的测试结果时返回None"""
+    json_path = get_test_json_path(library_name)
+    if not os.path.exists(json_path):
+        return None
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取库 {library_name} 的上次测试结果失败: {str(e)}")
+        return None
+    if data.get("commit") != commit:
+        return None
+    run_result = TestRunResult.from_dict(data, library_name)
+    run_result.commit = commit
+    return run_result
+
+
+def select_changed_libraries(libraries, workers=LS_REMOTE_WORKERS):
+    """
+    按上游提交和构建配置筛选需要重新测试的库
+
+    返回:
+        (需要测试的库列表, 库名到上次TestRunResult的字典)，无法判断的库视为有变化
+    """
+    catalog = get_library_catalog()
+    library_urls = {}
+    for library_name in libraries:
+        owner, repo, _ = catalog.get_repo_info(library_name)
+        if owner and repo:
+            library_urls[library_name] = repo_clone_url(owner, repo)
+
+    print(f"变化检测: 对 {len(set(library_urls.values()))} 个仓库执行git ls-remote...")
+    heads = ls_remote_heads(library_urls.values(), workers)
+    with _state_lock:
+        state = _load_state()
+
+    changed, unchanged_results = [], {}
+    for library_name in libraries:
+        commit = heads.get(library_urls.get(library_name))
+        cached = None
+        if commit and state.get(library_name) == build_fingerprint(commit):
+            cached = _load_cached_result(library_name, commit)
+        if cached is None:
+            changed.append(library_name)
+        else:
+            unchanged_results[library_name] = cached
+
+    print(Fore.CYAN + f"变化检测: {len(changed)} 个库需要测试, {len(unchanged_results)} 个库未变化将复用上次结果"
+          + Fore.RESET)
+    return changed, unchanged_results
+
+
+def record_tested_revision(library_name, run_result):
+    """
+    记录库本次测试的提交和构建配置；库级错误（构建失败等）和被提前终止的不完整结果
+    不记录，下次仍会重新测试
+    """
+    if not isinstance(run_result, TestRunResult) or not run_result.commit:
+        return
+    if "ErrorTestClass" in run_result.classes or run_result.aborted:
+        return
+    with _state_lock, FileLock(TESTED_REVISIONS_FILE + ".lock"):
+        state = _load_state()
+        state[library_name] = build_fingerprint(run_result.commit)
+        os.makedirs(os.path.dirname(TESTED_REVISIONS_FILE), exist_ok=True)
+        tmp_file = f"{TESTED_REVISIONS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, TESTED_REVISIONS_FILE)
@@ -0,0 +1,272 @@
+"""
+统一的子进程执行模块
+
+git、ohpm、hvigor和hdc调用都通过run_command执行:
+- 按阶段（git/ohpm/hvigor/hdc/aa test）使用COMMAND_TIMEOUTS中配置的超时时间
+- 子进程输出逐行写入该库的日志文件COMMAND_LOG_DIR/<库名>.log，内存中只保留最后
+  COMMAND_OUTPUT_TAIL_LINES行用于错误信息（capture=True时保留完整输出供解析）
+- 超时后终止整个进程树（hvigor、hdc会再启动子进程），一个卡住的命令不会拖住整个运行
+- 每个命令的退出码和耗时写入日志，并随CommandResult返回
+- 可以通过on_line逐行处理输出（如边运行边解析aa test输出），通过should_abort提前终止
+
+超时抛出CommandTimeout，should_abort要求终止时抛出CommandAborted。两者都是
+subprocess.CalledProcessError的子类，现有按命令失败处理的逻辑（将该库标记为error后
+继续下一个库）不需要修改。
+
+使用方法:
+    from core.CommandRunner import run_command
+    result = run_command(["git", "pull"], "git", library="commonmark", cwd=repo_dir)
+    print(result.returncode, result.duration)
+"""
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+from colorama import Fore
+
+from utils.config import COMMAND_LOG_DIR, COMMAND_TIMEOUTS, COMMAND_OUTPUT_TAIL_LINES, COMMAND_ECHO_OUTPUT
+
+# 子进程正常退出后，管道持续该时间（秒）没有新的输出时停止读取；子进程启动的后台进程
+# （如hdc server）可能继承输出管道，不能无限等待管道关闭，但仍在读出的剩余输出不会丢弃。
+# 进程树被终止时最多等待该时间。
+READER_GRACE_PERIOD = 1.0
+
+# 等待读取线程时检查输出是否仍在读出的间隔（秒）
+READER_POLL_INTERVAL = 0.1
+
+# 没有库名的命令写入的日志文件名
+DEFAULT_LOG_NAME = "xtstester"
+
+# 检查should_abort的间隔（秒）
+ABORT_POLL_INTERVAL = 0.5
+
+
+class CommandResult:
+    """一次子进程执行的结果"""
+    __slots__ = ("args", "stage", "returncode", "output", "duration")
+
+    def __init__(self, args, stage, returncode, output, duration):
+        self.args = args
+        self.stage = stage
+        self.returncode = returncode
+        self.output = output
+        self.duration = duration
+
+    @property
+    def stdout(self):
+        """与subprocess.CompletedProcess兼容（stderr已合并到stdout）"""
+        return self.output
+
+
+class CommandAborted(subprocess.CalledProcessError):
+    """子进程被提前终止（整个进程树已被终止），reason为终止原因"""
+
+    def __init__(self, cmd, reason, output=None):
+        super().__init__(-signal.SIGTERM, cmd, output)
+        self.reason = reason
+
+    def __str__(self):
+        return f"Command '{self.cmd}' aborted: {self.reason}"
+
+
+class CommandTimeout(CommandAborted):
+    """子进程超时，整个进程树已被终止"""
+
+    def __init__(self, cmd, timeout, output=None):
+        super().__init__(cmd, f"超时 ({timeout}秒)", output)
+        self.timeout = timeout
+
+    def __str__(self):
+        return f"Command '{self.cmd}' timed out after {self.timeout} seconds"
+
+
+# 正在运行的子进程，收到中断信号时统一终止
+_running_processes = set()
+_running_processes_lock = threading.Lock()
+
+
+def _popen_platform_kwargs():
+    """子进程放入新的进程组，超时或中断时可以终止整个进程树"""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process):
+    """终止子进程及其启动的所有进程"""
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+        else:
+            # 子进程以新会话启动，进程组ID等于其PID
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    if process.poll() is None:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+def kill_running_commands():
+    """终止所有正在通过run_command运行的子进程树，返回终止的数量"""
+    with _running_processes_lock:
+        processes = list(_running_processes)
+    for process in processes:
+        kill_process_tree(process)
+    return len(processes)
+
+
+def get_log_path(library=None):
+    """返回库的命令输出日志路径"""
+    return os.path.join(COMMAND_LOG_DIR, f"{library or DEFAULT_LOG_NAME}.log")
+
+
+def _display_command(cmd):
+    return cmd if isinstance(cmd, str) else " ".join(str(arg) for arg in cmd)
+
+
+# _wait_process返回的超时标记
+_TIMED_OUT = object()
+
+
+def _wait_process(process, timeout, should_abort):
+    """等待子进程结束，正常结束返回None，超时返回_TIMED_OUT，should_abort要求终止时返回终止原因"""
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        wait_time = ABORT_POLL_INTERVAL if should_abort else None
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return _TIMED_OUT
+            wait_time = remaining if wait_time is None else min(wait_time, remaining)
+        try:
+            process.wait(timeout=wait_time)
+            return None
+        except subprocess.TimeoutExpired:
+            pass
+        if should_abort:
+            reason = should_abort()
+            if reason:
+                return reason
+
+
+def run_command(cmd, stage, library=None, cwd=None, env=None, timeout=None, check=True, capture=False,
+                echo=COMMAND_ECHO_OUTPUT, on_line=None, should_abort=None):
+    """
+    执行子进程，输出写入库的日志文件，超时后终止整个进程树
+
+    参数:
+        cmd: 命令参数列表
+        stage: 阶段名（git/ohpm/hvigor/hdc/aa test），决定默认超时时间
+        library: 库名，决定日志文件，None时写入公共日志
+        cwd: 工作目录
+        env: 环境变量
+        timeout: 超时时间（秒），None时使用COMMAND_TIMEOUTS[stage]，0表示不限制
+        check: 退出码非0时是否抛出subprocess.CalledProcessError
+        capture: 是否在结果中保留完整输出，否则只保留最后COMMAND_OUTPUT_TAIL_LINES行
+        echo: 是否同时打印到控制台
+        on_line: 每读到一行输出时调用on_line(line)（在读取线程中调用，行不含换行符）
+        should_abort: 运行期间定期调用，返回非空的终止原因时终止整个进程树
+
+    返回:
+        CommandResult
+
+    异常:
+        CommandTimeout: 超时（无论check是否为True）
+        CommandAborted: should_abort要求终止（无论check是否为True）
+        subprocess.CalledProcessError: check为True且退出码非0
+    """
+    if timeout is None:
+        timeout = COMMAND_TIMEOUTS.get(stage)
+    display = _display_command(cmd)
+    lines = [] if capture else deque(maxlen=COMMAND_OUTPUT_TAIL_LINES)
+
+    os.makedirs(COMMAND_LOG_DIR, exist_ok=True)
+    with open(get_log_path(library), "a", encoding="utf-8", buffering=1) as log_file:
+        log_file.write(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] [{stage}] $ {display}"
+                       f"{f'  (cwd: {cwd})' if cwd else ''}\n")
+
+        start_time = time.time()
+        process = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, encoding="utf-8", errors="replace", bufsize=1,
+                                   **_popen_platform_kwargs())
+        with _running_processes_lock:
+            _running_processes.add(process)
+
+        finished = threading.Event()
+        output_lock = threading.Lock()
+        last_read = [time.time()]
+
+        def read_output():
+            # 等待期结束后继续读空管道，但不再写入已关闭的日志和结果
+            for line in process.stdout:
+                last_read[0] = time.time()
+                with output_lock:
+                    if finished.is_set():
+                        continue
+                    log_file.write(line)
+                    line = line.rstrip("\r\n")
+                    lines.append(line)
+                    if on_line:
+                        try:
+                            on_line(line)
+                        except Exception as e:
+                            print(f"[{stage}] 处理输出行时出错: {str(e)}")
+                if echo:
+                    print(line)
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+
+        exited = False
+        try:
+            abort_reason = _wait_process(process, timeout, should_abort)
+            exited = abort_reason is None
+            if abort_reason is not None:
+                kill_process_tree(process)
+                process.wait()
+        except BaseException:
+            # 本进程被中断（如多进程模式下工作进程收到Ctrl+C）时不留下孤儿进程
+            kill_process_tree(process)
+            raise
+        finally:
+            with _running_processes_lock:
+                _running_processes.discard(process)
+            if exited:
+                # 正常退出：读到管道关闭；只有后台进程占着管道且持续没有输出时才停止
+                last_read[0] = max(last_read[0], time.time())
+                while reader.is_alive() and time.time() - last_read[0] < READER_GRACE_PERIOD:
+                    reader.join(READER_POLL_INTERVAL)
+            else:
+                reader.join(READER_GRACE_PERIOD)
+            with output_lock:
+                finished.set()
+            duration = time.time() - start_time
+
+        if abort_reason is _TIMED_OUT:
+            status = f"超时 ({timeout}秒)，已终止进程树"
+        elif abort_reason is not None:
+            status = f"提前终止 ({abort_reason})，已终止进程树"
+        else:
+            status = f"退出码 {process.returncode}"
+        log_file.write(f"[{stage}] {status}, 耗时 {duration:.2f}秒\n")
+
+    output = "\n".join(list(lines))
+    if abort_reason is _TIMED_OUT:
+        print(Fore.RED + f"[{stage}] 命令超时 ({timeout}秒)，已终止: {display}" + Fore.RESET)
+        raise CommandTimeout(cmd, timeout, output)
+    if abort_reason is not None:
+        print(Fore.RED + f"[{stage}] 命令已提前终止 ({abort_reason}): {display}" + Fore.RESET)
+        raise CommandAborted(cmd, abort_reason, output)
+    if check and process.returncode != 0:
+        print(Fore.RED + f"[{stage}] 命令失败 (退出码 {process.returncode})，详见 {get_log_path(library)}"
+              + Fore.RESET)
+        raise subprocess.CalledProcessError(process.returncode, cmd, output)
+    return CommandResult(cmd, stage, process.returncode, output, duration)
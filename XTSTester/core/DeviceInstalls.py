@@ -0,0 +1,93 @@
+"""
+设备安装记录模块
+
+记录每台设备上每个bundleName当前安装的签名包集合（entry HAP、ohosTest HAP、
+sharedLibrary HSP）的内容哈希，保存在DEVICE_INSTALLS_FILE中，多个工作进程通过锁文件
+共享。安装前哈希与记录一致、且设备上确实存在该应用时，可以跳过卸载、发送和安装。
+
+同一bundleName可能被多个库使用（如同一仓库组的库），记录按(设备, bundleName)保存，
+装了其他库的包之后哈希不再一致，下次会重新安装。
+
+使用方法:
+    from core.DeviceInstalls import package_set_hash, installed_package_hash, record_installed_packages
+    packages_hash = package_set_hash(package_paths)
+    if installed_package_hash(serial, bundle_name) != packages_hash:
+        ...  # 卸载、发送并安装
+        record_installed_packages(serial, bundle_name, packages_hash, library_name)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from utils.config import DEVICE_INSTALLS_FILE
+from utils.file_lock import FileLock
+
+# hdc默认设备（未指定序列号）在记录中使用的键
+DEFAULT_DEVICE_KEY = "default"
+
+_state_lock = threading.Lock()
+
+
+def package_set_hash(package_paths):
+    """返回一组签名包的内容哈希（与文件顺序无关）"""
+    digest = hashlib.sha256()
+    for package_path in sorted(package_paths, key=os.path.basename):
+        file_digest = hashlib.sha256()
+        with open(package_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                file_digest.update(chunk)
+        digest.update(os.path.basename(package_path).encode("utf-8"))
+        digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+def _load_state():
+    if not os.path.exists(DEVICE_INSTALLS_FILE):
+        return {}
+    try:
+        with open(DEVICE_INSTALLS_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"警告：读取设备安装记录失败: {str(e)}")
+        return {}
+
+
+def _update_state(update):
+    """在锁内读取、修改并原子写回安装记录"""
+    with _state_lock, FileLock(DEVICE_INSTALLS_FILE + ".lock"):
+        state = _load_state()
+        update(state)
+        os.makedirs(os.path.dirname(DEVICE_INSTALLS_FILE), exist_ok=True)
+        tmp_file = f"{DEVICE_INSTALLS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, DEVICE_INSTALLS_FILE)
+
+
+def installed_package_hash(serial, bundle_name):
+    """返回记录中设备上该应用的签名包哈希，没有记录时返回None"""
+    with _state_lock:
+        state = _load_state()
+    record = state.get(serial or DEFAULT_DEVICE_KEY, {}).get(bundle_name)
+    return record.get("hash") if isinstance(record, dict) else None
+
+
+def record_installed_packages(serial, bundle_name, packages_hash, library_name):
+    """记录设备上该应用已安装的签名包哈希"""
+    def update(state):
+        state.setdefault(serial or DEFAULT_DEVICE_KEY, {})[bundle_name] = {
+            "hash": packages_hash,
+            "library": library_name,
+            "installed_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    _update_state(update)
+
+
+def forget_installed_packages(serial, bundle_name):
+    """删除设备上该应用的安装记录（开始重新安装或安装失败时，设备上的状态不确定）"""
+    def update(state):
+        state.get(serial or DEFAULT_DEVICE_KEY, {}).pop(bundle_name, None)
+    _update_state(update)
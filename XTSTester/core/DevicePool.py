@@ -0,0 +1,181 @@
+"""
+hdc设备池模块
+
+通过`hdc list targets`发现已连接的设备/模拟器，测试阶段为每个库租用一台设备，
+所有hdc命令都通过`-t <serial>`发送到租用的设备，完成或失败后归还。
+没有空闲设备时定期打印正在等待的设备及其占用进程，超过DEVICE_ACQUIRE_TIMEOUT后
+抛出DeviceAcquireTimeout。
+同一时刻一台设备只运行一个库，因此同一仓库组（相同bundleName）的库也可以在
+不同设备上同时安装和测试，吞吐量随连接的设备数增长。
+
+设备租用同时通过DEVICE_LOCK_DIR下的锁文件跨进程互斥，多进程任务队列的各个
+工作进程可以共享同一批设备。锁文件记录持有进程，进程退出后残留的锁会被立即清理。
+
+使用方法:
+    from core.DevicePool import get_device_pool, hdc_command
+    with get_device_pool().lease() as serial:
+        subprocess.run(hdc_command(serial, "shell", "ls"), check=True)
+"""
+import os
+import re
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from colorama import Fore
+
+from utils.config import HDC_DEVICE_SERIALS, DEVICE_LOCK_DIR, DEVICE_ACQUIRE_TIMEOUT
+from utils.file_lock import FileLock, FileLockTimeout
+
+# 设备锁文件超过该时间（秒）未释放视为进程异常退出后的残留锁
+DEVICE_LOCK_STALE_AFTER = 6 * 3600
+
+# 设备被其他进程占用时的重试间隔（秒）
+DEVICE_POLL_INTERVAL = 1.0
+
+# 等待空闲设备时打印等待状态的间隔（秒）
+DEVICE_WAIT_LOG_INTERVAL = 60
+
+
+class DeviceAcquireTimeout(Exception):
+    """在指定时间内没有租用到空闲设备"""
+
+
+def hdc_command(serial, *args):
+    """构建发送到指定设备的hdc命令，serial为None时使用hdc的默认设备"""
+    if serial:
+        return ["hdc", "-t", serial, *args]
+    return ["hdc", *args]
+
+
+def list_hdc_targets():
+    """返回`hdc list targets`列出的设备序列号列表，hdc不可用时返回空列表"""
+    try:
+        result = subprocess.run(["hdc", "list", "targets"], capture_output=True, text=True,
+                                encoding="utf-8", timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"获取hdc设备列表失败: {str(e)}")
+        return []
+
+    serials = []
+    for line in result.stdout.splitlines():
+        serial = line.strip().split()[0] if line.strip() else ""
+        if serial and serial != "[Empty]" and serial not in serials:
+            serials.append(serial)
+    return serials
+
+
+class DevicePool:
+    """可租用的hdc设备池"""
+
+    def __init__(self, serials=None):
+        """
+        参数:
+            serials: 设备序列号列表，为空时通过`hdc list targets`自动发现
+        """
+        serials = list(serials or []) or list_hdc_targets()
+        if not serials:
+            # 无法发现设备时退化为单个默认设备（不带-t的hdc命令）
+            print(Fore.YELLOW + "警告：未发现hdc设备，将使用hdc默认设备" + Fore.RESET)
+            serials = [None]
+        self.serials = serials
+        self._available = list(serials)
+        self._leased = {}
+        self._condition = threading.Condition()
+        print(f"设备池: {len(serials)} 台设备 {[serial or '默认设备' for serial in serials]}")
+
+    def __len__(self):
+        return len(self.serials)
+
+    @staticmethod
+    def _device_lock(serial):
+        lock_name = re.sub(r'[^A-Za-z0-9_.-]', '_', serial or "default")
+        return FileLock(os.path.join(DEVICE_LOCK_DIR, f"{lock_name}.lock"),
+                        timeout=0, stale_after=DEVICE_LOCK_STALE_AFTER)
+
+    @classmethod
+    def _lock_device(cls, serial):
+        """尝试获取设备的跨进程锁，设备被其他进程占用时返回None"""
+        device_lock = cls._device_lock(serial)
+        try:
+            device_lock.acquire()
+        except FileLockTimeout:
+            return None
+        return device_lock
+
+    def _describe_busy_devices(self):
+        """返回各设备的占用情况，用于等待时的提示"""
+        descriptions = []
+        for serial in self.serials:
+            name = serial or "默认设备"
+            if serial in self._leased:
+                descriptions.append(f"{name}(本进程使用中)")
+                continue
+            device_lock = self._device_lock(serial)
+            owner = device_lock.owner()
+            if owner is not None:
+                pid, host = owner
+                descriptions.append(f"{name}(进程 {pid}{f'@{host}' if host else ''} 占用, 锁文件 {device_lock.lock_path})")
+            else:
+                descriptions.append(name)
+        return ", ".join(descriptions)
+
+    def acquire(self, timeout=None):
+        """租用一台空闲设备，没有空闲设备时等待；超时返回False"""
+        start_time = time.time()
+        deadline = None if timeout is None else start_time + timeout
+        next_log_time = start_time
+        with self._condition:
+            while True:
+                for serial in list(self._available):
+                    device_lock = self._lock_device(serial)
+                    if device_lock is not None:
+                        self._available.remove(serial)
+                        self._leased[serial] = device_lock
+                        return serial
+
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if timeout != 0 and time.time() >= next_log_time:
+                    print(Fore.YELLOW + f"等待空闲设备（已等待 {int(time.time() - start_time)}秒）: "
+                          f"{self._describe_busy_devices()}" + Fore.RESET)
+                    next_log_time = time.time() + DEVICE_WAIT_LOG_INTERVAL
+                # 本进程归还设备时会被唤醒，其他进程占用的设备需要定期重试
+                wait_time = DEVICE_POLL_INTERVAL if remaining is None else min(remaining, DEVICE_POLL_INTERVAL)
+                self._condition.wait(timeout=wait_time)
+
+    def release(self, serial):
+        """归还设备"""
+        with self._condition:
+            if serial not in self._leased:
+                return
+            self._leased.pop(serial).release()
+            self._available.append(serial)
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, timeout=DEVICE_ACQUIRE_TIMEOUT):
+        """租用一台设备，退出with语句时（无论成功或失败）自动归还；超时抛出DeviceAcquireTimeout"""
+        serial = self.acquire(timeout)
+        if serial is False:
+            raise DeviceAcquireTimeout(f"{timeout}秒内没有空闲设备: {self._describe_busy_devices()}")
+        try:
+            yield serial
+        finally:
+            self.release(serial)
+
+
+# 进程级设备池实例
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_device_pool():
+    """获取进程级的设备池，首次调用时发现设备"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DevicePool(HDC_DEVICE_SERIALS)
+        return _pool
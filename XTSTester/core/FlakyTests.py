@@ -0,0 +1,75 @@
+"""
+不稳定测试（flaky）记录模块
+
+失败的测试类重跑后，按测试方法累计分类结果并保存在FLAKY_TESTS_FILE中:
+- flaky: 首次失败、重跑后通过
+- failed: 重跑后仍未通过（稳定失败）
+
+记录按库保存，键为"测试类.测试方法"。报告和调度可以通过load_flaky_tests读取，
+例如区分稳定失败和偶发失败。多个工作进程通过锁文件共享同一记录文件。
+
+使用方法:
+    from core.FlakyTests import record_rerun_results, load_flaky_tests
+    record_rerun_results("commonmark", run_result)
+    flaky = load_flaky_tests("commonmark")   # {"Class.test": {"flaky": 2, "failed": 0, ...}}
+"""
+import json
+import os
+import threading
+import time
+
+from reports.TestRunResult import NOT_RUN_STATUS
+from utils.config import FLAKY_TESTS_FILE
+from utils.file_lock import FileLock
+
+_state_lock = threading.Lock()
+
+
+def _load_state():
+    if not os.path.exists(FLAKY_TESTS_FILE):
+        return {}
+    try:
+        with open(FLAKY_TESTS_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"警告：读取flaky测试记录失败: {str(e)}")
+        return {}
+
+
+def load_flaky_tests(library_name):
+    """返回库中重跑过的测试的分类统计，键为"测试类.测试方法\""""
+    with _state_lock:
+        return _load_state().get(library_name, {})
+
+
+def record_rerun_results(library_name, run_result):
+    """
+    累计记录本次重跑过的测试的分类
+
+    返回:
+        本次重跑后通过的flaky测试数
+    """
+    # 首次运行被提前终止、只在重跑时运行过的测试不参与分类
+    rerun_tests = [(test_class, test) for test_class, test in run_result.iter_tests()
+                   if test.attempts > 1 and test.first_status != NOT_RUN_STATUS]
+    if not rerun_tests:
+        return 0
+
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    with _state_lock, FileLock(FLAKY_TESTS_FILE + ".lock"):
+        state = _load_state()
+        library_state = state.setdefault(library_name, {})
+        for test_class, test in rerun_tests:
+            entry = library_state.setdefault(f"{test_class.name}.{test.name}", {"flaky": 0, "failed": 0})
+            entry["flaky" if test.flaky else "failed"] += 1
+            entry["last_status"] = "flaky" if test.flaky else test.status
+            entry["last_seen"] = now
+            if run_result.commit:
+                entry["last_commit"] = run_result.commit
+        os.makedirs(os.path.dirname(FLAKY_TESTS_FILE), exist_ok=True)
+        tmp_file = f"{FLAKY_TESTS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, FLAKY_TESTS_FILE)
+    return sum(1 for _, test in rerun_tests if test.flaky)
@@ -0,0 +1,100 @@
+"""
+git裸镜像缓存模块
+
+每个上游仓库在GIT_MIRROR_DIR下保存一个`git clone --mirror`裸镜像，多个XTSTester检出
+和并行工作进程共享同一份镜像。镜像每次运行只fetch一次（通过镜像内的时间戳文件判断，
+间隔见GIT_MIRROR_REFRESH_INTERVAL），Libraries/下的工作区通过`--reference --dissociate`
+从镜像克隆，第N次克隆同一仓库只需本地复制对象，不再从网络下载。
+
+镜像的创建和fetch通过镜像目录旁的锁文件跨进程互斥。镜像允许带过滤条件的拉取，
+openharmony_tpc_samples等单体仓库的子目录库可以通过mirror_url从镜像做blobless部分克隆。
+
+使用方法:
+    from core.GitMirror import ensure_mirror
+    mirror_dir = ensure_mirror("https://gitcode.com/openharmony-sig/commonmark.git")
+    if mirror_dir:
+        subprocess.run(["git", "clone", "--reference", mirror_dir, "--dissociate", url, target])
+"""
+import os
+import pathlib
+import re
+import threading
+import time
+
+from core.CommandRunner import run_command
+from utils.config import GIT_MIRROR_DIR, GIT_MIRROR_REFRESH_INTERVAL
+from utils.file_lock import FileLock
+
+# 镜像内记录上次fetch完成时间的文件
+_FETCH_STAMP = "xts-last-fetch"
+
+# 本进程内已确认为最新的镜像
+_fresh_mirrors = set()
+_fresh_mirrors_lock = threading.Lock()
+
+
+def mirror_path(clone_url):
+    """返回上游仓库对应的镜像目录，例如gitcode.com/openharmony-sig/commonmark.git"""
+    path = re.sub(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', '', clone_url).rstrip("/")
+    if not path.endswith(".git"):
+        path += ".git"
+    parts = [re.sub(r'[^A-Za-z0-9_.-]', '_', part) for part in path.split("/") if part]
+    return os.path.join(GIT_MIRROR_DIR, *parts)
+
+
+def mirror_url(mirror_dir):
+    """返回镜像的file://地址，本地路径克隆会忽略--filter，部分克隆需要使用该地址"""
+    return pathlib.Path(mirror_dir).resolve().as_uri()
+
+
+def _is_fresh(mirror_dir):
+    """镜像在刷新间隔内已fetch过"""
+    try:
+        return time.time() - os.path.getmtime(os.path.join(mirror_dir, _FETCH_STAMP)) < GIT_MIRROR_REFRESH_INTERVAL
+    except OSError:
+        return False
+
+
+def _touch_stamp(mirror_dir):
+    with open(os.path.join(mirror_dir, _FETCH_STAMP), "w", encoding="utf-8") as f:
+        f.write(time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def ensure_mirror(clone_url, env=None, library=None):
+    """
+    创建或刷新上游仓库的裸镜像
+
+    参数:
+        clone_url: 上游仓库地址
+        env: 传给git子进程的环境变量
+        library: 触发镜像更新的库名，git输出写入该库的日志
+
+    返回:
+        镜像目录；镜像无法创建时返回None（调用方直接从上游克隆）
+    """
+    mirror_dir = mirror_path(clone_url)
+    with _fresh_mirrors_lock:
+        if mirror_dir in _fresh_mirrors:
+            return mirror_dir
+
+    try:
+        with FileLock(mirror_dir + ".lock", timeout=3600, stale_after=3 * 3600):
+            if not os.path.isdir(mirror_dir):
+                print(f"创建镜像仓库 {mirror_dir}...")
+                os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+                run_command(["git", "clone", "--mirror", clone_url, mirror_dir], "git", library, env=env)
+                _touch_stamp(mirror_dir)
+            elif not _is_fresh(mirror_dir):
+                print(f"更新镜像仓库 {mirror_dir}...")
+                run_command(["git", "fetch", "--prune"], "git", library, cwd=mirror_dir, env=env)
+                _touch_stamp(mirror_dir)
+            # 允许工作区从镜像做--filter=blob:none部分克隆并按需获取对象
+            run_command(["git", "config", "uploadpack.allowFilter", "true"], "git", library, cwd=mirror_dir)
+            run_command(["git", "config", "uploadpack.allowAnySHA1InWant", "true"], "git", library, cwd=mirror_dir)
+    except Exception as e:
+        print(f"镜像仓库 {clone_url} 不可用，将直接从上游克隆: {str(e)}")
+        return mirror_dir if os.path.isdir(os.path.join(mirror_dir, "objects")) else None
+
+    with _fresh_mirrors_lock:
+        _fresh_mirrors.add(mirror_dir)
+    return mirror_dir
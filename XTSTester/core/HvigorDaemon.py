@@ -0,0 +1,164 @@
+"""
+hvigor守护进程管理模块
+
+每个库在需要hvigor构建时（配置脚本和ohpm install完成、产物缓存未命中）租用一个守护进程
+名额，在项目目录中启动hvigor守护进程预热（评估工程），该库的所有hvigor调用复用这个
+守护进程，库准备完成后（无论成功或失败）通过`--stop-daemon`确定地关闭，不会在多个库
+之间累积残留的守护进程。预热通过run_command在后台线程中执行，有超时、写入该库的日志，
+中断时随其他子进程一起终止。
+
+同一主机上存活的守护进程数不超过HVIGOR_MAX_DAEMONS，名额通过HVIGOR_DAEMON_LOCK_DIR
+下的锁文件在并行工作进程之间共享。没有空闲名额时不等待，该库的hvigor调用改用
+`--no-daemon`。
+
+使用方法:
+    from core.HvigorDaemon import get_hvigor_daemon_manager
+    daemon = get_hvigor_daemon_manager().lease(project_dir, library_name)
+    try:
+        daemon.warm_up()
+        ...
+        daemon.wait_ready()
+        BuildPlan(daemon=daemon.enabled).run(project_dir)
+    finally:
+        daemon.stop()
+"""
+import os
+import subprocess
+import threading
+
+from core.CommandRunner import run_command, CommandAborted
+from utils.config import node_path, hvigor_path, HVIGOR_MAX_DAEMONS, HVIGOR_DAEMON_LOCK_DIR
+from utils.file_lock import FileLock, FileLockTimeout
+
+# 守护进程名额锁文件超过该时间（秒）未释放视为进程异常退出后的残留锁
+DAEMON_LOCK_STALE_AFTER = 6 * 3600
+
+# --stop-daemon的超时时间（秒）
+STOP_DAEMON_TIMEOUT = 60
+
+
+class HvigorDaemon:
+    """一个项目的hvigor守护进程租约"""
+
+    def __init__(self, project_dir, slot_lock=None, library_name=None):
+        """
+        参数:
+            project_dir: 项目目录
+            slot_lock: 已获取的守护进程名额锁，为None时表示不使用守护进程
+            library_name: 库名，关闭守护进程的输出写入该库的日志
+        """
+        self.project_dir = project_dir
+        self.library_name = library_name
+        self._slot_lock = slot_lock
+        self._warm_up_thread = None
+        self._warm_up_abort_reason = None
+        self._started = False
+
+    @property
+    def enabled(self):
+        """该库的hvigor调用是否使用守护进程"""
+        return self._slot_lock is not None
+
+    def warm_up(self):
+        """
+        在后台启动守护进程并评估工程，重复调用只启动一次
+
+        必须在配置脚本和ohpm install完成之后调用，避免hvigor评估正在改写的工程。
+        """
+        if not self.enabled or self._started or not os.path.isdir(self.project_dir):
+            return
+        self._started = True
+        self._warm_up_thread = threading.Thread(target=self._run_warm_up, name="hvigor-warm-up", daemon=True)
+        self._warm_up_thread.start()
+        print(f"hvigor守护进程预热: {self.project_dir}")
+
+    def _run_warm_up(self):
+        try:
+            run_command([node_path, hvigor_path, "tasks", "--daemon"], "hvigor", self.library_name,
+                        cwd=self.project_dir, check=False, echo=False,
+                        should_abort=lambda: self._warm_up_abort_reason)
+        except CommandAborted:
+            pass
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"hvigor守护进程预热失败: {str(e)}")
+
+    def _abort_warm_up(self, reason):
+        """终止仍在运行的预热（整个进程树）并等待其结束"""
+        if self._warm_up_thread is None:
+            return
+        self._warm_up_abort_reason = reason
+        self._warm_up_thread.join(STOP_DAEMON_TIMEOUT)
+        self._warm_up_thread = None
+
+    def wait_ready(self, timeout=STOP_DAEMON_TIMEOUT * 5):
+        """等待预热完成后再开始构建，避免与预热同时评估工程"""
+        if self._warm_up_thread is None:
+            return
+        self._warm_up_thread.join(timeout)
+        if self._warm_up_thread.is_alive():
+            print("hvigor守护进程预热超时，终止预热后开始构建")
+            self._abort_warm_up("预热超时")
+
+    def stop(self):
+        """关闭该项目的守护进程并归还名额"""
+        if not self.enabled:
+            return
+        try:
+            self._abort_warm_up("库准备结束")
+            # 构建调用也可能启动守护进程，只要项目目录存在就关闭
+            if os.path.isdir(self.project_dir):
+                run_command([node_path, hvigor_path, "--stop-daemon"], "hvigor", self.library_name,
+                            cwd=self.project_dir, timeout=STOP_DAEMON_TIMEOUT, check=False, echo=False)
+                print(f"已关闭hvigor守护进程: {self.project_dir}")
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"关闭hvigor守护进程失败: {str(e)}")
+        finally:
+            self._slot_lock.release()
+            self._slot_lock = None
+
+
+class HvigorDaemonManager:
+    """限制主机上存活的hvigor守护进程数量"""
+
+    def __init__(self, max_daemons=HVIGOR_MAX_DAEMONS, lock_dir=HVIGOR_DAEMON_LOCK_DIR):
+        """
+        参数:
+            max_daemons: 同时存活的守护进程上限，0表示不使用守护进程
+            lock_dir: 名额锁文件目录
+        """
+        self.max_daemons = max(0, int(max_daemons or 0))
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+
+    def lease(self, project_dir, library_name=None):
+        """
+        为项目租用一个守护进程名额，没有空闲名额时返回不使用守护进程的租约
+
+        租约使用完毕后必须调用stop()关闭守护进程并归还名额。
+        """
+        with self._lock:
+            for slot in range(self.max_daemons):
+                slot_lock = FileLock(os.path.join(self.lock_dir, f"daemon-{slot}.lock"),
+                                     timeout=0, stale_after=DAEMON_LOCK_STALE_AFTER)
+                try:
+                    slot_lock.acquire()
+                except FileLockTimeout:
+                    continue
+                return HvigorDaemon(project_dir, slot_lock, library_name)
+        if self.max_daemons:
+            print(f"hvigor守护进程已达上限 ({self.max_daemons})，本库使用--no-daemon构建")
+        return HvigorDaemon(project_dir, library_name=library_name)
+
+
+# 进程级守护进程管理器
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_hvigor_daemon_manager():
+    """获取进程级的hvigor守护进程管理器"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = HvigorDaemonManager()
+        return _manager
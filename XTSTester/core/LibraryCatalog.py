@@ -0,0 +1,279 @@
+"""
+三方库目录模块
+
+将三方库测试表(Excel)解析一次后常驻内存，并提供按库名、owner、仓库组、
+仓库名和子目录的索引查询。Excel文件的mtime/大小变化时会重新计算内容哈希，
+只有内容真正变化时才重新解析。
+
+解析结果会以内容哈希为键缓存到磁盘(LIBRARY_CATALOG_CACHE_FILE)，冷启动时
+直接加载缓存，只有Excel内容变化时才回退到pandas解析。
+
+使用方法:
+    from core.LibraryCatalog import get_library_catalog
+    catalog = get_library_catalog()
+    owner, name, sub_dir = catalog.get_repo_info("commonmark")
+"""
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import defaultdict, namedtuple
+
+from core.ReadExcel import parse_git_url
+from utils.config import EXCEL_FILE_PATH, LIBRARY_CATALOG_CACHE_FILE
+
+# 磁盘缓存格式版本，条目结构变化时需要递增
+CATALOG_CACHE_VERSION = 1
+
+# 支持的仓库组
+REPO_GROUPS = ("openharmony-sig", "openharmony-tpc", "openharmony_tpc_samples")
+
+# 单个库的目录条目
+LibraryEntry = namedtuple("LibraryEntry", ["name", "url", "owner", "repo", "sub_dir", "group"])
+
+
+def get_repo_group(owner, repo):
+    """根据owner和仓库名确定库所属的仓库组，无法确定时返回None"""
+    if repo == "openharmony_tpc_samples":
+        return "openharmony_tpc_samples"
+    if owner == "openharmony-sig":
+        return "openharmony-sig"
+    if owner == "openharmony-tpc":
+        return "openharmony-tpc"
+    return None
+
+
+def compute_file_hash(file_path):
+    """计算文件内容的SHA256哈希"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class LibraryCatalog:
+    """三方库目录，Excel内容变化时自动失效并重新加载"""
+
+    def __init__(self, excel_path=EXCEL_FILE_PATH, cache_file=LIBRARY_CATALOG_CACHE_FILE):
+        self.excel_path = excel_path
+        self.cache_file = cache_file
+        self._lock = threading.RLock()
+        self._stat_key = None
+        self._content_hash = None
+        self._entries = []
+        self._by_name = {}
+        self._by_lower_name = {}
+        self._by_owner = {}
+        self._by_group = {}
+        self._by_repo = {}
+        self._by_sub_dir = {}
+
+    # ---------- 加载与失效 ----------
+
+    def _ensure_loaded(self):
+        """检查Excel文件是否变化，必要时重新加载"""
+        with self._lock:
+            if not os.path.exists(self.excel_path):
+                print(f"错误：找不到Excel文件 {self.excel_path}")
+                sys.exit(1)
+
+            stat = os.stat(self.excel_path)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._stat_key:
+                return
+
+            content_hash = compute_file_hash(self.excel_path)
+            if content_hash != self._content_hash:
+                entries = self._load_cache(content_hash)
+                if entries is None:
+                    entries = self._parse_entries(self._parse_workbook())
+                    self._save_cache(content_hash, entries)
+                self._build_index(entries)
+                self._content_hash = content_hash
+            self._stat_key = stat_key
+
+    def _load_cache(self, content_hash):
+        """加载与内容哈希匹配的磁盘缓存，不匹配或损坏时返回None"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, "rb") as f:
+                data = pickle.load(f)
+            if (data.get("version") != CATALOG_CACHE_VERSION or
+                    data.get("hash") != content_hash):
+                return None
+            return [LibraryEntry(*item) for item in data["entries"]]
+        except Exception as e:
+            print(f"警告：读取三方库目录缓存失败，将重新解析Excel: {str(e)}")
+            return None
+
+    def _save_cache(self, content_hash, entries):
+        """将解析结果写入磁盘缓存（先写临时文件再替换，避免多进程读到半个文件）"""
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump({
+                    "version": CATALOG_CACHE_VERSION,
+                    "hash": content_hash,
+                    "entries": [tuple(entry) for entry in entries]
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"警告：写入三方库目录缓存失败: {str(e)}")
+
+    def _parse_workbook(self):
+        """解析Excel文件，返回(库名, URL)列表"""
+        # 只有缓存失效时才需要pandas，延迟导入以加快冷启动
+        import pandas as pd
+
+        try:
+            df = pd.read_excel(self.excel_path, sheet_name=0)
+        except Exception as e:
+            print(f"读取Excel文件出错: {str(e)}")
+            sys.exit(1)
+
+        # 检查是否有"三方库名称"列
+        if "三方库名称" not in df.columns:
+            print("错误：Excel文件中没有'三方库名称'列")
+            sys.exit(1)
+
+        # 检查是否有"URL"列
+        if "URL" not in df.columns:
+            print("错误：Excel文件中没有'URL'列")
+            sys.exit(1)
+
+        rows = []
+        for lib_name, url in zip(df["三方库名称"], df["URL"]):
+            if pd.notna(lib_name) and pd.notna(url):
+                rows.append((lib_name, url))
+        return rows
+
+    @staticmethod
+    def _parse_entries(rows):
+        """将(库名, URL)列表解析为目录条目，跳过无效URL"""
+        entries = []
+        for lib_name, url in rows:
+            # 检查URL是否有效
+            owner, repo, sub_dir = parse_git_url(url)
+            if not owner or not repo:
+                print(f"警告：跳过无效URL的库 {lib_name} - {url}")
+                continue
+            entries.append(LibraryEntry(lib_name, url, owner, repo, sub_dir or "", get_repo_group(owner, repo)))
+        return entries
+
+    def _build_index(self, entries):
+        """根据目录条目构建各个索引"""
+        by_name = {}
+        by_lower_name = {}
+        by_owner = defaultdict(list)
+        by_group = defaultdict(list)
+        by_repo = defaultdict(list)
+        by_sub_dir = defaultdict(list)
+
+        for entry in entries:
+            lib_name = entry.name
+            owner = entry.owner
+            repo = entry.repo
+            by_name[lib_name] = entry
+            by_lower_name.setdefault(str(lib_name).lower(), entry)
+            by_owner[owner].append(entry)
+            if entry.group:
+                by_group[entry.group].append(entry)
+            by_repo[repo.lower()].append(entry)
+            if entry.sub_dir:
+                by_sub_dir[entry.sub_dir.lower()].append(entry)
+
+        if not entries:
+            print("警告：Excel文件中没有找到任何库")
+            sys.exit(1)
+
+        self._entries = entries
+        self._by_name = by_name
+        self._by_lower_name = by_lower_name
+        self._by_owner = dict(by_owner)
+        self._by_group = dict(by_group)
+        self._by_repo = dict(by_repo)
+        self._by_sub_dir = dict(by_sub_dir)
+        print(f"已加载三方库目录: {len(entries)} 个库")
+
+    def invalidate(self):
+        """强制下次访问时重新加载"""
+        with self._lock:
+            self._stat_key = None
+            self._content_hash = None
+
+    # ---------- 查询接口 ----------
+
+    def libraries(self):
+        """返回所有库名列表（保持Excel中的顺序）"""
+        self._ensure_loaded()
+        return [entry.name for entry in self._entries]
+
+    def urls(self):
+        """返回库名到URL的字典"""
+        self._ensure_loaded()
+        return {entry.name: entry.url for entry in self._entries}
+
+    def get(self, library_name):
+        """按库名获取目录条目，不存在时返回None"""
+        self._ensure_loaded()
+        return self._by_name.get(library_name)
+
+    def get_repo_info(self, library_name):
+        """按库名获取(owner, name, sub_dir)，不存在时返回(None, None, None)"""
+        entry = self.get(library_name)
+        if entry is None:
+            return None, None, None
+        return entry.owner, entry.repo, entry.sub_dir
+
+    def find_by_lower_name(self, library_name):
+        """不区分大小写按库名查找"""
+        self._ensure_loaded()
+        return self._by_lower_name.get(str(library_name).lower())
+
+    def by_owner(self, owner):
+        """返回指定owner下的所有条目"""
+        self._ensure_loaded()
+        return list(self._by_owner.get(owner, []))
+
+    def by_group(self, repo_group):
+        """返回指定仓库组下的所有条目"""
+        self._ensure_loaded()
+        return list(self._by_group.get(repo_group, []))
+
+    def by_repo(self, repo_name):
+        """返回指定仓库名（不区分大小写）下的所有条目"""
+        self._ensure_loaded()
+        return list(self._by_repo.get(str(repo_name).lower(), []))
+
+    def by_sub_dir(self, sub_dir):
+        """返回指定子目录（不区分大小写）对应的所有条目"""
+        self._ensure_loaded()
+        return list(self._by_sub_dir.get(str(sub_dir).lower(), []))
+
+    def fuzzy_match(self, search_term):
+        """模糊匹配库名称，搜索词为空时返回所有库"""
+        libraries = self.libraries()
+        if not search_term:
+            return libraries
+        search_term = search_term.lower()
+        return [lib for lib in libraries if search_term in str(lib).lower()]
+
+
+# 进程级目录实例
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_library_catalog():
+    """获取进程级的三方库目录实例"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = LibraryCatalog(EXCEL_FILE_PATH)
+        return _catalog
@@ -3,13 +3,19 @@ import re
 import json
 import shutil
 
-from core.ReadExcel import get_repo_info, read_libraries_from_excel, fuzzy_match_libraries
+from core.ReadExcel import get_repo_info, fuzzy_match_libraries
+from core.LibraryCatalog import get_library_catalog
 from utils.config import selected_sdk_version
 
 
-def _run_config_scripts():
-    """运行配置脚本"""
-    print("开始更新项目配置...")
+def _run_config_scripts(ctx):
+    """
+    运行配置脚本
+
+    参数:
+        ctx: ProjectContext，所有配置文件都基于ctx.project_dir定位，不依赖当前工作目录
+    """
+    print(f"开始更新项目配置: {ctx.project_dir}")
 
     # 重新导入以确保获取最新的值
     from utils.config import selected_sdk_version, selected_api_version
@@ -18,30 +24,32 @@ def _run_config_scripts():
         print("错误：未设置SDK版本，请确保在主程序开始时输入了正确的SDK版本")
         return
 
+    print(f"使用 {ctx.repo_type} 仓库类型的签名配置和包名: {ctx.bundle_name}")
+
     # 修改build-profile.json5的SDK版本配置
-    _modify_build_profile(selected_sdk_version, selected_api_version)
+    _modify_build_profile(ctx, selected_sdk_version, selected_api_version)
 
     # 更新build-profile.json5的签名配置
-    _update_config()
+    _update_config(ctx)
 
     # 更新app.json5的bundleName
-    _update_appname()
+    _update_appname(ctx)
 
     # 注释特定库的armeabi-v7配置
-    _comment_armeabi_v7()
+    _comment_armeabi_v7(ctx)
 
     # 执行特定库的额外配置
-    _run_library_specific_scripts()
+    _run_library_specific_scripts(ctx)
 
     print("项目配置更新完成")
 
 
-def _comment_armeabi_v7():
+def _comment_armeabi_v7(ctx):
     """注释特定库的armeabi-v7配置"""
     print("开始检查并处理armeabi-v7配置...")
 
     # 获取当前库名
-    current_library = _get_current_library_name()
+    current_library = ctx.library_name
     if not current_library:
         print("无法确定当前库名，跳过armeabi-v7配置处理")
         return
@@ -50,8 +58,8 @@ def _comment_armeabi_v7():
     current_library_lower = current_library.lower()
     print(f"正在处理库: {current_library}")
 
-    # 获取当前工作目录
-    current_dir = os.getcwd()
+    # 项目根目录
+    current_dir = ctx.project_dir
 
     # 定义库名和对应的配置文件路径映射
     library_config_paths = {
@@ -138,10 +146,10 @@ def _process_armeabi_config(config_path):
         print(f"警告：找不到文件 {config_path}")
 
 
-def _modify_build_profile(sdk_version, api_version):
+def _modify_build_profile(ctx, sdk_version, api_version):
     """修改build-profile.json5文件，更新SDK版本配置"""
     try:
-        build_profile_path = os.path.join(os.getcwd(), 'build-profile.json5')
+        build_profile_path = ctx.path('build-profile.json5')
         if not os.path.exists(build_profile_path):
             print(f"警告：找不到build-profile.json5文件: {build_profile_path}")
             return False
@@ -185,7 +193,7 @@ def _modify_build_profile(sdk_version, api_version):
             print(f"成功修改build-profile.json5文件")
 
             # 新增：处理hvigor目录
-            hvigor_dir = os.path.join(os.getcwd(), 'hvigor')
+            hvigor_dir = ctx.path('hvigor')
             if os.path.exists(hvigor_dir):
                 # 删除hvigor-wrapper.js
                 hvigor_wrapper_path = os.path.join(hvigor_dir, 'hvigor-wrapper.js')
@@ -214,7 +222,7 @@ def _modify_build_profile(sdk_version, api_version):
                     print(f"已更新 {hvigor_config_path}")
 
             # 新增：修改工程级oh-package.json5
-            oh_package_path = os.path.join(os.getcwd(), 'oh-package.json5')
+            oh_package_path = ctx.path('oh-package.json5')
             if os.path.exists(oh_package_path):
                 with open(oh_package_path, 'r', encoding='utf-8') as f:
                     oh_package_content = f.read()
@@ -269,7 +277,7 @@ def _modify_build_profile(sdk_version, api_version):
 
             # 同样处理hvigor目录和oh-package.json5
             # 这部分逻辑与上面相同，可以提取为单独的函数
-            _process_hvigor_and_oh_package()
+            _process_hvigor_and_oh_package(ctx)
 
             return True
 
@@ -278,11 +286,11 @@ def _modify_build_profile(sdk_version, api_version):
         return False
 
 
-def _process_hvigor_and_oh_package():
+def _process_hvigor_and_oh_package(ctx):
     """处理hvigor目录和oh-package.json5文件"""
     try:
         # 处理hvigor目录
-        hvigor_dir = os.path.join(os.getcwd(), 'hvigor')
+        hvigor_dir = ctx.path('hvigor')
         if os.path.exists(hvigor_dir):
             # 删除hvigor-wrapper.js
             hvigor_wrapper_path = os.path.join(hvigor_dir, 'hvigor-wrapper.js')
@@ -310,7 +318,7 @@ def _process_hvigor_and_oh_package():
                 print(f"已更新 {hvigor_config_path}")
 
         # 修改工程级oh-package.json5
-        oh_package_path = os.path.join(os.getcwd(), 'oh-package.json5')
+        oh_package_path = ctx.path('oh-package.json5')
         if os.path.exists(oh_package_path):
             with open(oh_package_path, 'r', encoding='utf-8') as f:
                 oh_package_content = f.read()
@@ -354,10 +362,11 @@ def _add_or_update_model_version(content, version):
     return content
 
 
-def _update_config():
+def _update_config(ctx):
     """更新build-profile.json5文件中的签名配置，对应update_config.js的功能"""
+    new_signing_config = ctx.signing_config
     try:
-        config_path = os.path.join(os.getcwd(), 'build-profile.json5')
+        config_path = ctx.path('build-profile.json5')
         if not os.path.exists(config_path):
             print(f"警告：找不到build-profile.json5文件: {config_path}")
             return False
@@ -382,15 +391,6 @@ def _update_config():
                     if 'runtimeOS' not in product:
                         product['runtimeOS'] = "HarmonyOS"
 
-            # 根据当前库的仓库类型选择签名配置和包名
-            repo_type, new_signing_config, bundle_name = _determine_repo_type_and_config()
-
-            # 设置全局变量，供其他函数使用
-            global BUNDLE_NAME
-            BUNDLE_NAME = bundle_name
-
-            print(f"使用 {repo_type} 仓库类型的签名配置和包名: {BUNDLE_NAME}")
-
             # 查找同名配置索引
             existing_index = -1
             for i, config_item in enumerate(config['app']['signingConfigs']):
@@ -419,15 +419,24 @@ def _update_config():
         return False
 
 
-def _determine_repo_type_and_config():
-    """根据当前库的仓库类型选择签名配置和包名"""
+def _determine_repo_type_and_config(library_name):
+    """根据库的仓库类型选择签名配置和包名"""
     # 导入配置
     from utils.config import SIGNING_CONFIG_SIG, SIGNING_CONFIG_TPC, SIGNING_CONFIG_SAMPLES
     from utils.config import BUNDLE_NAME_SIG, BUNDLE_NAME_TPC, BUNDLE_NAME_SAMPLES
 
     try:
-        # 获取当前库名
-        current_library = _get_current_library_name()
+        # Excel中存在该库时直接使用其仓库组，不再模糊匹配
+        entry = get_library_catalog().get(library_name)
+        group_configs = {
+            "openharmony-sig": ("sig", SIGNING_CONFIG_SIG, BUNDLE_NAME_SIG),
+            "openharmony-tpc": ("tpc", SIGNING_CONFIG_TPC, BUNDLE_NAME_TPC),
+            "openharmony_tpc_samples": ("samples", SIGNING_CONFIG_SAMPLES, BUNDLE_NAME_SAMPLES),
+        }
+        if entry is not None and entry.group in group_configs:
+            return group_configs[entry.group]
+
+        current_library = library_name
 
         # 默认使用SIG配置
         repo_type = "sig"
@@ -491,38 +500,39 @@ def _determine_repo_type_and_config():
         return "sig", SIGNING_CONFIG_SIG, BUNDLE_NAME_SIG
 
 
-def _get_current_library_name():
-    """获取当前正在测试的库名称"""
+def _get_current_library_name(project_dir):
+    """根据项目目录名推断库名称（仅用于没有ProjectContext的场景）"""
     try:
-        # 从当前目录名称推断
-        current_dir = os.path.basename(os.getcwd())
+        # 从目录名称推断
+        current_dir = os.path.basename(os.path.normpath(project_dir))
+        current_dir_lower = current_dir.lower()
 
-        # 获取所有库名
-        libraries, _, _ = read_libraries_from_excel()
+        catalog = get_library_catalog()
 
         # 首先尝试直接匹配当前目录与库名
-        for lib in libraries:
-            if lib.lower() == current_dir.lower():
-                print(f"通过目录名精确匹配到库: {lib}")
-                return lib
+        entry = catalog.find_by_lower_name(current_dir)
+        if entry:
+            print(f"通过目录名精确匹配到库: {entry.name}")
+            return entry.name
 
         # 如果没有精确匹配，尝试部分匹配
+        libraries = catalog.libraries()
         for lib in libraries:
-            if lib.lower() in current_dir.lower() or current_dir.lower() in lib.lower():
+            if lib.lower() in current_dir_lower or current_dir_lower in lib.lower():
                 print(f"通过目录名部分匹配到库: {lib}")
                 return lib
 
-        libraries, _, _ = read_libraries_from_excel()
-        for lib in libraries:
-            _, name, sub_dir = get_repo_info(lib)
-            # 检查仓库名是否匹配
-            if name and name.lower() == current_dir.lower():
-                print(f"通过仓库名匹配到库: {lib}")
-                return lib
-            # 检查子目录是否匹配
-            if sub_dir and sub_dir.lower() == current_dir.lower():
-                print(f"通过子目录匹配到库: {lib}")
-                return lib
+        # 检查仓库名是否匹配
+        entries = catalog.by_repo(current_dir)
+        if entries:
+            print(f"通过仓库名匹配到库: {entries[0].name}")
+            return entries[0].name
+
+        # 检查子目录是否匹配
+        entries = catalog.by_sub_dir(current_dir)
+        if entries:
+            print(f"通过子目录匹配到库: {entries[0].name}")
+            return entries[0].name
 
         # 如果无法确定，返回默认库（如果有）
         if libraries:
@@ -536,12 +546,12 @@ def _get_current_library_name():
         print(f"获取当前库名时出错: {str(e)}")
         return None
 
-def _run_library_specific_scripts():
+def _run_library_specific_scripts(ctx):
     """执行特定库的额外配置脚本"""
     print("开始执行特定库的额外配置...")
 
     # 获取当前库名
-    current_library = _get_current_library_name()
+    current_library = ctx.library_name
     if not current_library:
         print("无法确定当前库名，跳过特定配置")
         return
@@ -550,8 +560,8 @@ def _run_library_specific_scripts():
     current_library_lower = current_library.lower()
     print(f"当前处理的库: {current_library}")
 
-    # 获取当前工作目录
-    current_dir = os.getcwd()
+    # 项目根目录
+    current_dir = ctx.project_dir
 
     # 处理mqtt库 - 当组件名匹配时执行
     if "mqtt" in current_library_lower:
@@ -578,17 +588,14 @@ def _run_library_specific_scripts():
         mqtt_path = os.path.join(current_dir, 'ohos_Mqtt', 'src', 'main', 'cpp', 'paho.mqtt.c')
         if os.path.exists(mqtt_path):
             try:
-                # 保存当前目录
-                current_dir = os.getcwd()
-                # 切换到mqtt目录
-                os.chdir(mqtt_path)
-                if os.path.exists('modify.sh'):
+                if os.path.exists(os.path.join(mqtt_path, 'modify.sh')):
                     # 使用subprocess执行脚本，并处理可能的交互
                     import subprocess
                     import time
 
                     # 启动脚本进程
                     process = subprocess.Popen(['bash', 'modify.sh'],
+                                               cwd=mqtt_path,
                                                stdin=subprocess.PIPE,
                                                stdout=subprocess.PIPE,
                                                stderr=subprocess.PIPE,
@@ -653,9 +660,6 @@ target_include_directories(pahomqttc PRIVATE ${NATIVERENDER_ROOT_PATH}/thirdpart
                     print(f"警告：找不到CMakeLists.txt文件: {cmake_file}")
             except Exception as e:
                 print(f"处理mqtt库时出错: {str(e)}")
-            finally:
-                # 确保返回原始目录
-                os.chdir(current_dir)
         else:
             print(f"警告：找不到mqtt库目录: {mqtt_path}")
 
@@ -665,20 +669,14 @@ target_include_directories(pahomqttc PRIVATE ${NATIVERENDER_ROOT_PATH}/thirdpart
         coap_path = os.path.join(current_dir, 'src', 'main', 'cpp', 'thirdModule')
         if os.path.exists(coap_path):
             try:
-                # 保存当前目录
-                current_dir = os.getcwd()
-                # 切换到coap目录
-                os.chdir(coap_path)
-                if os.path.exists('modify.sh'):
-                    os.system('./modify.sh')
+                if os.path.exists(os.path.join(coap_path, 'modify.sh')):
+                    import subprocess
+                    subprocess.run('./modify.sh', cwd=coap_path, shell=True)
                     print("成功执行coap库的modify.sh脚本")
                 else:
                     print(f"警告：找不到coap库的modify.sh脚本: {coap_path}")
             except Exception as e:
                 print(f"处理coap库时出错: {str(e)}")
-            finally:
-                # 确保返回原始目录
-                os.chdir(current_dir)
         else:
             print(f"警告：找不到coap库目录: {coap_path}")
 
@@ -727,11 +725,12 @@ def clean_json5_content(content):
     return content_no_comments
 
 
-def _update_appname():
+def _update_appname(ctx):
     """更新app.json5中的bundleName，对应update_appname.js的功能"""
+    bundle_name = ctx.bundle_name
     try:
         # 处理config.json
-        config_path = os.path.join(os.getcwd(), 'config.json')
+        config_path = ctx.path('config.json')
         if os.path.exists(config_path):
             try:
                 with open(config_path, 'r', encoding='utf-8') as f:
@@ -747,7 +746,7 @@ def _update_appname():
                 print(f"处理config.json时出错: {str(e)}")
 
         # 处理app.json5
-        app_config_path = os.path.join(os.getcwd(), 'AppScope', 'app.json5')
+        app_config_path = ctx.path('AppScope', 'app.json5')
         if os.path.exists(app_config_path):
             try:
                 # 读取文件内容
@@ -761,7 +760,7 @@ def _update_appname():
 
                     # 修改bundleName
                     if 'app' in app_data and 'bundleName' in app_data['app']:
-                        app_data['app']['bundleName'] = BUNDLE_NAME
+                        app_data['app']['bundleName'] = bundle_name
 
                     # 写回文件
                     with open(app_config_path, 'w', encoding='utf-8') as f:
@@ -777,7 +776,7 @@ def _update_appname():
                     # 使用正则表达式修改bundleName
                     content = re.sub(
                         r'"bundleName"\s*:\s*"[^"]*"',
-                        '"bundleName": "{bundle_name}"',
+                        f'"bundleName": "{bundle_name}"',
                         content
                     )
 
@@ -0,0 +1,289 @@
+"""
+ohpm依赖缓存模块
+
+按项目中所有oh-package.json5和oh-package-lock.json5的内容（以及使用的registry）计算
+依赖哈希，`ohpm install`完成后将各模块的oh_modules目录和生成的lock文件存入
+OHPM_CACHE_DIR/<哈希>。依赖没有变化的库（包括依赖相同的不同库）直接从缓存恢复，
+不再访问registry；恢复时尽量使用硬链接，不复制文件内容。
+
+oh_modules中的符号链接和目录联接（Windows下ohpm用联接链接本地file:模块和.ohpm中的包）
+不按内容存入缓存，只在清单中记录链接目标（项目内的目标记录为相对项目目录的路径），
+恢复时重新创建，本地模块（如被测库自身的library模块）始终指向当前检出的源码。
+file:依赖的.har等归档文件按内容参与依赖哈希。
+
+缓存目录在多个XTSTester检出和并行工作进程之间共享，写入通过锁文件互斥，
+先写入临时目录再重命名，读取方不会看到写了一半的缓存。
+
+使用方法:
+    from core.OhpmCache import dependency_hash, restore_dependencies, store_dependencies
+    deps_hash = dependency_hash(project_dir, registry)
+    if not restore_dependencies(project_dir, deps_hash):
+        ...  # ohpm install
+        store_dependencies(project_dir, deps_hash, registry)
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import json5
+
+from utils.config import OHPM_CACHE_DIR
+from utils.file_lock import FileLock
+
+# 计算依赖哈希时跳过的目录
+_SKIP_DIRS = {"oh_modules", "node_modules", "build", ".hvigor", ".git", ".idea", ".preview"}
+
+# 参与依赖哈希的文件
+_PACKAGE_FILES = ("oh-package.json5", "oh-package-lock.json5")
+
+# 缓存中记录快照内容的清单文件
+_MANIFEST = "manifest.json"
+
+# 缓存格式版本，参与依赖哈希；格式变化后旧缓存（按内容保存了链接的快照）不再命中
+_CACHE_FORMAT = "2"
+
+# oh-package.json5中可能包含file:依赖的字段
+_DEPENDENCY_FIELDS = ("dependencies", "devDependencies", "dynamicDependencies", "overrides")
+
+# Windows下目录联接等重解析点的文件属性
+_FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+
+def _walk_project(project_dir):
+    """遍历项目目录（跳过构建产物和依赖目录），产出(目录, 子目录列表, 文件列表)"""
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(d for d in dirs if d not in _SKIP_DIRS)
+        yield root, dirs, sorted(files)
+
+
+def _local_archive_dependencies(package_file):
+    """返回oh-package.json5中指向文件（.har/.tgz等）的file:依赖的路径"""
+    try:
+        with open(package_file, "r", encoding="utf-8") as f:
+            package = json5.load(f)
+    except (OSError, ValueError) as e:
+        print(f"解析 {package_file} 的file:依赖失败: {str(e)}")
+        return []
+    paths = []
+    for field in _DEPENDENCY_FIELDS:
+        dependencies = package.get(field) if isinstance(package, dict) else None
+        if not isinstance(dependencies, dict):
+            continue
+        for spec in dependencies.values():
+            if isinstance(spec, str) and spec.startswith("file:"):
+                path = os.path.normpath(os.path.join(os.path.dirname(package_file), spec[len("file:"):]))
+                # 目录依赖恢复时重新链接，不参与哈希
+                if os.path.isfile(path):
+                    paths.append(path)
+    return sorted(set(paths))
+
+
+def _update_file_digest(digest, file_path, name):
+    digest.update(name.replace(os.sep, "/").encode("utf-8"))
+    file_digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_digest.update(chunk)
+    digest.update(file_digest.digest())
+
+
+def dependency_hash(project_dir, registry=""):
+    """返回项目依赖声明（含file:依赖的归档文件内容）的哈希"""
+    digest = hashlib.sha256(f"{_CACHE_FORMAT}\0{registry}".encode("utf-8"))
+    for root, _, files in _walk_project(project_dir):
+        for filename in files:
+            if filename not in _PACKAGE_FILES:
+                continue
+            file_path = os.path.join(root, filename)
+            _update_file_digest(digest, file_path, os.path.relpath(file_path, project_dir))
+            if filename == "oh-package.json5":
+                for archive_path in _local_archive_dependencies(file_path):
+                    _update_file_digest(digest, archive_path, os.path.relpath(archive_path, project_dir))
+    return digest.hexdigest()
+
+
+def _installed_entries(project_dir):
+    """返回ohpm install生成的oh_modules目录和lock文件（相对项目目录的路径）"""
+    entries = []
+    for root, _, files in _walk_project(project_dir):
+        if os.path.isdir(os.path.join(root, "oh_modules")):
+            entries.append(os.path.relpath(os.path.join(root, "oh_modules"), project_dir))
+        if "oh-package-lock.json5" in files:
+            entries.append(os.path.relpath(os.path.join(root, "oh-package-lock.json5"), project_dir))
+    return entries
+
+
+def _link_or_copy(src, dst):
+    """优先创建硬链接，跨磁盘或文件系统不支持时复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _is_link(path):
+    """是否为符号链接或目录联接（shutil.copytree会跟随联接按内容复制）"""
+    if os.path.islink(path):
+        return True
+    isjunction = getattr(os.path, "isjunction", None)
+    if isjunction is not None:
+        return isjunction(path)
+    try:
+        return bool(getattr(os.lstat(path), "st_file_attributes", 0) & _FILE_ATTRIBUTE_REPARSE_POINT)
+    except OSError:
+        return False
+
+
+def _copy_entry(src, dst, on_link=None):
+    """复制文件或目录，目录中的链接不复制，交给on_link(链接路径)处理"""
+    if os.path.isdir(src):
+        def ignore_links(directory, names):
+            links = {name for name in names if _is_link(os.path.join(directory, name))}
+            if on_link is not None:
+                for name in sorted(links):
+                    on_link(os.path.join(directory, name))
+            return links
+        shutil.copytree(src, dst, ignore=ignore_links, copy_function=_link_or_copy)
+    else:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        _link_or_copy(src, dst)
+
+
+def _remove_entry(path):
+    if _is_link(path):
+        # 目录联接不能用os.remove删除
+        try:
+            os.remove(path)
+        except OSError:
+            os.rmdir(path)
+    elif os.path.isfile(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def _link_record(link_path, project_dir):
+    """返回链接的清单记录，项目内的目标记录为相对项目目录的路径"""
+    target = os.readlink(link_path)
+    if target.startswith("\\\\?\\"):
+        target = target[4:]
+    target = os.path.normpath(os.path.join(os.path.dirname(link_path), target))
+    project_dir = os.path.abspath(project_dir)
+    record = {"path": os.path.relpath(link_path, project_dir).replace(os.sep, "/")}
+    try:
+        in_project = os.path.commonpath([project_dir, target]) == project_dir
+    except ValueError:
+        # 不在同一个磁盘上
+        in_project = False
+    if in_project:
+        record["target"] = os.path.relpath(target, project_dir).replace(os.sep, "/")
+    else:
+        record["target"] = target
+        record["external"] = True
+    return record
+
+
+def _create_link(project_dir, record):
+    """按清单记录在项目中重新创建链接，不能创建链接时复制目标的当前内容"""
+    link_path = os.path.join(project_dir, record["path"])
+    target = record["target"] if record.get("external") else os.path.join(project_dir, record["target"])
+    if not os.path.exists(target):
+        raise OSError(f"链接目标不存在: {target}")
+    if os.path.lexists(link_path):
+        _remove_entry(link_path)
+    os.makedirs(os.path.dirname(link_path), exist_ok=True)
+    is_dir = os.path.isdir(target)
+    try:
+        if os.name == "nt" and is_dir:
+            # 与ohpm一致使用目录联接，不需要创建符号链接的权限
+            import _winapi
+            _winapi.CreateJunction(os.path.abspath(target), link_path)
+        else:
+            link_target = target if record.get("external") else os.path.relpath(target, os.path.dirname(link_path))
+            os.symlink(link_target, link_path, target_is_directory=is_dir)
+    except OSError:
+        if is_dir:
+            shutil.copytree(target, link_path, symlinks=True)
+        else:
+            shutil.copy2(target, link_path)
+
+
+def restore_dependencies(project_dir, deps_hash):
+    """
+    从缓存恢复项目的oh_modules和lock文件
+
+    返回:
+        缓存命中并恢复成功时返回True，否则返回False（调用方执行ohpm install）
+    """
+    cache_dir = os.path.join(OHPM_CACHE_DIR, deps_hash)
+    manifest_path = os.path.join(cache_dir, _MANIFEST)
+    if not os.path.exists(manifest_path):
+        return False
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        entries = manifest["entries"]
+        # 先清理项目中已有的依赖目录，避免残留旧版本的包
+        for entry in _installed_entries(project_dir):
+            if entry.endswith("oh_modules"):
+                _remove_entry(os.path.join(project_dir, entry))
+        for entry in entries:
+            target = os.path.join(project_dir, entry)
+            _remove_entry(target)
+            _copy_entry(os.path.join(cache_dir, "files", entry), target)
+        # 链接在所有目录恢复后再创建，指向oh_modules内的目标已经存在
+        for record in manifest.get("links", []):
+            _create_link(project_dir, record)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"从ohpm依赖缓存恢复失败，将重新安装: {str(e)}")
+        return False
+
+    print(f"ohpm依赖缓存命中 ({deps_hash[:12]})，已恢复 {len(entries)} 项")
+    return True
+
+
+def store_dependencies(project_dir, deps_hash, registry=""):
+    """
+    将ohpm install的结果存入缓存，已存在相同哈希的缓存时跳过
+
+    install生成或更新了lock文件时，安装后的依赖哈希与安装前不同，缓存同时以安装后的
+    哈希登记，下一次运行（项目中已有这些lock文件）也能命中。
+    """
+    entries = _installed_entries(project_dir)
+    if not entries:
+        return
+
+    for cache_hash in dict.fromkeys([deps_hash, dependency_hash(project_dir, registry)]):
+        _store_snapshot(project_dir, entries, cache_hash)
+
+
+def _store_snapshot(project_dir, entries, deps_hash):
+    cache_dir = os.path.join(OHPM_CACHE_DIR, deps_hash)
+    if os.path.exists(os.path.join(cache_dir, _MANIFEST)):
+        return
+
+    try:
+        os.makedirs(OHPM_CACHE_DIR, exist_ok=True)
+        with FileLock(cache_dir + ".lock", timeout=600):
+            if os.path.exists(os.path.join(cache_dir, _MANIFEST)):
+                return
+            tmp_dir = os.path.join(OHPM_CACHE_DIR, f".tmp-{uuid.uuid4().hex}")
+            links = []
+            try:
+                for entry in entries:
+                    _copy_entry(os.path.join(project_dir, entry), os.path.join(tmp_dir, "files", entry),
+                                on_link=lambda link_path: links.append(_link_record(link_path, project_dir)))
+                with open(os.path.join(tmp_dir, _MANIFEST), "w", encoding="utf-8") as f:
+                    json.dump({"entries": [entry.replace(os.sep, "/") for entry in entries], "links": links},
+                              f, indent=2)
+                _remove_entry(cache_dir)
+                os.replace(tmp_dir, cache_dir)
+            finally:
+                if os.path.exists(tmp_dir):
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+        print(f"ohpm依赖已存入缓存 ({deps_hash[:12]})")
+    except Exception as e:
+        print(f"写入ohpm依赖缓存失败: {str(e)}")
@@ -0,0 +1,90 @@
+"""
+项目上下文模块
+
+ProjectContext描述一个库在本次运行中的构建环境：库名、仓库信息、项目根目录、
+包名和签名配置。构建流水线（克隆、配置、构建、安装、测试）的各个函数都显式接收
+ProjectContext，不依赖进程的当前工作目录，因此多个库可以在同一进程的不同线程中
+同时配置和构建。
+
+使用方法:
+    from core.ProjectContext import ProjectContext
+    ctx = ProjectContext.for_library("commonmark")
+    if ctx:
+        print(ctx.project_dir, ctx.bundle_name)
+"""
+import os
+
+from colorama import Fore
+
+from core.LibraryCatalog import get_library_catalog
+from core.ModifyConfig import _determine_repo_type_and_config
+from utils.config import PROJECT_DIR
+
+
+def repo_clone_url(owner, repo):
+    """返回仓库的克隆地址"""
+    return f"https://gitcode.com/{owner}/{repo}.git"
+
+
+class ProjectContext:
+    """单个库的构建上下文，commit在仓库同步后填入"""
+    __slots__ = ("library_name", "owner", "repo", "sub_dir", "libraries_dir", "project_dir",
+                 "repo_type", "bundle_name", "signing_config", "commit")
+
+    def __init__(self, library_name, owner, repo, sub_dir, libraries_dir, project_dir,
+                 repo_type, bundle_name, signing_config):
+        self.library_name = library_name
+        self.owner = owner
+        self.repo = repo
+        self.sub_dir = sub_dir
+        self.libraries_dir = libraries_dir
+        self.project_dir = project_dir
+        self.repo_type = repo_type
+        self.bundle_name = bundle_name
+        self.signing_config = signing_config
+        self.commit = None
+
+    @property
+    def repo_dir(self):
+        """仓库克隆目录"""
+        return os.path.join(self.libraries_dir, self.repo)
+
+    @property
+    def clone_url(self):
+        """仓库克隆地址"""
+        return repo_clone_url(self.owner, self.repo)
+
+    def path(self, *parts):
+        """返回项目目录下的路径"""
+        return os.path.join(self.project_dir, *parts)
+
+    @classmethod
+    def for_library(cls, library_name, libraries_dir=None):
+        """
+        根据三方库目录构建上下文，无法获取仓库信息时返回None
+
+        参数:
+            library_name: Excel中的库名
+            libraries_dir: 仓库克隆的根目录，默认为PROJECT_DIR/Libraries
+        """
+        owner, repo, sub_dir = get_library_catalog().get_repo_info(library_name)
+        if not owner or not repo:
+            return None
+
+        libraries_dir = libraries_dir or os.path.join(PROJECT_DIR, "Libraries")
+        repo_dir = os.path.join(libraries_dir, repo)
+
+        # 特殊处理aki库，需要使用特定的单元测试目录
+        if repo == "aki":
+            project_dir = os.path.join(repo_dir, "test", "platform", "ohos", "unittests")
+            print(Fore.YELLOW + f"检测到aki库，将使用特定目录: {project_dir}" + Fore.RESET)
+        else:
+            project_dir = os.path.join(repo_dir, sub_dir) if sub_dir else repo_dir
+
+        repo_type, signing_config, bundle_name = _determine_repo_type_and_config(library_name)
+        return cls(library_name, owner, repo, sub_dir, libraries_dir, project_dir,
+                   repo_type, bundle_name, signing_config)
+
+    def __repr__(self):
+        return (f"ProjectContext(library_name={self.library_name!r}, repo={self.owner}/{self.repo}, "
+                f"sub_dir={self.sub_dir!r}, project_dir={self.project_dir!r}, bundle_name={self.bundle_name!r})")
@@ -1,50 +1,14 @@
-import os
 import sys
-import pandas as pd
-
-from utils.config import EXCEL_FILE_PATH
 
 
 def read_libraries_from_excel(library_name=None):
-    """从Excel文件中读取库列表"""
+    """从Excel文件中读取库列表（通过进程级三方库目录，不会重复解析Excel）"""
+    from core.LibraryCatalog import get_library_catalog
+
     try:
-        # 检查Excel文件是否存在
-        if not os.path.exists(EXCEL_FILE_PATH):
-            print(f"错误：找不到Excel文件 {EXCEL_FILE_PATH}")
-            sys.exit(1)
-
-        # 读取Excel文件
-        df = pd.read_excel(EXCEL_FILE_PATH, sheet_name=0)
-
-        # 检查是否有"三方库名称"列
-        if "三方库名称" not in df.columns:
-            print("错误：Excel文件中没有'三方库名称'列")
-            sys.exit(1)
-
-        # 检查是否有"URL"列
-        if "URL" not in df.columns:
-            print("错误：Excel文件中没有'URL'列")
-            sys.exit(1)
-
-        # 提取三方库名称列和URL列的数据
-        libraries = []
-        urls = {}
-
-        for index, row in df.iterrows():
-            lib_name = row["三方库名称"]
-            url = row["URL"]
-            if pd.notna(lib_name) and pd.notna(url):
-                # 检查URL是否有效
-                owner, name, _ = parse_git_url(url)
-                if owner and name:
-                    libraries.append(lib_name)
-                    urls[lib_name] = url
-                else:
-                    print(f"警告：跳过无效URL的库 {lib_name} - {url}")
-
-        if not libraries:
-            print("警告：Excel文件中没有找到任何库")
-            sys.exit(1)
+        catalog = get_library_catalog()
+        libraries = catalog.libraries()
+        urls = catalog.urls()
 
         # 如果没有指定库名，使用第一个库名
         component_name = library_name if library_name else libraries[0]
@@ -109,21 +73,16 @@ def get_repo_info(library_name):
     - name: 仓库名称
     - sub_dir: 子目录（如果有）
     """
+    from core.LibraryCatalog import get_library_catalog
+
     try:
-        # 获取库列表和URL字典
-        _, _, urls = read_libraries_from_excel()
+        owner, name, sub_dir = get_library_catalog().get_repo_info(library_name)
 
         # 检查指定的库是否存在
-        if library_name not in urls:
+        if not owner:
             print(f"错误：找不到库 {library_name} 的URL信息")
             return None, None, None
 
-        # 获取库的URL
-        url = urls[library_name]
-
-        # 解析URL
-        owner, name, sub_dir = parse_git_url(url)
-
         return owner, name, sub_dir
 
     except Exception as e:
@@ -142,33 +101,19 @@ def filter_library_by_repo_type(library_name, repo_type):
     返回:
         bool: 如果库属于指定的仓库类型，则返回True，否则返回False
     """
+    from core.LibraryCatalog import get_library_catalog
+
     try:
-        # 获取库的URL
-        _, _, urls = read_libraries_from_excel()
-        
-        if library_name not in urls:
+        entry = get_library_catalog().get(library_name)
+        if entry is None:
             return False
-            
-        url = urls[library_name]
-        
-        # 解析URL获取仓库信息
-        owner, name, _ = parse_git_url(url)
-        
-        if not owner or not name:
-            return False
-            
+
         # 根据仓库类型进行过滤
-        if repo_type == "openharmony-sig" and owner == "openharmony-sig":
-            return True
-        elif repo_type == "openharmony-tpc" and owner == "openharmony-tpc" and name != "openharmony_tpc_samples":
-            return True
-        elif repo_type == "openharmony_tpc_samples" and name == "openharmony_tpc_samples":
-            return True
-            
-        return False
-        
+        return entry.group == repo_type
+
     except Exception as e:
         print(f"过滤库时出错: {str(e)}")
+        return False
 
 
 def fuzzy_match_libraries(search_term):
@@ -181,22 +126,11 @@ def fuzzy_match_libraries(search_term):
     返回:
         匹配到的库名列表
     """
+    from core.LibraryCatalog import get_library_catalog
+
     try:
-        # 读取Excel文件中的所有库
-        libraries, _, urls = read_libraries_from_excel()
-        
-        # 如果搜索词为空，返回所有库
-        if not search_term:
-            return libraries
-            
-        # 转换为小写进行不区分大小写的匹配
-        search_term = search_term.lower()
-        
-        # 模糊匹配
-        matched_libraries = [lib for lib in libraries if search_term in lib.lower()]
-        
-        return matched_libraries
-        
+        return get_library_catalog().fuzzy_match(search_term)
+
     except Exception as e:
         print(f"模糊匹配库时出错: {str(e)}")
         return []
@@ -0,0 +1,117 @@
+"""
+仓库预取模块
+
+运行开始时按库的执行顺序，在有界线程池中提前克隆或快进即将执行的库的仓库，
+网络I/O与前面库的hvigor构建重叠进行。仓库按(owner, name)去重，openharmony_tpc_samples
+这样的单体仓库只获取一次；同一主机的并发连接数另有上限。构建某个库之前只需等待
+它自己的仓库就绪。
+
+使用方法:
+    from core.RepoPrefetch import RepoPrefetcher, set_repo_prefetcher
+    prefetcher = RepoPrefetcher(sync_repo, workers=4, per_host=2)
+    prefetcher.start(libraries)
+    set_repo_prefetcher(prefetcher)
+    ...
+    prefetcher.shutdown()
+"""
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from colorama import Fore
+
+from core.LibraryCatalog import get_library_catalog
+from core.ProjectContext import ProjectContext
+
+
+class RepoPrefetcher:
+    """在后台线程池中预先克隆或更新库的仓库"""
+
+    def __init__(self, fetch_repo, workers=4, per_host=2):
+        """
+        参数:
+            fetch_repo: 仓库获取函数 fetch_repo(ctx)，克隆或更新ctx对应的仓库
+            workers: 同时获取的仓库数量
+            per_host: 同一主机同时获取的仓库数量上限
+        """
+        self.fetch_repo = fetch_repo
+        self.workers = max(1, int(workers or 1))
+        self.per_host = max(1, int(per_host or 1))
+        self._futures = {}
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+        self._executor = None
+
+    @staticmethod
+    def repo_key(owner, repo):
+        """仓库的去重键"""
+        return owner, repo
+
+    def _host_limit(self, host):
+        with self._host_limits_lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.per_host)
+                self._host_limits[host] = limit
+            return limit
+
+    def _prefetch(self, library_name):
+        ctx = ProjectContext.for_library(library_name)
+        if ctx is None:
+            raise RuntimeError(f"无法获取库 {library_name} 的仓库信息")
+        with self._host_limit(urlparse(ctx.clone_url).hostname):
+            print(Fore.CYAN + f"[预取] 开始: {ctx.owner}/{ctx.repo}" + Fore.RESET)
+            self.fetch_repo(ctx)
+            print(Fore.CYAN + f"[预取] 完成: {ctx.owner}/{ctx.repo}" + Fore.RESET)
+
+    def start(self, libraries):
+        """按库的顺序提交仓库预取任务，每个(owner, name)只提交一次"""
+        catalog = get_library_catalog()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        for library_name in libraries:
+            owner, repo, _ = catalog.get_repo_info(library_name)
+            if not owner or not repo:
+                continue
+            key = self.repo_key(owner, repo)
+            if key not in self._futures:
+                self._futures[key] = self._executor.submit(self._prefetch, library_name)
+        print(f"仓库预取: {len(self._futures)} 个仓库, {self.workers} 个并发, 每个主机最多 {self.per_host} 个")
+
+    def wait(self, ctx):
+        """
+        等待ctx对应的仓库预取完成
+
+        返回:
+            预取成功时返回True；仓库未被预取、预取被取消或失败时返回False（调用方自行获取）
+        """
+        future = self._futures.get(self.repo_key(ctx.owner, ctx.repo))
+        if future is None or future.cancelled():
+            return False
+        try:
+            future.result()
+            return True
+        except Exception as e:
+            traceback.print_exc()
+            print(Fore.YELLOW + f"仓库 {ctx.owner}/{ctx.repo} 预取失败，将重新获取: {str(e)}" + Fore.RESET)
+            return False
+
+    def shutdown(self):
+        """取消尚未开始的预取任务"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 当前运行的预取器，未启用预取时为None
+_prefetcher = None
+
+
+def set_repo_prefetcher(prefetcher):
+    """设置当前运行的预取器，传入None表示关闭预取"""
+    global _prefetcher
+    _prefetcher = prefetcher
+
+
+def get_repo_prefetcher():
+    """获取当前运行的预取器，未启用时返回None"""
+    return _prefetcher
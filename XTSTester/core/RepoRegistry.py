@@ -0,0 +1,64 @@
+"""
+运行内仓库登记模块
+
+按克隆地址记录本次运行中已同步的仓库及其同步后的提交。同一仓库的多个库
+（如openharmony_tpc_samples的各个子目录库）只在第一次时克隆或更新，之后直接
+复用；记录的提交SHA随测试结果写入各报告，标明实际测试的版本。
+
+使用方法:
+    from core.RepoRegistry import get_repo_registry
+    registry = get_repo_registry()
+    if registry.commit(clone_url) is None:
+        ...  # 克隆或更新仓库
+        registry.record(clone_url, resolve_head(repo_dir))
+"""
+import subprocess
+import threading
+
+
+def resolve_head(repo_dir):
+    """返回仓库当前HEAD的提交SHA，无法获取时返回None"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"获取仓库 {repo_dir} 的提交失败: {str(e)}")
+        return None
+    return result.stdout.strip() or None
+
+
+class RepoRegistry:
+    """克隆地址 -> 本次运行中同步后的提交SHA"""
+
+    def __init__(self):
+        self._commits = {}
+        self._lock = threading.Lock()
+
+    def is_synced(self, clone_url):
+        """仓库在本次运行中是否已同步"""
+        with self._lock:
+            return clone_url in self._commits
+
+    def commit(self, clone_url):
+        """返回仓库同步后的提交SHA，未同步或无法获取时返回None"""
+        with self._lock:
+            return self._commits.get(clone_url)
+
+    def record(self, clone_url, commit):
+        """记录仓库已同步到指定提交"""
+        with self._lock:
+            self._commits[clone_url] = commit
+
+    def clear(self):
+        """清空登记，下一次运行重新同步所有仓库"""
+        with self._lock:
+            self._commits.clear()
+
+
+# 进程级登记实例
+_registry = RepoRegistry()
+
+
+def get_repo_registry():
+    """获取进程级的仓库登记"""
+    return _registry
@@ -0,0 +1,149 @@
+"""
+三方库流水线调度模块
+
+将每个库的处理拆分为两个阶段，并在库之间流水线执行:
+1. 准备阶段（prepare）：克隆、配置、ohpm安装和hvigor构建，占用CPU和磁盘
+2. 测试阶段（test）：通过hdc在设备上安装并运行测试，占用设备
+
+两个阶段使用各自的线程池，第N+1个库可以在第N个库于设备上运行测试时完成构建。
+已开始准备但尚未完成测试的库数量有上限，避免构建远远跑在设备前面占满磁盘。
+
+使用方法:
+    from core.Scheduler import LibraryScheduler
+    scheduler = LibraryScheduler(prepare_library, run_library_tests,
+                                 prepare_workers=1, test_workers=1)
+    for library_name, result, error in scheduler.run(libraries):
+        ...
+"""
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore
+
+from reports.TestRunResult import TestRunResult
+
+
+class LibraryScheduler:
+    """按阶段流水线调度多个库的准备和测试"""
+
+    def __init__(self, prepare_stage, test_stage, prepare_workers=1, test_workers=1, max_in_flight=None):
+        """
+        参数:
+            prepare_stage: 准备阶段函数 prepare_stage(library_name)，返回传给测试阶段的状态，
+                           返回TestRunResult时表示该库已有最终结果（如构建失败），不再进入测试阶段
+            test_stage: 测试阶段函数 test_stage(library_name, prepared)，返回测试结果
+            prepare_workers: 准备阶段的并发数
+            test_workers: 测试阶段的并发数（通常等于可用设备数）
+            max_in_flight: 已开始准备但尚未完成测试的库的上限，默认为两个阶段并发数之和
+        """
+        self.prepare_stage = prepare_stage
+        self.test_stage = test_stage
+        self.prepare_workers = max(1, int(prepare_workers or 1))
+        self.test_workers = max(1, int(test_workers or 1))
+        self.max_in_flight = max_in_flight or (self.prepare_workers + self.test_workers)
+        self.skipped = []
+        self._stop_event = threading.Event()
+        self._should_stop = None
+
+    def stop(self):
+        """停止调度：不再开始新的库，正在执行的阶段会运行完成"""
+        self._stop_event.set()
+
+    def _is_stopped(self):
+        if self._should_stop is not None and self._should_stop():
+            self._stop_event.set()
+        return self._stop_event.is_set()
+
+    def run(self, libraries, should_stop=None):
+        """
+        调度库列表，按完成顺序产出(库名, 结果, 异常)
+
+        参数:
+            libraries: 按优先顺序排列的库名列表
+            should_stop: 可选的回调，返回True时停止调度剩余的库
+
+        被停止而未执行的库记录在self.skipped中，不会产出。
+        """
+        libraries = list(libraries)
+        self.skipped = []
+        self._should_stop = should_stop
+        self._stop_event.clear()
+        if not libraries:
+            return
+
+        completed = queue.Queue()
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        prepare_pool = ThreadPoolExecutor(max_workers=self.prepare_workers, thread_name_prefix="prepare")
+        test_pool = ThreadPoolExecutor(max_workers=self.test_workers, thread_name_prefix="test")
+
+        def finish(library_name, result=None, error=None, skipped=False):
+            in_flight.release()
+            completed.put((library_name, result, error, skipped))
+
+        def test_task(library_name, prepared):
+            if self._is_stopped():
+                finish(library_name, skipped=True)
+                return
+            print(Fore.CYAN + f"[测试阶段] 开始: {library_name}" + Fore.RESET)
+            try:
+                result = self.test_stage(library_name, prepared)
+            except Exception as e:
+                traceback.print_exc()
+                finish(library_name, error=e)
+                return
+            finish(library_name, result)
+
+        def prepare_task(library_name):
+            if self._is_stopped():
+                finish(library_name, skipped=True)
+                return
+            print(Fore.CYAN + f"[准备阶段] 开始: {library_name}" + Fore.RESET)
+            try:
+                prepared = self.prepare_stage(library_name)
+            except Exception as e:
+                traceback.print_exc()
+                finish(library_name, error=e)
+                return
+            if isinstance(prepared, TestRunResult):
+                finish(library_name, prepared)
+                return
+            print(Fore.CYAN + f"[准备阶段] 完成，等待设备: {library_name}" + Fore.RESET)
+            try:
+                test_pool.submit(test_task, library_name, prepared)
+            except RuntimeError:
+                # 调度已提前结束，测试线程池已关闭
+                finish(library_name, skipped=True)
+
+        def feed():
+            # 按顺序提交准备任务，在途库数量达到上限时等待
+            for library_name in libraries:
+                while not in_flight.acquire(timeout=0.5):
+                    if self._is_stopped():
+                        break
+                else:
+                    prepare_pool.submit(prepare_task, library_name)
+                    continue
+                completed.put((library_name, None, None, True))
+
+        feeder = threading.Thread(target=feed, name="scheduler-feed", daemon=True)
+        feeder.start()
+
+        try:
+            for _ in range(len(libraries)):
+                library_name, result, error, skipped = completed.get()
+                if skipped:
+                    self.skipped.append(library_name)
+                    continue
+                yield library_name, result, error
+        finally:
+            # 正常结束时所有任务均已完成；提前退出（如中断）时取消尚未开始的任务
+            self._stop_event.set()
+            feeder.join()
+            prepare_pool.shutdown(wait=False, cancel_futures=True)
+            test_pool.shutdown(wait=False, cancel_futures=True)
+
+        # 保持跳过的库与输入顺序一致
+        order = {library_name: idx for idx, library_name in enumerate(libraries)}
+        self.skipped.sort(key=lambda library_name: order[library_name])
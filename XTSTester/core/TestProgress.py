@@ -0,0 +1,163 @@
+"""
+aa test流式执行进度模块
+
+`aa test`的输出逐行交给TestOutputParser增量解析，解析器产生的进度事件
+（测试类开始、测试方法开始/结束）打印到控制台并发布给注册的回调（如Web界面）。
+运行期间按以下条件提前终止aa test:
+- 当前测试类运行时间超过时间预算（按历史耗时计算，见core.TestTimeouts；没有历史时为
+  AA_TEST_CLASS_TIME_BUDGET）
+- hdc输出设备断开连接的提示
+
+提前终止后保留已经解析出的结果：超时的测试类中正在运行的测试标记为error，
+还没有开始运行的测试类各记录一条error（未运行），结果标记为aborted（不作为该提交的
+有效测试结果）；设备断开时额外记录一条ErrorTestClass错误。
+
+使用方法:
+    from core.TestProgress import TestProgressMonitor
+    monitor = TestProgressMonitor("commonmark", serial, test_names=test_names)
+    try:
+        run_command(cmd, "aa test", "commonmark", on_line=monitor.feed, should_abort=monitor.check)
+    except CommandAborted as e:
+        monitor.mark_aborted(e.reason)
+    run_result = monitor.get_run_result()
+"""
+import threading
+import time
+
+from colorama import Fore
+
+from reports.ExtractTestDetails import TestOutputParser
+from reports.TestRunResult import ABORTED_TEST_NAME
+from utils.config import AA_TEST_CLASS_TIME_BUDGET
+
+# hdc在设备断开连接时输出的提示
+DEVICE_DISCONNECTED_MARKERS = (
+    "[Fail]Device not founded or connected",
+    "[Fail]ExecuteCommand need connect-key",
+    "device offline",
+    "Device is offline",
+)
+
+# 进度事件回调
+_progress_callbacks = []
+_progress_callbacks_lock = threading.Lock()
+
+
+def register_progress_callback(callback):
+    """
+    注册测试进度回调callback(library, event, data)
+
+    event为class_started、test_started、test_finished或aborted，
+    回调在读取aa test输出的线程中调用，应尽快返回。
+    """
+    with _progress_callbacks_lock:
+        if callback not in _progress_callbacks:
+            _progress_callbacks.append(callback)
+
+
+def unregister_progress_callback(callback):
+    """取消注册测试进度回调"""
+    with _progress_callbacks_lock:
+        if callback in _progress_callbacks:
+            _progress_callbacks.remove(callback)
+
+
+class TestProgressMonitor:
+    """一次aa test运行的流式解析、进度发布和提前终止判断"""
+
+    def __init__(self, library, serial=None, class_budget=AA_TEST_CLASS_TIME_BUDGET, class_budgets=None,
+                 test_names=None):
+        """
+        参数:
+            library: 库名
+            serial: 运行测试的设备序列号（仅用于显示）
+            class_budget: 单个测试类的时间预算（秒），0表示不限制
+            class_budgets: 按测试类指定的时间预算（秒），不在其中的测试类使用class_budget
+            test_names: 本次要运行的测试类名列表，提前终止时没有开始运行的测试类记为error
+        """
+        self.library = library
+        self.test_names = list(test_names or [])
+        self.serial = serial
+        self.class_budget = class_budget
+        self.class_budgets = class_budgets or {}
+        self.parser = TestOutputParser(library, listener=self._on_event)
+        self.abort_reason = None
+        self.device_disconnected = False
+        self._current_class = None
+        self._current_budget = class_budget
+        self._class_started_at = None
+
+    # ---------- 输入 ----------
+
+    def feed(self, line):
+        """喂入一行aa test输出（作为run_command的on_line）"""
+        if any(marker in line for marker in DEVICE_DISCONNECTED_MARKERS):
+            self.device_disconnected = True
+            self.abort_reason = self.abort_reason or f"设备 {self.serial or '默认设备'} 断开连接: {line.strip()}"
+        self.parser.feed(line)
+
+    def check(self):
+        """返回需要提前终止的原因，否则返回None（作为run_command的should_abort）"""
+        if self.abort_reason:
+            return self.abort_reason
+        if self._current_budget and self._class_started_at is not None:
+            elapsed = time.time() - self._class_started_at
+            if elapsed > self._current_budget:
+                self.abort_reason = f"测试类 {self._current_class} 运行超过时间预算 ({self._current_budget}秒)"
+        return self.abort_reason
+
+    # ---------- 进度事件 ----------
+
+    def _on_event(self, event, data):
+        if event == "class_started":
+            self._current_class = data["test_class"]
+            self._current_budget = self.class_budgets.get(self._current_class, self.class_budget)
+            self._class_started_at = time.time()
+            print(f"[{self.library}] 开始测试类 {self._current_class}")
+        elif event == "test_finished":
+            color = Fore.GREEN if data["status"] == "passed" else Fore.RED
+            print(color + f"[{self.library}] {data['status'].upper()} {data['test_class']}.{data['test']} "
+                          f"({data['time_ms']}ms)" + Fore.RESET)
+        self._publish(event, data)
+
+    def _publish(self, event, data):
+        with _progress_callbacks_lock:
+            callbacks = list(_progress_callbacks)
+        for callback in callbacks:
+            try:
+                callback(self.library, event, data)
+            except Exception as e:
+                print(f"执行测试进度回调时出错: {str(e)}")
+
+    # ---------- 结果 ----------
+
+    def mark_aborted(self, reason):
+        """
+        记录提前终止：当前正在运行的测试和没有开始运行的测试类标记为error，结果标记为aborted；
+        设备断开时额外记录ErrorTestClass错误
+        """
+        self.parser.close()
+        run_result = self.parser.run_result
+        run_result.aborted = reason
+        test_class = self.parser.current_class
+        test = self.parser.current_test
+        if test_class is not None and (test is None or test.status == "unknown"):
+            test = test or test_class.get_or_add_test(ABORTED_TEST_NAME)
+            test.status = "error"
+            test.error_message = reason
+        for class_name in self.test_names:
+            if class_name not in run_result.classes:
+                not_run_test = run_result.get_or_add_class(class_name).get_or_add_test(ABORTED_TEST_NAME)
+                not_run_test.status = "error"
+                not_run_test.error_message = f"未运行: {reason}"
+        if self.device_disconnected or test_class is None:
+            error_test = run_result.get_or_add_class("ErrorTestClass").get_or_add_test("errorTest")
+            error_test.status = "error"
+            error_test.error_message = reason
+        print(Fore.RED + f"[{self.library}] aa test已提前终止: {reason}" + Fore.RESET)
+        self._publish("aborted", {"reason": reason})
+
+    def get_run_result(self):
+        """结束输入并返回已解析的TestRunResult"""
+        self.parser.close()
+        return self.parser.get_run_result()
@@ -0,0 +1,52 @@
+"""
+测试类分片模块
+
+将一个库的测试类按历史耗时（TestJson中记录的class_times）划分为多个分片，
+每个分片在一台设备上运行，用于缩短大型库（如ijkplayer、lottieArkTS）的测试时间。
+
+分片采用最长处理时间优先（LPT）的贪心算法：按耗时从大到小依次把测试类分配给
+当前总耗时最小的分片。没有历史耗时的测试类使用已知耗时的中位数估算。
+
+使用方法:
+    from core.TestSharding import partition_test_classes
+    shards = partition_test_classes(["ClassA", "ClassB", "ClassC"], {"ClassA": 30000}, 2)
+"""
+import heapq
+
+# 没有任何历史耗时时，每个测试类的估算耗时（毫秒）
+DEFAULT_CLASS_TIME_MS = 1000
+
+
+def estimate_class_times(test_names, class_times):
+    """返回每个测试类的估算耗时，缺失的历史记录用已知耗时的中位数补齐"""
+    known = sorted(time_ms for name, time_ms in class_times.items() if name in test_names and time_ms > 0)
+    fallback = known[len(known) // 2] if known else DEFAULT_CLASS_TIME_MS
+    return {name: class_times.get(name) or fallback for name in test_names}
+
+
+def partition_test_classes(test_names, class_times, shard_count):
+    """
+    按历史耗时将测试类划分为最多shard_count个分片
+
+    参数:
+        test_names: 测试类名称列表
+        class_times: 测试类名称到历史耗时（毫秒）的字典
+        shard_count: 分片数
+
+    返回:
+        分片列表，每个分片是测试类名称列表；不会返回空分片
+    """
+    test_names = list(dict.fromkeys(test_names))
+    shard_count = max(1, min(shard_count, len(test_names)))
+    if shard_count == 1:
+        return [test_names] if test_names else []
+
+    estimated = estimate_class_times(test_names, class_times)
+    # (当前总耗时, 分片序号)
+    heap = [(0, index) for index in range(shard_count)]
+    shards = [[] for _ in range(shard_count)]
+    for name in sorted(test_names, key=lambda test_name: (-estimated[test_name], test_name)):
+        load, index = heapq.heappop(heap)
+        shards[index].append(name)
+        heapq.heappush(heap, (load + estimated[name], index))
+    return shards
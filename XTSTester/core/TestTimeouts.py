@@ -0,0 +1,151 @@
+"""
+aa test自适应超时模块
+
+每次aa test运行后记录各测试方法和完整运行的测试类的耗时，每个保留最近
+TEST_TIMING_HISTORY_SIZE个样本，保存在TEST_TIMING_HISTORY_FILE中。测试方法记录通过的
+耗时；因达到用例超时而失败的测试记录本次的超时时间，下一次的超时随之提高。
+运行aa test前按本次要运行的测试类的历史耗时计算:
+- 用例超时（-s timeout）: 各测试类测试方法耗时p99的TEST_TIMEOUT_P99_MULTIPLIER倍中的最大值，
+  限制在[TEST_TIMEOUT_FLOOR_MS, TEST_TIMEOUT_CEILING_MS]内；有测试类没有历史记录、或测试类中
+  有运行过但还没有耗时样本的测试（如新增后一直失败的测试）时，至少为TEST_TIMEOUT_DEFAULT_MS
+- 测试类时间预算: 测试类耗时p99的TEST_TIMEOUT_P99_MULTIPLIER倍，限制在
+  [CLASS_TIME_BUDGET_FLOOR, AA_TEST_CLASS_TIME_BUDGET]内；没有历史记录的测试类使用
+  AA_TEST_CLASS_TIME_BUDGET
+
+其他原因失败和出错的测试不记录耗时，避免失败时的耗时影响正常测试的超时。
+
+使用方法:
+    from core.TestTimeouts import compute_test_timeouts, record_test_timings
+    timeout_ms, class_budgets = compute_test_timeouts("commonmark", test_names)
+    ...  # aa test -s timeout {timeout_ms}，class_budgets传给TestProgressMonitor
+    record_test_timings("commonmark", run_result, timeout_ms)
+"""
+import json
+import os
+import threading
+
+from reports.TestRunResult import ABORTED_TEST_NAME
+from utils.config import (ADAPTIVE_TEST_TIMEOUT, TEST_TIMEOUT_P99_MULTIPLIER, TEST_TIMEOUT_DEFAULT_MS,
+                          TEST_TIMEOUT_FLOOR_MS, TEST_TIMEOUT_CEILING_MS, CLASS_TIME_BUDGET_FLOOR,
+                          AA_TEST_CLASS_TIME_BUDGET, TEST_TIMING_HISTORY_FILE, TEST_TIMING_HISTORY_SIZE)
+from utils.file_lock import FileLock
+from utils.stage_timing import percentile
+
+# 失败测试的耗时达到用例超时的该比例时，认为是因超时失败
+TIMEOUT_HIT_RATIO = 0.9
+
+_state_lock = threading.Lock()
+
+
+def _load_state():
+    if not os.path.exists(TEST_TIMING_HISTORY_FILE):
+        return {}
+    try:
+        with open(TEST_TIMING_HISTORY_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"警告：读取测试耗时历史失败: {str(e)}")
+        return {}
+
+
+def _class_time_sample(test_class):
+    """完整运行的测试类的耗时（毫秒），测试类被提前终止时返回None"""
+    if test_class.suite_time_ms > 0:
+        return test_class.suite_time_ms
+    if test_class.tests and all(test.status in ("passed", "failed") for test in test_class.tests.values()):
+        return test_class.tests_time_ms or None
+    return None
+
+
+def _test_time_sample(test, timeout_ms):
+    """测试方法的耗时样本（毫秒）：通过时为耗时，因超时失败时为超时时间，其他情况返回None"""
+    if test.status == "passed":
+        return test.time_ms or None
+    if test.status in ("failed", "error") and timeout_ms and test.time_ms >= timeout_ms * TIMEOUT_HIT_RATIO:
+        return max(test.time_ms, timeout_ms)
+    return None
+
+
+def record_test_timings(library_name, run_result, timeout_ms=None):
+    """
+    将一次aa test运行的测试方法和测试类耗时追加到历史记录
+
+    参数:
+        library_name: 库名
+        run_result: 本次aa test的TestRunResult
+        timeout_ms: 本次使用的用例超时（毫秒），用于识别因超时失败的测试
+
+    没有耗时样本的测试也登记到历史中，计算超时时该测试类使用TEST_TIMEOUT_DEFAULT_MS。
+    """
+    samples = {}
+    for class_name, test_class in run_result.classes.items():
+        if class_name == "ErrorTestClass":
+            continue
+        test_times = {test.name: _test_time_sample(test, timeout_ms) for test in test_class.tests.values()
+                      if test.name != ABORTED_TEST_NAME and test.status != "unknown"}
+        class_time = _class_time_sample(test_class)
+        if test_times or class_time:
+            samples[class_name] = (test_times, class_time)
+    if not samples:
+        return
+
+    with _state_lock, FileLock(TEST_TIMING_HISTORY_FILE + ".lock"):
+        state = _load_state()
+        library_state = state.setdefault(library_name, {})
+        for class_name, (test_times, class_time) in samples.items():
+            class_state = library_state.setdefault(class_name, {"class": [], "tests": {}})
+            if class_time:
+                class_state["class"] = (class_state["class"] + [class_time])[-TEST_TIMING_HISTORY_SIZE:]
+            for test_name, time_ms in test_times.items():
+                history = class_state["tests"].get(test_name, [])
+                if time_ms:
+                    history = (history + [time_ms])[-TEST_TIMING_HISTORY_SIZE:]
+                class_state["tests"][test_name] = history
+        os.makedirs(os.path.dirname(TEST_TIMING_HISTORY_FILE), exist_ok=True)
+        tmp_file = f"{TEST_TIMING_HISTORY_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, TEST_TIMING_HISTORY_FILE)
+
+
+def _p99(values):
+    return percentile(sorted(values), 99) if values else None
+
+
+def compute_test_timeouts(library_name, test_names):
+    """
+    按历史耗时计算一次aa test的超时
+
+    参数:
+        library_name: 库名
+        test_names: 本次要运行的测试类名列表
+
+    返回:
+        (用例超时毫秒数, {测试类名: 时间预算秒数})，没有历史记录的测试类不在字典中
+    """
+    if not ADAPTIVE_TEST_TIMEOUT:
+        return TEST_TIMEOUT_DEFAULT_MS, {}
+
+    with _state_lock:
+        library_state = _load_state().get(library_name, {})
+
+    timeout_ms = TEST_TIMEOUT_FLOOR_MS
+    class_budgets = {}
+    for class_name in test_names:
+        class_state = library_state.get(class_name) or {}
+        test_histories = class_state.get("tests", {})
+        test_p99 = _p99([time_ms for history in test_histories.values() for time_ms in history])
+        if test_p99 is None or not all(test_histories.values()):
+            timeout_ms = max(timeout_ms, TEST_TIMEOUT_DEFAULT_MS)
+        else:
+            timeout_ms = max(timeout_ms, int(test_p99 * TEST_TIMEOUT_P99_MULTIPLIER))
+
+        class_p99 = _p99(class_state.get("class", []))
+        if class_p99 is not None:
+            budget = max(CLASS_TIME_BUDGET_FLOOR, class_p99 * TEST_TIMEOUT_P99_MULTIPLIER / 1000)
+            if AA_TEST_CLASS_TIME_BUDGET:
+                budget = min(budget, AA_TEST_CLASS_TIME_BUDGET)
+            class_budgets[class_name] = int(budget)
+
+    return min(timeout_ms, TEST_TIMEOUT_CEILING_MS), class_budgets
@@ -9,38 +9,41 @@ import signal
 import sys
 from colorama import init, Fore
 
-from core.BuildAndRun import clone_and_build
+from core.BuildAndRun import prepare_library, run_library_tests, sync_repo
+from core.Scheduler import LibraryScheduler
+from core.CommandRunner import kill_running_commands
+from core.DevicePool import get_device_pool
+from core.LibraryCatalog import get_library_catalog
+from core.RepoPrefetch import RepoPrefetcher, set_repo_prefetcher
+from core.RepoRegistry import get_repo_registry
+from core.ChangeDetection import select_changed_libraries, record_tested_revision
+from parallel.job_queue import LibraryJobQueue
 from reports.GenerateAllureReport import generate_allure_report
 from reports.GenerateHtmlReport import generate_html_report
 from core.ReadExcel import read_libraries_from_excel, parse_git_url
-from reports.ReportGenerator import generate_final_report
+from reports.ReportGenerator import generate_final_report, record_library_result
+from reports.TestRunResult import TestRunResult
+from utils.stage_timing import pop_library_timings
 from utils.config import check_dependencies, PROJECT_DIR, ALLURE_RESULTS_DIR, npm_path, ALLURE_REPORT_DIR, \
-    STATIC_REPORT_DIR, REPORT_ZIP
+    STATIC_REPORT_DIR, REPORT_ZIP, SCHEDULER_PREPARE_WORKERS, SCHEDULER_TEST_WORKERS, REPO_PREFETCH_WORKERS, \
+    REPO_PREFETCH_PER_HOST
 
 # 全局变量，用于控制测试中断
 interrupted = False
-current_process = None  # 添加全局变量存储当前子进程
 
 # 信号处理函数
 def signal_handler(sig, frame):
-    global interrupted, current_process
+    global interrupted
     print(f"\n{Fore.YELLOW}收到中断信号，正在安全停止测试...{Fore.RESET}")
     interrupted = True
     
-    # 强制终止当前正在运行的子进程（如果有）
-    if current_process is not None and hasattr(current_process, 'pid'):
-        try:
-            print(f"{Fore.YELLOW}正在终止当前运行的子进程...{Fore.RESET}")
-            if os.name == 'nt':  # Windows
-                subprocess.run(['taskkill', '/F', '/T', '/PID', str(current_process.pid)],
-                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            else:  # Unix/Linux
-                os.killpg(os.getpgid(current_process.pid), signal.SIGTERM)
-            print(f"{Fore.GREEN}子进程已终止{Fore.RESET}")
-        except Exception as e:
-            print(f"{Fore.RED}终止子进程时出错: {str(e)}{Fore.RESET}")
-    else:
-        print(f"{Fore.YELLOW}当前子进程以非常规方式终止{Fore.RESET}")
+    # 强制终止所有正在运行的子进程树（git、ohpm、hvigor、hdc都通过CommandRunner执行）
+    try:
+        print(f"{Fore.YELLOW}正在终止当前运行的子进程...{Fore.RESET}")
+        killed = kill_running_commands()
+        print(f"{Fore.GREEN}已终止 {killed} 个子进程{Fore.RESET}")
+    except Exception as e:
+        print(f"{Fore.RED}终止子进程时出错: {str(e)}{Fore.RESET}")
 
     # 如果是SIGINT（Ctrl+C），则直接退出程序
     if sig == signal.SIGINT:
@@ -51,15 +54,117 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
+def _library_group(library_name):
+    """返回库所属的仓库组，仅作为报告中的标签"""
+    entry = get_library_catalog().get(library_name)
+    return entry.group if entry else None
+
+
+def _record_library_result(overall_results, library_name, name, test_results):
+    """将一个库的TestRunResult汇总到总体结果中，并生成该库的Allure报告"""
+    # 使用summary中的统计数据
+    summary = test_results.summary()
+    lib_total = summary.get("total", 0)
+    lib_passed = summary.get("passed", 0)
+    lib_failed = summary.get("failed", 0)
+    lib_error = summary.get("error", 0)
+
+    # 更新总体结果
+    overall_results["total"] += lib_total
+    overall_results["passed"] += lib_passed
+    overall_results["failed"] += lib_failed
+    overall_results["error"] += lib_error
+
+    # 判断库的状态
+    if lib_error > 0:
+        lib_status = "error"
+        overall_results["error_libs"] += 1
+    elif lib_failed > 0:
+        lib_status = "failed"
+        overall_results["failed_libs"] += 1
+    elif lib_passed == lib_total and lib_total > 0:
+        lib_status = "passed"
+        overall_results["passed_libs"] += 1
+    else:
+        # 如果没有明确的错误或失败，但通过数小于总数，视为错误
+        lib_status = "error"
+        overall_results["error_libs"] += 1
+
+    # 保存原始库名，用于最终报告显示
+    overall_results["libraries"].append({
+        "name": name,
+        "original_name": library_name,  # 保存Excel中的原始库名
+        "repo_type": _library_group(library_name),  # 仓库组标签
+        "total": lib_total,
+        "passed": lib_passed,
+        "failed": lib_failed,
+        "error": lib_error,
+        "status": lib_status,  # 使用新的状态判断结果
+        "commit": test_results.commit,  # 被测仓库的提交SHA
+        "stage_timings": test_results.stage_timings or {},  # 各阶段耗时（秒）
+        "test_results": test_results.test_results()  # 保存详细的测试结果
+    })
+
+    # 生成该库的Allure报告
+    generate_allure_report(test_results, name)
+
+
+def _record_library_error(overall_results, failed_libraries, library_name, name, error):
+    """为执行出错（或未返回有效结果）的库创建默认的错误结果并汇总"""
+    try:
+        # 如果无法获取name，使用library_name
+        if not name:
+            name = library_name
+
+        # 创建默认的测试结果
+        default_test_results = {
+            "ErrorTestClass": [{
+                "name": "errorTest",
+                "status": "error",  # 出错的库标记为错误
+                "time": "1ms",
+                "error_message": str(error) if error else "未知错误"  # 保存错误信息
+            }]
+        }
+
+        # 生成默认的Allure报告
+        generate_allure_report(default_test_results, name)
+
+        # 更新总体结果
+        overall_results["libraries"].append({
+            "name": name,
+            "original_name": library_name,  # 保存Excel中的原始库名
+            "repo_type": _library_group(library_name),  # 仓库组标签
+            "total": 1,
+            "passed": 0,
+            "failed": 0,
+            "error": 1,  # 标记为错误
+            "status": "error",  # 出错的库标记为错误
+            "stage_timings": pop_library_timings(library_name),  # 出错前各阶段的耗时（秒）
+            "error_message": str(error)  # 记录错误信息
+        })
+        overall_results["total"] += 1
+        overall_results["error"] += 1
+        overall_results["error_libs"] += 1
+
+        # 将库添加到失败列表中
+        failed_libraries.append(library_name)
+
+    except Exception as inner_e:
+        print(f"处理错误结果时发生异常: {str(inner_e)}")
+
+
 def run_all_libraries(repo_type, args, libraries=None, urls=None):
-    global current_process, interrupted
+    global interrupted
     init()  # 初始化颜色输出
-    """按顺序执行Excel中的所有库"""
+    """执行Excel中的所有库（准备和测试阶段流水线调度）"""
     # 检查依赖
     check_dependencies()
     
     # 重置中断标志
     interrupted = False
+
+    # 新的一次运行重新同步所有仓库
+    get_repo_registry().clear()
     
     # 如果没有传入libraries和urls，则从Excel读取
     if libraries is None or urls is None:
@@ -118,204 +223,95 @@ def run_all_libraries(repo_type, args, libraries=None, urls=None):
     # 添加错误列表库
     failed_libraries = []
     
-    # 按顺序执行每个库
-    for idx, library_name in enumerate(libraries, 1):
-        # 检查是否被中断
-        if interrupted:
-            print(f"\n{Fore.YELLOW}测试被用户中断，停止执行剩余库{Fore.RESET}")
-            # 添加中断信息到结果中
-            overall_results["interrupted"] = True
-            overall_results["interrupted_at"] = library_name
-            break
-            
-        test_results = None
-        try:
+    # 过滤掉无法解析出仓库信息的库
+    runnable_libraries = []
+    library_repo_names = {}
+    for library_name in libraries:
+        # 获取库的URL
+        url = urls.get(library_name)
+        if not url:
+            print(f"错误：找不到库 {library_name} 的URL信息")
+            continue
+
+        # 解析URL获取owner、name和sub_dir
+        owner, name, sub_dir = parse_git_url(url)
+
+        if not owner or not name:
+            print(f"错误：无法从URL解析出有效的仓库信息: {url}")
+            continue
+        library_repo_names[library_name] = name
+        runnable_libraries.append(library_name)
+
+    # 只测试有变化的库：上游提交和构建配置都没有变化的库复用上次的测试结果
+    if getattr(args, 'changed_only', False):
+        runnable_libraries, unchanged_results = select_changed_libraries(runnable_libraries)
+        for library_name, cached_result in unchanged_results.items():
+            print(f"库 {library_name} 未变化 (提交 {cached_result.commit[:12]})，复用上次的测试结果")
+            _record_library_result(overall_results, library_name, library_repo_names[library_name], cached_result)
+            record_library_result(cached_result, library_name)
+
+    process_workers = getattr(args, 'workers', None) or 0
+    prefetcher = None
+    if process_workers > 1:
+        # 多进程中央任务队列：空闲的工作进程领取下一个库，仓库组只是标签
+        print(f"库调度: {process_workers} 个工作进程共享中央任务队列")
+        scheduler = LibraryJobQueue(process_workers)
+    else:
+        # 流水线调度：下一个库的克隆和构建与当前库的设备测试同时进行
+        prepare_workers = getattr(args, 'prepare_workers', None) or SCHEDULER_PREPARE_WORKERS
+        # 测试阶段默认每台设备一个并发，设备通过DevicePool租用
+        test_workers = getattr(args, 'test_workers', None) or SCHEDULER_TEST_WORKERS or len(get_device_pool())
+        print(f"库调度: 准备阶段 {prepare_workers} 个并发, 测试阶段 {test_workers} 个并发")
+        scheduler = LibraryScheduler(prepare_library, run_library_tests,
+                                     prepare_workers=prepare_workers, test_workers=test_workers)
+
+        # 预取阶段：提前克隆或更新后续库的仓库，与前面库的构建重叠
+        prefetch_workers = getattr(args, 'prefetch_workers', None) or REPO_PREFETCH_WORKERS
+        if prefetch_workers > 0:
+            prefetcher = RepoPrefetcher(sync_repo, workers=prefetch_workers, per_host=REPO_PREFETCH_PER_HOST)
+            prefetcher.start(runnable_libraries)
+            set_repo_prefetcher(prefetcher)
+
+    try:
+        for idx, (library_name, test_results, error) in enumerate(
+                scheduler.run(runnable_libraries, should_stop=lambda: interrupted), 1):
+            name = library_repo_names[library_name]
             print(f"\n{'='*50}")
-            print(f"开始执行第 {idx}/{len(libraries)} 个库: {library_name}")
+            print(f"完成第 {idx}/{len(runnable_libraries)} 个库: {library_name}")
             print(f"{'='*50}")
-            
-            # 获取库的URL
-            url = urls.get(library_name)
-            if not url:
-                print(f"错误：找不到库 {library_name} 的URL信息")
-                continue
-                
-            # 解析URL获取owner、name和sub_dir
-            owner, name, sub_dir = parse_git_url(url)
-            
-            if not owner or not name:
-                print(f"错误：无法从URL解析出有效的仓库信息: {url}")
+
+            if error is not None:
+                print(f"执行库 {library_name} 时出错: {str(error)}")
+                if hasattr(error, 'cmd'):
+                    print(f"- 执行的命令: {error.cmd}")
+                if hasattr(error, 'output'):
+                    print(f"- 命令输出: {error.output.decode('utf-8') if isinstance(error.output, bytes) else error.output}")
+                _record_library_error(overall_results, failed_libraries, library_name, name, error)
                 continue
-            print(f"解析URL得到仓库信息: owner={owner}, name={name}, sub_dir={sub_dir}")
 
-            # 调用clone and build函数并获取测试结果
-            print(f"开始克隆和构建库: {library_name}")
-            try:
-                # 修改为使用全局变量跟踪子进程
-                global current_process
-                current_process = None  # 重置当前进程
-                test_results = clone_and_build(library_name)
-                current_process = None  # 子进程完成后重置
-            except Exception as e:
-                current_process = None  # 确保在异常情况下也重置
-                print(f"克隆和构建时出错: {str(e)}")
-                raise
-            
-            # 确保test_results是字典类型
+            # 统一为TestRunResult（兼容旧版字典结构）
             if isinstance(test_results, dict):
-                # 检查test_results是否包含test_results、summary和class_times键
-                # 这表明它可能是extract_test_details返回的完整字典
-                if "test_results" in test_results and "summary" in test_results:
-                    # 提取实际的测试结果
-                    actual_test_results = test_results["test_results"]
-                    summary = test_results.get("summary", {})
-                    
-                    # 使用summary中的统计数据
-                    lib_total = summary.get("total", 0)
-                    lib_passed = summary.get("passed", 0)
-                    lib_failed = summary.get("failed", 0)
-                    lib_error = summary.get("error", 0)
-                else:
-                    # 原始计算方式
-                    lib_total = sum(len(tests) for key, tests in test_results.items() 
-                                if key != '_statistics' and isinstance(tests, list))
-                    lib_passed = sum(1 for key, tests in test_results.items() 
-                                    if key != '_statistics' and isinstance(tests, list)
-                                    for test in tests if test.get('status') == 'passed')
-                    lib_failed = sum(1 for key, tests in test_results.items() 
-                                    if key != '_statistics' and isinstance(tests, list)
-                                    for test in tests if test.get('status') == 'failed')
-                    lib_error = lib_total - lib_passed - lib_failed
-                
-                # 更新总体结果
-                overall_results["total"] += lib_total
-                overall_results["passed"] += lib_passed
-                overall_results["failed"] += lib_failed
-                overall_results["error"] += lib_error
-                
-                # 判断库的状态
-                if lib_error > 0:
-                    lib_status = "error"
-                    overall_results["error_libs"] += 1
-                elif lib_failed > 0:
-                    lib_status = "failed"
-                    overall_results["failed_libs"] += 1
-                elif lib_passed == lib_total and lib_total > 0:
-                    lib_status = "passed"
-                    overall_results["passed_libs"] += 1
-                else:
-                    # 如果没有明确的错误或失败，但通过数小于总数，视为错误
-                    lib_status = "error"
-                    overall_results["error_libs"] += 1
-                
-                # 保存原始库名，用于最终报告显示
-                overall_results["libraries"].append({
-                    "name": name,
-                    "original_name": library_name,  # 保存Excel中的原始库名
-                    "total": lib_total,
-                    "passed": lib_passed,
-                    "failed": lib_failed,
-                    "error": lib_error,
-                    "status": lib_status,  # 使用新的状态判断结果
-                    "test_results": test_results  # 保存详细的测试结果
-                })
-                
-                # 生成该库的Allure报告
-                generate_allure_report(test_results, name)
-            else:
-                e = None
-                # 如果test_results不是字典，创建一个默认的测试结果
-                default_test_results = {
-                    "ErrorTestClass": [{
-                        "name": "errorTest",
-                        "status": "error",  # 出错的库标记为错误
-                        "time": "1ms",
-                        "error_message": str(e) if e else "未知错误"  # 保存错误信息
-                    }]
-                }
-
-                # 生成默认的Allure报告
-                generate_allure_report(default_test_results, name)
-
-                # 添加一个默认的记录
-                overall_results["libraries"].append({
-                    "name": name,
-                    "original_name": library_name,  # 保存Excel中的原始库名
-                    "total": 1,
-                    "passed": 0,
-                    "failed": 0,
-                    "error": 1,  # 标记为错误
-                    "status": "error",  # 出错的库标记为错误
-                    "error_message": str(e)  # 记录错误信息
-                })
-                overall_results["total"] += 1
-                overall_results["error"] += 1
-                overall_results["error_libs"] += 1
-
-                  # 将库添加到失败列表中
-                failed_libraries.append(library_name)
+                test_results = TestRunResult.from_dict(test_results, library_name)
 
+            if isinstance(test_results, TestRunResult):
+                # 没有生成报告的库（如准备阶段出错）在这里收齐阶段耗时
+                if test_results.stage_timings is None:
+                    test_results.stage_timings = pop_library_timings(library_name)
+                _record_library_result(overall_results, library_name, name, test_results)
+                record_tested_revision(library_name, test_results)
+            else:
+                _record_library_error(overall_results, failed_libraries, library_name, name, None)
                 print(f"警告：库 {name} 未返回有效的测试结果，已创建默认测试结果")
-                
-        except (subprocess.CalledProcessError, OSError, IOError) as e:
-            print(f"执行库 {library_name} 时出错: {str(e)}")
-            print(f"详细错误信息:")
-            print(f"- 当前工作目录: {os.getcwd()}")
-            print(f"- 尝试访问的路径: {os.path.abspath(name)}")
-            if hasattr(e, 'cmd'):
-                print(f"- 执行的命令: {e.cmd}")
-            if hasattr(e, 'output'):
-                print(f"- 命令输出: {e.output.decode('utf-8') if isinstance(e.output, bytes) else e.output}")
-            
-            # 添加错误的库到结果中，并创建默认测试结果
-            try:
-                # 首先检查test_results的类型
-                if isinstance(test_results, int):
-                    print(f"警告：库 {library_name} 返回了无效的测试结果类型(int)")
-                
-                # 获取库的URL和解析信息（如果可能）
-                url = urls.get(library_name, "")
-                owner, name, _ = parse_git_url(url) if url else (None, None, None)
-                
-                # 如果无法获取name，使用library_name
-                if not name:
-                    name = library_name
-                
-                # 创建默认的测试结果
-                default_test_results = {
-                    "ErrorTestClass": [{
-                        "name": "errorTest",
-                        "status": "error",  # 出错的库标记为错误
-                        "time": "1ms",
-                        "error_message": str(e)  # 保存错误信息
-                    }]
-                }
-                
-                # 生成默认的Allure报告
-                generate_allure_report(default_test_results, name)
-                
-                # 更新总体结果
-                overall_results["libraries"].append({
-                    "name": name,
-                    "original_name": library_name,  # 保存Excel中的原始库名
-                    "total": 1,
-                    "passed": 0,
-                    "failed": 0,
-                    "error": 1,  # 标记为错误
-                    "status": "error",  # 出错的库标记为错误
-                    "error_message": str(e)  # 记录错误信息
-                })
-                overall_results["total"] += 1
-                overall_results["error"] += 1
-                overall_results["error_libs"] += 1
-                
-                # 将库添加到失败列表中  
-                failed_libraries.append(library_name)
-                
-            except Exception as inner_e:
-                print(f"处理错误结果时发生异常: {str(inner_e)}")
-            
-            continue
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown()
+            set_repo_prefetcher(None)
+
+    if scheduler.skipped:
+        print(f"\n{Fore.YELLOW}测试被用户中断，停止执行剩余库{Fore.RESET}")
+        # 添加中断信息到结果中
+        overall_results["interrupted"] = True
+        overall_results["interrupted_at"] = scheduler.skipped[0]
     
     
     # 测试完成后，记录失败的库
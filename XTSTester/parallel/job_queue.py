@@ -0,0 +1,189 @@
+"""
+多进程库任务队列模块
+
+所有仓库组的库进入同一个中央任务队列，由N个工作进程按需领取：哪个进程空闲就
+领取下一个库，负载自动均衡，不会出现某个仓库组的库很多、其他进程却早早空闲的情况。
+仓库组只是库的一个标签，用于报告分组以及选择包名和签名配置。
+
+工作进程在进程内完成克隆、构建和测试（不再重新启动run.py），并生成该库的报告；
+测试结果回传给主进程，由主进程统一汇总总体结果和最终报告。设备通过DevicePool的
+跨进程锁在各工作进程之间共享。
+
+使用方法:
+    from parallel.job_queue import LibraryJobQueue
+    job_queue = LibraryJobQueue(workers=4)
+    for library_name, result, error in job_queue.run(libraries):
+        ...
+"""
+import multiprocessing
+import queue
+import subprocess
+import traceback
+from collections import deque
+
+from colorama import Fore
+
+# 主进程等待结果时检查工作进程存活状态的间隔（秒）
+WORKER_CHECK_INTERVAL = 5
+
+
+def _library_worker(worker_id, job_queue, result_queue, settings):
+    """
+    工作进程入口：循环领取库并执行，收到None时退出
+
+    参数:
+        worker_id: 工作进程编号
+        job_queue: 库名任务队列
+        result_queue: 结果队列，依次发送("start", ...)和("done", ...)消息
+        settings: 主进程的运行配置（SDK版本、release模式、测试类分片）
+    """
+    # 工作进程（Windows下为spawn启动）不继承主进程的全局配置，需要重新设置
+    from utils.config import set_sdk_version, set_release_mode, set_test_sharding, set_rerun_failed
+    from reports.ReportGenerator import set_overall_results_collection
+    from reports.ExcelResultWriter import flush_excel_results
+    from core.BuildAndRun import clone_and_build
+    from reports.TestRunResult import TestRunResult
+    from utils.stage_timing import pop_library_timings
+
+    set_sdk_version(settings["sdk_version"])
+    set_release_mode(settings["release_mode"])
+    set_test_sharding(settings["test_sharding"])
+    set_rerun_failed(settings["rerun_failed"])
+    # 总体结果由主进程汇总
+    set_overall_results_collection(False)
+
+    try:
+        while True:
+            library_name = job_queue.get()
+            if library_name is None:
+                break
+
+            result_queue.put(("start", worker_id, library_name))
+            print(f"[worker-{worker_id}] 开始执行库: {library_name}")
+            result, error = None, None
+            try:
+                result = clone_and_build(library_name)
+            except Exception as e:
+                traceback.print_exc()
+                # 只回传可以安全序列化的异常类型
+                error = e if isinstance(e, (subprocess.CalledProcessError, OSError)) else RuntimeError(str(e))
+            # 阶段耗时记录在工作进程中，随结果一起回传
+            stage_timings = pop_library_timings(library_name)
+            if isinstance(result, TestRunResult) and result.stage_timings is None:
+                result.stage_timings = stage_timings
+            result_queue.put(("done", worker_id, library_name, result, error))
+    finally:
+        # multiprocessing子进程退出时不会执行atexit，需要显式写回Excel
+        flush_excel_results()
+
+
+class LibraryJobQueue:
+    """由N个工作进程共享的中央库任务队列"""
+
+    def __init__(self, workers, settings=None):
+        """
+        参数:
+            workers: 工作进程数量
+            settings: 传给工作进程的运行配置，默认取主进程当前的配置
+        """
+        self.workers = max(1, int(workers))
+        self.settings = settings or self.current_settings()
+        self.skipped = []
+
+    @staticmethod
+    def current_settings():
+        """收集主进程当前的运行配置"""
+        from utils import config
+        return {
+            "sdk_version": config.selected_sdk_version,
+            "release_mode": config.get_release_mode(),
+            "test_sharding": config.get_test_sharding(),
+            "rerun_failed": config.get_rerun_failed()
+        }
+
+    def run(self, libraries, should_stop=None):
+        """
+        执行库列表，按完成顺序产出(库名, 结果, 异常)
+
+        参数:
+            libraries: 按优先顺序排列的库名列表
+            should_stop: 可选的回调，返回True时不再分发剩余的库
+
+        未分发的库记录在self.skipped中，不会产出。
+        """
+        from reports.ReportGenerator import record_library_result
+        from reports.TestRunResult import TestRunResult
+
+        pending = deque(libraries)
+        self.skipped = []
+        if not pending:
+            return
+
+        context = multiprocessing.get_context()
+        job_queue = context.Queue()
+        result_queue = context.Queue()
+        workers = {}
+        current_jobs = {}
+        outstanding = 0
+
+        def start_worker(worker_id):
+            process = context.Process(target=_library_worker, name=f"library-worker-{worker_id}",
+                                      args=(worker_id, job_queue, result_queue, self.settings))
+            process.start()
+            workers[worker_id] = process
+
+        def dispatch():
+            # 已分发未完成的库最多为工作进程数的两倍，中断时剩余的库不再分发
+            nonlocal outstanding
+            while pending and outstanding < self.workers * 2:
+                if should_stop is not None and should_stop():
+                    return
+                job_queue.put(pending.popleft())
+                outstanding += 1
+
+        worker_count = min(self.workers, len(pending))
+        print(f"启动 {worker_count} 个工作进程执行 {len(pending)} 个库")
+        for worker_id in range(1, worker_count + 1):
+            start_worker(worker_id)
+        dispatch()
+
+        try:
+            while outstanding:
+                try:
+                    message = result_queue.get(timeout=WORKER_CHECK_INTERVAL)
+                except queue.Empty:
+                    # 工作进程异常退出时，将其正在执行的库记为错误并补充新的工作进程
+                    for worker_id, process in list(workers.items()):
+                        if process.is_alive():
+                            continue
+                        library_name = current_jobs.pop(worker_id, None)
+                        print(Fore.RED + f"工作进程 worker-{worker_id} 异常退出 (exitcode={process.exitcode})" + Fore.RESET)
+                        start_worker(worker_id)
+                        if library_name is not None:
+                            outstanding -= 1
+                            dispatch()
+                            yield library_name, None, RuntimeError(f"工作进程异常退出 (exitcode={process.exitcode})")
+                    continue
+
+                if message[0] == "start":
+                    _, worker_id, library_name = message
+                    current_jobs[worker_id] = library_name
+                    continue
+
+                _, worker_id, library_name, result, error = message
+                current_jobs.pop(worker_id, None)
+                outstanding -= 1
+                dispatch()
+
+                # 工作进程不汇总总体结果，由主进程记录到最终报告
+                if isinstance(result, TestRunResult):
+                    record_library_result(result, library_name)
+                yield library_name, result, error
+        finally:
+            self.skipped = list(pending)
+            for _ in workers:
+                job_queue.put(None)
+            for process in workers.values():
+                process.join(timeout=WORKER_CHECK_INTERVAL)
+                if process.is_alive():
+                    process.terminate()
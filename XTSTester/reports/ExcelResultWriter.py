@@ -0,0 +1,128 @@
+"""
+Excel测试结果批量回写模块
+
+缓存每个库的pass/fail结果，在运行结束时（或按配置的间隔）一次性写回
+三方库测试表，避免每个库都完整加载并保存一次工作簿。多个并行进程的写入
+通过文件锁串行化。
+
+使用方法:
+    from reports.ExcelResultWriter import get_excel_result_writer, flush_excel_results
+    get_excel_result_writer().record("commonmark", "pass")
+    flush_excel_results()
+"""
+import atexit
+import threading
+
+from colorama import Fore
+
+from utils.config import EXCEL_FILE_PATH, EXCEL_FLUSH_INTERVAL
+from utils.file_lock import FileLock
+
+
+class ExcelResultWriter:
+    """缓存测试结果并批量写回Excel"""
+
+    def __init__(self, excel_path=EXCEL_FILE_PATH, flush_interval=EXCEL_FLUSH_INTERVAL):
+        """
+        参数:
+            excel_path: 三方库测试表路径
+            flush_interval: 累积多少个库的结果后自动写回，0表示只在结束时写回
+        """
+        self.excel_path = excel_path
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record(self, library_name, result_value):
+        """记录一个库的测试结果，达到写回间隔时自动写回"""
+        with self._lock:
+            self._pending[library_name] = result_value
+            should_flush = self.flush_interval > 0 and len(self._pending) >= self.flush_interval
+        print(f"已记录 {library_name} 的测试结果: {result_value}")
+        if should_flush:
+            self.flush()
+
+    def pending_count(self):
+        """返回尚未写回的结果数量"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """将缓存的结果一次性写回Excel"""
+        with self._lock:
+            if not self._pending:
+                return True
+            pending = self._pending
+            self._pending = {}
+
+        try:
+            from openpyxl import load_workbook
+
+            with FileLock(self.excel_path + ".lock"):
+                wb = load_workbook(self.excel_path)
+                ws = wb.active
+
+                # 查找测试结果列的索引
+                result_column_index = None
+                for i, cell in enumerate(ws[1]):  # 假设第一行是标题行
+                    if cell.value == "测试结果":
+                        result_column_index = i
+                        break
+
+                if result_column_index is None:
+                    print(Fore.YELLOW + "警告：未找到'测试结果'列，尝试使用第三列" + Fore.RESET)
+                    result_column_index = 2  # 索引从0开始，第三列索引为2
+
+                # 一次性建立库名到行号的索引
+                row_index_by_name = {}
+                for row_index, (library_name,) in enumerate(
+                        ws.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+                    if library_name is not None and library_name not in row_index_by_name:
+                        row_index_by_name[library_name] = row_index
+
+                updated = 0
+                for library_name, result_value in pending.items():
+                    row_index = row_index_by_name.get(library_name)
+                    if row_index is None:
+                        print(Fore.YELLOW + f"警告：Excel中找不到库 {library_name}，跳过写回" + Fore.RESET)
+                        continue
+                    ws.cell(row=row_index, column=result_column_index + 1).value = result_value
+                    updated += 1
+
+                wb.save(self.excel_path)
+
+            print(f"已将 {updated} 个库的测试结果写回Excel文件")
+            return True
+
+        except Exception as e:
+            print(f"更新Excel文件失败: {str(e)}")
+            # 写回失败时保留结果，等待下次写回（不覆盖期间新记录的结果）
+            with self._lock:
+                for library_name, result_value in pending.items():
+                    self._pending.setdefault(library_name, result_value)
+            return False
+
+
+# 进程级写入器实例
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_excel_result_writer():
+    """获取进程级的Excel结果写入器"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ExcelResultWriter()
+        return _writer
+
+
+def flush_excel_results():
+    """写回所有缓存的测试结果"""
+    if _writer is not None:
+        return _writer.flush()
+    return True
+
+
+# 进程退出时确保缓存的结果被写回
+atexit.register(flush_excel_results)
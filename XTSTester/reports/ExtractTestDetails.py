@@ -1,9 +1,202 @@
 import re
 import json
 
-def extract_test_details(output_text):
+from reports.TestRunResult import TestRunResult
+
+# OHOS_REPORT_STATUS行: 键=值（部分键的值可能在下一行单独输出）
+_STATUS_LINE_RE = re.compile(r'OHOS_REPORT_STATUS:\s*([A-Za-z_]+)\s*(=?)(.*)')
+# OHOS_REPORT_STATUS_CODE行: 1表示开始测试，0表示测试通过，-1表示测试失败
+_STATUS_CODE_RE = re.compile(r'OHOS_REPORT_STATUS_CODE:\s*(-?\d+)')
+_LEADING_DIGITS_RE = re.compile(r'(\d+)')
+
+
+class TestOutputParser:
+    """
+    XTS `aa test` 输出的增量解析器
+
+    逐行喂入hdc输出（feed），解析器维护当前测试类/测试方法状态，
+    每个OHOS_REPORT_STATUS键通过一次正则匹配分发到对应的处理函数。
+    解析结果直接写入TestRunResult（run_result），输出结束后调用
+    get_run_result()获取；result()返回与extract_test_details相同结构的字典。
+
+    边读边解析时可以传入listener(event, data)接收进度事件：
+    class_started（测试类开始）、test_started（测试方法开始）、
+    test_finished（测试方法结束，data含status和time_ms）。
+    """
+
+    def __init__(self, library=None, listener=None):
+        self.run_result = TestRunResult(library)
+        self.listener = listener
+        self.current_class = None
+        self.current_test = None
+        # 等待下一行数字的键（taskconsuming / suiteconsuming）
+        self._pending_value_key = None
+        # 等待下一行错误详情的(测试类, 测试方法)
+        self._pending_error = None
+        self._saw_32301 = False
+        self._buffer = ""
+        self._handlers = {
+            "taskconsuming": self._on_task_consuming,
+            "class": self._on_class,
+            "suiteconsuming": self._on_suite_consuming,
+            "test": self._on_test,
+            "consuming": self._on_consuming,
+            "stack": self._on_stack,
+        }
+
+    # ---------- 输入 ----------
+
+    def feed(self, line):
+        """喂入一行输出"""
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+
+        if "32301" in line:
+            self._saw_32301 = True
+
+        # 处理上一行遗留的“值在下一行”的情况
+        if self._pending_value_key:
+            if stripped.isdigit():
+                self._apply_pending_value(int(stripped))
+            self._pending_value_key = None
+
+        if self._pending_error:
+            test = self._pending_error
+            self._pending_error = None
+            if stripped:
+                test.error_stack = f"Error in {test.name},{stripped}"
+
+        match = _STATUS_LINE_RE.search(line)
+        if match:
+            key, has_equal, value = match.group(1), match.group(2), match.group(3).strip()
+            handler = self._handlers.get(key)
+            if handler:
+                handler(value, has_equal)
+                return
+            self._on_other_line(line, stripped)
+            return
+
+        match = _STATUS_CODE_RE.search(line)
+        if match:
+            self._on_status_code(match.group(1))
+            return
+
+        self._on_other_line(line, stripped)
+
+    def feed_chunk(self, chunk):
+        """喂入任意长度的输出片段（可能包含不完整的行）"""
+        self._buffer += chunk
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self.feed(line)
+
+    def feed_text(self, output_text):
+        """喂入完整输出"""
+        for line in output_text.split("\n"):
+            self.feed(line)
+
+    def close(self):
+        """结束输入，处理缓冲区中剩余的不完整行"""
+        if self._buffer:
+            buffered, self._buffer = self._buffer, ""
+            self.feed(buffered)
+        self._pending_value_key = None
+        self._pending_error = None
+
+    # ---------- 各键的处理 ----------
+
+    def _emit(self, event, **data):
+        if self.listener:
+            self.listener(event, data)
+
+    def _apply_pending_value(self, value):
+        if self._pending_value_key == "taskconsuming":
+            self.run_result.task_time_ms = value
+        elif self._pending_value_key == "suiteconsuming" and self.current_class:
+            self.current_class.suite_time_ms = value
+
+    def _on_task_consuming(self, value, has_equal):
+        match = _LEADING_DIGITS_RE.match(value)
+        if has_equal and match:
+            self.run_result.task_time_ms = int(match.group(1))
+        elif not has_equal:
+            self._pending_value_key = "taskconsuming"
+
+    def _on_class(self, value, has_equal):
+        test_class = self.run_result.get_or_add_class(value)
+        # 每个测试方法前都会重复输出class=，只有测试类变化时才是新的测试类开始
+        if test_class is not self.current_class:
+            self._emit("class_started", test_class=value)
+        self.current_class = test_class
+        self.current_test = None
+
+    def _on_suite_consuming(self, value, has_equal):
+        if not self.current_class:
+            return
+        match = _LEADING_DIGITS_RE.match(value)
+        if match:
+            self.current_class.suite_time_ms = int(match.group(1))
+        else:
+            self._pending_value_key = "suiteconsuming"
+
+    def _on_test(self, value, has_equal):
+        if not self.current_class:
+            return
+        self.current_test = self.current_class.get_or_add_test(value)
+        self._emit("test_started", test_class=self.current_class.name, test=value)
+
+    def _on_consuming(self, value, has_equal):
+        if not (self.current_class and self.current_test):
+            return
+        match = _LEADING_DIGITS_RE.match(value)
+        if match:
+            self.current_test.time_ms = int(match.group(1))
+
+    def _on_stack(self, value, has_equal):
+        if not (self.current_class and self.current_test):
+            return
+        # 如果已经有错误信息，不覆盖
+        if value and value != "undefined" and not self.current_test.error_stack:
+            self.current_test.error_stack = f"Error in {self.current_test.name},{value}"
+
+    def _on_status_code(self, status_code):
+        if not (self.current_class and self.current_test):
+            return
+        if status_code == "0":
+            self.current_test.status = "passed"
+        elif status_code == "-1":
+            self.current_test.status = "failed"
+        else:
+            return
+        self._emit("test_finished", test_class=self.current_class.name, test=self.current_test.name,
+                   status=self.current_test.status, time_ms=self.current_test.time_ms)
+
+    def _on_other_line(self, line, stripped):
+        # 检查是否包含错误信息，错误详情在下一行
+        test = self.current_test
+        if self.current_class and test and "Error in" in line and test.name in line:
+            test.error_stack = stripped
+            test.status = "failed"
+            self._pending_error = test
+
+    # ---------- 输出 ----------
+
+    def get_run_result(self):
+        """返回当前已解析的TestRunResult"""
+        run_result = self.run_result
+        if run_result.total_time_ms() == 0 and self._saw_32301:
+            run_result.task_time_ms = 32301
+        return run_result
+
+    def result(self):
+        """返回当前已解析的测试结果字典（test_results / summary / class_times）"""
+        return self.get_run_result().to_dict()
+
+
+def parse_test_output(output_text, library=None):
     """
-    从XTS测试输出中提取测试详情
+    解析完整的XTS测试输出，返回TestRunResult
     """
     # 确保输入是字符串
     if not isinstance(output_text, str):
@@ -11,195 +204,18 @@ def extract_test_details(output_text):
             output_text = str(output_text[0])
         else:
             output_text = str(output_text) if output_text is not None else ""
-    
-    # 初始化结果和摘要
-    test_results = {}
-    summary = {
-        "total": 0,
-        "passed": 0,
-        "failed": 0,
-        "error": 0,
-        "ignored": 0,
-        "total_time_ms": 0
-    }
-    
-    # 解析每个测试类和测试方法的详细信息
-    lines = output_text.split('\n')
-    
-    # 首先创建一个结构化的JSON对象来存储所有测试信息
-    test_data = {
-        "task_consuming": 0,  # 确保初始化为0
-        "classes": {}
-    }
-    
-    current_class = None
-    current_test = None
-    
-    # 第一遍扫描：收集所有测试类和测试方法
-    for i, line in enumerate(lines):
-        # 提取任务总耗时
-        if "OHOS_REPORT_STATUS: taskconsuming=" in line:
-            try:
-                task_consuming = int(line.split("taskconsuming=")[1].strip())
-                test_data["task_consuming"] = task_consuming
-            except ValueError:
-                pass
-        # 这里添加对不带等号的taskconsuming的处理
-        elif "OHOS_REPORT_STATUS: taskconsuming" in line:
-            try:
-                # 查找下一行是否包含数字
-                if i+1 < len(lines) and lines[i+1].strip().isdigit():
-                    task_consuming = int(lines[i+1].strip())
-                    test_data["task_consuming"] = task_consuming
-            except ValueError:
-                pass
-        
-        # 提取测试类
-        elif "OHOS_REPORT_STATUS: class=" in line:
-            class_name = line.split("class=")[1].strip()
-            if class_name not in test_data["classes"]:
-                test_data["classes"][class_name] = {
-                    "suite_consuming": 0,
-                    "tests": {}
-                }
-            current_class = class_name
-            current_test = None
-        
-        # 提取测试类耗时 - 统一处理所有格式
-        elif current_class and "OHOS_REPORT_STATUS: suiteconsuming" in line:
-            try:
-                # 尝试提取数字 - 支持多种格式
-                match = re.search(r'suiteconsuming=?(\d+)', line)
-                if match:
-                    suite_consuming = int(match.group(1))
-                    test_data["classes"][current_class]["suite_consuming"] = suite_consuming
-                    print(f"找到测试类 {current_class} 的耗时: {suite_consuming}ms")
-                # 如果没有在当前行找到，检查下一行
-                elif i+1 < len(lines) and lines[i+1].strip().isdigit():
-                    suite_consuming = int(lines[i+1].strip())
-                    test_data["classes"][current_class]["suite_consuming"] = suite_consuming
-                    print(f"找到测试类 {current_class} 的耗时(下一行): {suite_consuming}ms")
-            except ValueError:
-                pass
-        
-        # 提取测试方法
-        elif current_class and "OHOS_REPORT_STATUS: test=" in line:
-            test_name = line.split("test=")[1].strip()
-            if test_name not in test_data["classes"][current_class]["tests"]:
-                test_data["classes"][current_class]["tests"][test_name] = {
-                    "status": "unknown",
-                    "consuming": 0,
-                    "error": None
-                }
-            current_test = test_name
-        
-        # 提取测试状态码
-        elif current_class and current_test and "OHOS_REPORT_STATUS_CODE:" in line:
-            status_code = line.split("OHOS_REPORT_STATUS_CODE:")[1].strip()
-            # 状态码1表示开始测试，0表示测试通过，-1表示测试失败
-            if status_code == "0":
-                test_data["classes"][current_class]["tests"][current_test]["status"] = "passed"
-            elif status_code == "-1":
-                test_data["classes"][current_class]["tests"][current_test]["status"] = "failed"
-        
-        # 提取测试耗时
-        elif current_class and current_test and "OHOS_REPORT_STATUS: consuming=" in line:
-            try:
-                consuming = int(line.split("consuming=")[1].strip())
-                test_data["classes"][current_class]["tests"][current_test]["consuming"] = consuming
-            except ValueError:
-                pass
-        
-        # 提取错误信息
-        elif current_class and current_test:
-            # 检查是否包含错误信息
-            if "Error in" in line and current_test in line:
-                error_msg = line.strip()
-                # 获取下一行作为错误详情
-                error_detail = lines[i+1].strip() if i+1 < len(lines) else ""
-                if error_detail:
-                    error_msg = f"Error in {current_test},{error_detail}"
-                test_data["classes"][current_class]["tests"][current_test]["error"] = error_msg
-                test_data["classes"][current_class]["tests"][current_test]["status"] = "failed"
-            
-            # 检查是否包含stack信息
-            elif "OHOS_REPORT_STATUS: stack=" in line:
-                stack = line.split("stack=")[1].strip()
-                if stack and stack != "undefined":
-                    # 如果已经有错误信息，不覆盖
-                    if not test_data["classes"][current_class]["tests"][current_test]["error"]:
-                        test_data["classes"][current_class]["tests"][current_test]["error"] = f"Error in {current_test},{stack}"
-    
-    # 将JSON对象转换为测试结果格式
-    for class_name, class_data in test_data["classes"].items():
-        test_results[class_name] = []
-        for test_name, test_data in class_data["tests"].items():
-            test_info = {
-                "name": test_name,
-                "status": test_data["status"],
-                "time": f"{max(1, test_data['consuming'])}ms",
-                "time_ms": test_data["consuming"]
-            }
-            if test_data["error"]:
-                test_info["error_stack"] = test_data["error"]
-            test_results[class_name].append(test_info)
-    
-    # 计算总测试数和通过数
-    total_tests = sum(len(tests) for tests in test_results.values())
-    passed_tests = sum(1 for cls in test_results.values() for test in cls if test.get('status') == 'passed')
-    failed_tests = total_tests - passed_tests
-    
-    # 更新摘要信息
-    summary["total"] = total_tests
-    summary["passed"] = passed_tests
-    summary["failed"] = failed_tests
-    
-    # 修复这一行，使用get方法安全地获取task_consuming，如果不存在则返回0
-    total_time = test_data.get("task_consuming", 0)
-    if total_time == 0:
-        # 如果没有找到任务总耗时，则使用所有测试类耗时的总和
-        # 使用get方法安全地获取classes字典，如果不存在则返回空字典
-        classes = test_data.get("classes", {})
-        total_time = sum(class_data.get("suite_consuming", 0) for class_data in classes.values())
-        
-        # 如果总耗时仍然为0，则使用所有测试方法耗时的总和
-        if total_time == 0:
-            total_time = sum(
-                test_data["time_ms"] 
-                for class_tests in test_results.values() 
-                for test_data in class_tests
-            )
-    
-    # 如果在XTS.txt中找到了32301，则使用这个值
-    if total_time == 0:
-        # 在整个文件中查找32301
-        for line in lines:
-            if "32301" in line:
-                total_time = 32301
-                break
-    
-    summary["total_time_ms"] = total_time
-    
-    # 创建测试类耗时字典，确保从test_data中正确提取suite_consuming值
-    class_times = {}
-    for class_name, class_data in test_data.get("classes", {}).items():
-        suite_consuming = class_data.get("suite_consuming", 0)
-        class_times[class_name] = suite_consuming
-        print(f"测试类 {class_name} 的耗时: {suite_consuming}ms")
-    
-    # 如果测试类耗时都是0，尝试从测试方法耗时计算
-    if all(time == 0 for time in class_times.values()):
-        for class_name, tests in test_results.items():
-            total_class_time = sum(test.get('time_ms', 0) for test in tests)
-            class_times[class_name] = total_class_time
-            print(f"计算测试类 {class_name} 的总耗时: {total_class_time}ms")
-
-    # 返回一个统一的字典
-    return {
-        "test_results": test_results,
-        "summary": summary,
-        "class_times": class_times
-    }
+
+    parser = TestOutputParser(library)
+    parser.feed_text(output_text)
+    parser.close()
+    return parser.get_run_result()
+
+
+def extract_test_details(output_text):
+    """
+    从XTS测试输出中提取测试详情（单次扫描，见TestOutputParser）
+    """
+    return parse_test_output(output_text).to_dict()
 
 def display_test_details(test_results, summary, class_times):
     """
@@ -4,6 +4,7 @@ import time
 import uuid
 
 from utils.config import ALLURE_RESULTS_DIR
+from reports.TestRunResult import TestRunResult
 
 
 def generate_allure_report(test_data, library_name):
@@ -12,29 +13,21 @@ def generate_allure_report(test_data, library_name):
         # 确保allure-results目录存在
         os.makedirs(ALLURE_RESULTS_DIR, exist_ok=True)
 
-        # 检查test_data的格式并提取test_results
-        if isinstance(test_data, dict) and "test_results" in test_data:
-            # 如果传入的是extract_test_details返回的完整字典
-            test_results = test_data["test_results"]
-            summary = test_data.get("summary", {})
+        # 统一为TestRunResult（兼容extract_test_details返回的字典或直接传入的test_results）
+        if isinstance(test_data, TestRunResult):
+            run_result = test_data
         else:
-            # 向后兼容：如果直接传入了test_results
-            test_results = test_data
-            summary = {}
-
-        # 确保test_results是字典类型
-        if not isinstance(test_results, dict):
-            print(f"警告：库 {library_name} 的测试结果不是有效的字典格式")
-            # 创建一个空字典作为默认值
-            test_results = {}
+            if not isinstance(test_data, dict):
+                print(f"警告：库 {library_name} 的测试结果不是有效的字典格式")
+            run_result = TestRunResult.from_dict(test_data, library_name)
 
         # 为每个测试生成唯一的UUID
         lib_uuid = str(uuid.uuid4())
 
         # 创建库级别的测试套件结果
-        lib_total = sum(len(tests) for tests in test_results.values())
-        lib_passed = sum(1 for cls in test_results.values() for test in cls if
-                         isinstance(test, dict) and test.get('status') == 'passed')
+        summary = run_result.summary()
+        lib_total = summary["total"]
+        lib_passed = summary["passed"]
         lib_failed = lib_total - lib_passed
 
         # 修改状态判断逻辑：当总测试数为0时，状态应为"unknown"，与HTML报告保持一致
@@ -99,72 +92,60 @@ def generate_allure_report(test_data, library_name):
             return
 
         # 创建Allure结果文件
-        for test_class, tests in test_results.items():
-            # 确保tests是列表类型
-            if not isinstance(tests, list):
-                print(f"警告：库 {library_name} 的测试类 {test_class} 的测试结果不是有效的列表格式")
-                continue  # 跳过无效的测试类
-
-            for test in tests:
-                # 增加类型检查，确保test是字典类型
-                if not isinstance(test, dict):
-                    print(f"警告：库 {library_name} 的测试类 {test_class} 中的测试结果不是有效的字典格式")
-                    continue  # 跳过无效的测试结果
-
-                test_status = test.get('status', 'unknown')
-                test_name = test.get('name', 'unknown')
-
-                # 确保test_time是字符串并处理时间格式
-                test_time_str = test.get('time', '0 ms')
-                if isinstance(test_time_str, str):
-                    test_time_ms = int(test_time_str.replace('ms', '').strip())
-                else:
-                    test_time_ms = 0
-
-                # 生成测试的UUID
-                test_uuid = str(uuid.uuid4())
-
-                # 创建Allure结果文件
-                result_file = os.path.join(ALLURE_RESULTS_DIR, f"{test_uuid}-result.json")
-
-                # 准备测试结果数据
-                test_result = {
-                    "uuid": test_uuid,
-                    "historyId": f"{library_name}.{test_class}.{test_name}",
-                    "name": test_name,
-                    "fullName": f"{library_name}.{test_class}.{test_name}",
-                    "status": test_status,
-                    "stage": "finished",
-                    "start": int(time.time() * 1000),
-                    "stop": int(time.time() * 1000) + test_time_ms,
-                    "labels": [
-                        {"name": "epic", "value": "OpenHarmony TPC"},
-                        {"name": "feature", "value": library_name},
-                        {"name": "story", "value": test_class},
-                        {"name": "suite", "value": library_name},
-                        {"name": "package", "value": library_name},
-                        {"name": "testClass", "value": test_class},
-                        {"name": "testMethod", "value": test_name},
-                        {"name": "parentSuite", "value": "openharmony_tpc_samples" if "openharmony_tpc_samples" in library_name.lower() else ""},
-                        {"name": "severity", "value": test.get('severity', 'normal')}
-                    ],
-                    "description": test.get('description', ''),
-                    "links": [
-                        {"name": "testcase", "url": test.get('testcase_url', '')},
-                        {"name": "issue", "url": test.get('issue_url', '')}
-                    ] if any(key in test for key in ['testcase_url', 'issue_url']) else []
+        for test_class_result, test in run_result.iter_tests():
+            test_class = test_class_result.name
+            test_status = test.status
+            test_name = test.name
+            test_time_ms = test.time_ms
+
+            # 生成测试的UUID
+            test_uuid = str(uuid.uuid4())
+
+            # 创建Allure结果文件
+            result_file = os.path.join(ALLURE_RESULTS_DIR, f"{test_uuid}-result.json")
+
+            # 准备测试结果数据
+            test_result = {
+                "uuid": test_uuid,
+                "historyId": f"{library_name}.{test_class}.{test_name}",
+                "name": test_name,
+                "fullName": f"{library_name}.{test_class}.{test_name}",
+                "status": test_status,
+                "stage": "finished",
+                "start": int(time.time() * 1000),
+                "stop": int(time.time() * 1000) + test_time_ms,
+                "labels": [
+                    {"name": "epic", "value": "OpenHarmony TPC"},
+                    {"name": "feature", "value": library_name},
+                    {"name": "story", "value": test_class},
+                    {"name": "suite", "value": library_name},
+                    {"name": "package", "value": library_name},
+                    {"name": "testClass", "value": test_class},
+                    {"name": "testMethod", "value": test_name},
+                    {"name": "parentSuite", "value": "openharmony_tpc_samples" if "openharmony_tpc_samples" in library_name.lower() else ""},
+                    {"name": "severity", "value": "normal"}
+                ],
+                "description": "",
+                "links": []
+            }
+
+            # 如果测试失败，添加错误信息
+            if test_status == "failed" and test.error_stack:
+                test_result["statusDetails"] = {
+                    "message": test.error_message or '测试失败',
+                    "trace": test.error_stack
                 }
 
-                # 如果测试失败，添加错误信息
-                if test_status == "failed" and 'error_stack' in test:
-                    test_result["statusDetails"] = {
-                        "message": test.get('error_message', '测试失败'),
-                        "trace": test.get('error_stack', '')
-                    }
+            # 重跑后通过的测试标记为flaky，Allure会单独显示
+            if test.attempts > 1:
+                status_details = test_result.setdefault("statusDetails", {})
+                status_details["flaky"] = test.flaky
+                if test.flaky:
+                    status_details.setdefault("message", f"首次运行{test.first_status}，重跑{test.attempts - 1}次后通过")
 
-                # 写入测试结果文件
-                with open(result_file, 'w', encoding='utf-8') as f:
-                    json.dump(test_result, f, ensure_ascii=False, indent=2)  # type: ignore
+            # 写入测试结果文件
+            with open(result_file, 'w', encoding='utf-8') as f:
+                json.dump(test_result, f, ensure_ascii=False, indent=2)  # type: ignore
 
         print(f"已为库 {library_name} 生成Allure报告数据")
 
@@ -8,7 +8,9 @@ import colorama  # 添加彩色输出支持
 colorama.init()
 
 from utils.config import HTML_REPORT_DIR, OVERALL_RESULTS_FILE
-from core.ReadExcel import read_libraries_from_excel, parse_git_url
+from core.ReadExcel import parse_git_url
+from core.LibraryCatalog import get_library_catalog
+from utils.stage_timing import summarize_stage_timings
 
 # 定义彩色输出函数
 def print_error(message):
@@ -44,8 +46,8 @@ def generate_html_report(overall_results):
     try:
         print("生成详细HTML测试报告...")
         
-        # 获取库列表和URL信息
-        libraries, _, urls = read_libraries_from_excel()
+        # 获取库的URL信息
+        urls = get_library_catalog().urls()
         
         # 获取当前时间作为报告时间
         current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
@@ -135,6 +137,8 @@ def generate_library_report(lib, lib_name, url, HTML_REPORT_DIR):
         repo_info = f"{owner}/{repo_name}"
         if sub_dir:
             repo_info += f" (子目录: {sub_dir})"
+        if lib.get("commit"):
+            repo_info += f" @ {lib['commit'][:12]}"
         
         # 生成测试类级别的HTML内容
         test_classes_html = ""
@@ -174,6 +178,11 @@ def generate_library_report(lib, lib_name, url, HTML_REPORT_DIR):
                             test_name = test.get('name', 'unknown')
                             test_status = test.get('status', 'unknown')
                             test_time = test.get('time', '0ms')
+                            # 重跑过的测试同时显示首次运行的状态
+                            test_status_text = test_status
+                            if test.get('attempts', 1) > 1:
+                                rerun_label = 'flaky' if test.get('flaky') else f"{test['attempts']}次运行"
+                                test_status_text = f"{test_status} (首次: {test.get('first_status')}, {rerun_label})"
                             test_status_icon = "✓" if test_status == "passed" else "✗"
                             test_status_class = "passed" if test_status == "passed" else "failed"
                             
@@ -189,7 +198,7 @@ def generate_library_report(lib, lib_name, url, HTML_REPORT_DIR):
                             test_methods_html += f"""
                             <tr class="{test_status_class}">
                                 <td><span class="status-icon">{test_status_icon}</span> {test_name}</td>
-                                <td>{test_status}</td>
+                                <td>{test_status_text}</td>
                                 <td>{test_time}</td>
                             </tr>
                             {error_html}
@@ -550,6 +559,40 @@ def generate_main_report(overall_results, repo_groups, current_time, HTML_REPORT
             
             owner_html += "</div>"
             repo_groups_html += owner_html
+
+        # 各阶段耗时汇总（p50/p95）
+        stage_summary = summarize_stage_timings(
+            [lib.get("stage_timings") for lib in overall_results.get("libraries", [])])
+        stage_timings_html = ""
+        if stage_summary:
+            stage_rows = "".join(f"""
+                    <tr>
+                        <td>{stage}</td>
+                        <td>{stats["count"]}</td>
+                        <td>{stats["p50"]:.2f}</td>
+                        <td>{stats["p95"]:.2f}</td>
+                        <td>{stats["max"]:.2f}</td>
+                        <td>{stats["total"]:.2f}</td>
+                    </tr>""" for stage, stats in stage_summary.items())
+            stage_timings_html = f"""
+    <h2>阶段耗时</h2>
+    <div class="repo">
+        <table>
+            <thead>
+                <tr>
+                    <th>阶段</th>
+                    <th>库数</th>
+                    <th>p50 (秒)</th>
+                    <th>p95 (秒)</th>
+                    <th>最大 (秒)</th>
+                    <th>总计 (秒)</th>
+                </tr>
+            </thead>
+            <tbody>{stage_rows}
+            </tbody>
+        </table>
+    </div>
+"""
         
         # 生成主报告HTML
         main_html = f"""<!DOCTYPE html>
@@ -732,6 +775,7 @@ def generate_main_report(overall_results, repo_groups, current_time, HTML_REPORT
         </div>
     </div>
     
+    {stage_timings_html}
     <h2>测试结果详情</h2>
     {repo_groups_html}
     
@@ -2,11 +2,13 @@ import os
 import time
 import json
 from colorama import Fore
-from openpyxl import load_workbook
 
-from utils.config import REPORT_DIR, EXCEL_FILE_PATH
-from core.ReadExcel import read_libraries_from_excel
-from reports.ExtractTestDetails import extract_test_details, display_test_details
+from utils.config import REPORT_DIR, TEST_JSON_DIR
+from core.LibraryCatalog import get_library_catalog
+from reports.ExtractTestDetails import extract_test_details, display_test_details, parse_test_output
+from reports.TestRunResult import TestRunResult
+from reports.ExcelResultWriter import get_excel_result_writer
+from utils.stage_timing import stage_timer, get_library_timings
 
 
 # 假设这是GenerateTestReport.py中的display_test_tree函数
@@ -23,11 +25,8 @@ def display_test_tree(output):
     display_test_details(test_results, summary, class_times)
 
 def update_excel_result(summary, original_name):
-    """更新Excel文件中的测试结果"""
+    """记录Excel中的测试结果（批量写回，见ExcelResultWriter）"""
     try:
-        wb = load_workbook(EXCEL_FILE_PATH)
-        ws = wb.active
-
         # 判断测试是否全部通过
         # 修改判断逻辑：当总测试数为0时，应该标记为失败
         if summary["total"] == 0:
@@ -40,28 +39,8 @@ def update_excel_result(summary, original_name):
 
         result_value = "pass" if all_passed else "fail"
 
-        # 查找测试结果列的索引
-        result_column_index = None
-        for i, cell in enumerate(ws[1]):  # 假设第一行是标题行
-            if cell.value == "测试结果":
-                result_column_index = i
-                break
-
-        if result_column_index is None:
-            print(Fore.YELLOW + "警告：未找到'测试结果'列，尝试使用第三列" + Fore.RESET)
-            result_column_index = 2  # 索引从0开始，第三列索引为2
-
-        # 更新Excel中的测试结果列
-        for row_index, row in enumerate(ws.iter_rows(min_row=2), start=2):  # 从第二行开始（跳过标题行）
-            # 获取当前行的三方库名称
-            library_name = row[0].value
-            if library_name == original_name:  # 只更新当前测试的三方库结果
-                ws.cell(row=row_index, column=result_column_index + 1).value = result_value
-                print(f"已更新 {library_name} 的测试结果为: {result_value}")
-                break
-
-        wb.save(EXCEL_FILE_PATH)
-        print(f"测试结果已更新到Excel文件")
+        # 缓存结果，由写入器在结束时（或按间隔）统一写回Excel
+        get_excel_result_writer().record(original_name, result_value)
     except Exception as e:
         print(f"更新Excel文件失败: {str(e)}")
 
@@ -92,7 +71,24 @@ def adjust_test_results_to_match_summary(test_results, summary):
             f"警告：解析的测试结果 ({current_passed}/{current_total}) 与摘要 ({summary['passed']}/{summary['total']}) 不一致")
 
 
-def save_test_json(test_results, summary, class_times, component_name):
+def get_test_json_path(component_name):
+    """返回库的测试结果JSON文件路径"""
+    return os.path.join(TEST_JSON_DIR, f"{component_name}_results.json")
+
+def load_class_times(component_name):
+    """读取库上一次运行记录的测试类耗时，没有历史记录时返回空字典"""
+    json_path = get_test_json_path(component_name)
+    if not os.path.exists(json_path):
+        return {}
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {name: int(time_ms) for name, time_ms in (data.get("class_times") or {}).items()}
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print(f"读取历史测试类耗时失败: {str(e)}")
+        return {}
+
+def save_test_json(test_results, summary, class_times, component_name, commit=None):
     """
     将测试结果保存为JSON文件
 
@@ -101,11 +97,10 @@ def save_test_json(test_results, summary, class_times, component_name):
         summary: 测试摘要信息
         class_times: 测试类耗时字典
         component_name: 组件名称
+        commit: 被测仓库的提交SHA
     """
     # 创建TestJson目录（如果不存在）
-    test_json_dir = os.path.join(os.getcwd(), "TestJson")
-    if not os.path.exists(test_json_dir):
-        os.makedirs(test_json_dir)
+    os.makedirs(TEST_JSON_DIR, exist_ok=True)
 
     # 创建一个包含所有信息的字典
     data = {
@@ -115,9 +110,11 @@ def save_test_json(test_results, summary, class_times, component_name):
         # 添加顶层的 total_time_ms 字段
         "total_time_ms": summary.get('total_time_ms', 0)
     }
+    if commit:
+        data["commit"] = commit
 
     # 生成JSON文件名
-    output_file = os.path.join(test_json_dir, f"{component_name}_results.json")
+    output_file = get_test_json_path(component_name)
 
     # 保存为JSON文件
     with open(output_file, "w", encoding="utf-8") as f:
@@ -127,7 +124,7 @@ def save_test_json(test_results, summary, class_times, component_name):
 
 
 def generate_test_report(test_names, output, original_name):
-    """生成HTML格式的测试报告"""
+    """生成HTML格式的测试报告（output为TestRunResult或原始测试输出）"""
     # 从Excel动态获取库名
     try:
         # 确保original_name是字符串
@@ -137,31 +134,34 @@ def generate_test_report(test_names, output, original_name):
         else:
             library_name = str(original_name) if original_name else ""
 
-        # 尝试从Excel获取库名
-        libraries, current_library, _ = read_libraries_from_excel(library_name)
+        # 尝试从三方库目录获取库名
+        catalog = get_library_catalog()
 
-        # 确定组件名 - 如果提供了library_name，使用它，否则使用current_library
-        component_name = library_name if library_name else current_library
+        # 确定组件名 - 如果提供了library_name，使用它，否则使用第一个库
+        component_name = library_name if library_name else catalog.libraries()[0]
 
-        # 如果组件名在libraries列表中，使用它，否则使用原始名称
-        if component_name not in libraries and original_name:
+        # 如果组件名在目录中，使用它，否则使用原始名称
+        if catalog.get(component_name) is None and original_name:
             component_name = original_name
     except Exception as e:
         print(f"获取库名时出错: {str(e)}")
         # 确保component_name是字符串
         component_name = str(original_name) if original_name else "未知库"
 
-    # 解析测试结果
-    extracted_data = extract_test_details(output)
-    test_results = extracted_data["test_results"]
-    summary = extracted_data["summary"]
-    class_times = extracted_data["class_times"]
+    # 使用已解析的测试结果（兼容直接传入原始输出字符串）
+    run_result = output if isinstance(output, TestRunResult) else parse_test_output(output, component_name)
+    summary = run_result.summary()
 
     # 保存测试结果为JSON
-    save_test_json(test_results, summary, class_times, component_name)
+    with stage_timer(component_name, "report json"):
+        save_test_json(run_result.test_results(), summary, run_result.class_times(), component_name,
+                       run_result.commit)
 
     # 更新Excel中的测试结果
-    update_excel_result(summary, component_name)
+    with stage_timer(component_name, "report excel"):
+        update_excel_result(summary, component_name)
+
+    html_start_time = time.time()
 
     # 获取当前时间作为报告时间
     current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
@@ -173,30 +173,35 @@ def generate_test_report(test_names, output, original_name):
     total_skipped = 0  # 如果需要，可以从summary中获取
     total_ignored = summary["ignored"]
 
-    # 计算总执行时间
-    total_time_ms = sum(int(test.get('time', '0 ms').replace('ms', '').strip())
-                        for cls in test_results.values()
-                        for test in cls)
+    # 计算总执行时间（与显示的每个测试耗时保持一致，至少1ms）
+    total_time_ms = sum(max(1, test.time_ms) for _, test in run_result.iter_tests())
     total_time_s = total_time_ms / 1000.0
 
     # 准备测试项目HTML
     test_items = []
     overall_status = 'passed' if total_failed == 0 and summary["error"] == 0 else 'failed'
 
-    for test_class, tests in test_results.items():
+    for test_class, test_class_result in run_result.classes.items():
+        tests = test_class_result.tests.values()
+
         # 检查测试类中是否有任何失败的测试
-        class_passed = all(test.get('status') == 'passed' for test in tests)
-        class_status = 'passed' if class_passed else 'failed'
+        class_status = 'passed' if test_class_result.passed else 'failed'
 
         # 计算测试类的总执行时间
-        class_time_ms = sum(int(test.get('time', '0 ms').replace('ms', '').strip()) for test in tests)
+        class_time_ms = sum(max(1, test.time_ms) for test in tests)
 
         test_html = []
         for test in tests:
-            test_status = test.get('status', 'unknown')
-            test_time = test.get('time', '0ms')
-            test_name = test.get('name', 'unknown')  # 确保获取测试名称
-            error_stack = test.get('error_stack', '')
+            test_status = test.status
+            test_time = test.time
+            test_name = test.name  # 确保获取测试名称
+            error_stack = test.error_stack or ''
+            # 重跑过的测试同时显示首次运行的状态
+            if test.attempts > 1:
+                rerun_label = 'flaky' if test.flaky else f'{test.attempts}次运行'
+                test_status_text = f'{test_status} (首次: {test.first_status}, {rerun_label})'
+            else:
+                test_status_text = test_status
 
             # 添加错误堆栈（如果有）
             error_html = f'<div class="error-stack">{error_stack}</div>' if error_stack else ''
@@ -206,7 +211,7 @@ def generate_test_report(test_names, output, original_name):
                             <li class="level test {test_status}">
                                 <span>
                                     <div class="time">{test_time}</div>
-                                    <div class="status">{test_status}</div>
+                                    <div class="status">{test_status_text}</div>
                                     {test_name}
                                 </span>
                                 {error_html}
@@ -232,6 +237,8 @@ def generate_test_report(test_names, output, original_name):
         status_info += f', <span class="skipped">{total_skipped} skipped</span>'
     if total_ignored > 0:
         status_info += f', <span class="ignored">{total_ignored} ignored</span>'
+    if summary.get("flaky", 0) > 0:
+        status_info += f', <span class="skipped">{summary["flaky"]} flaky</span>'
 
     # 直接在代码中定义HTML模板，而不是从外部文件读取
     # 注意：使用双大括号 {{ 和 }} 来表示CSS中的单大括号
@@ -567,3 +574,5 @@ def generate_test_report(test_names, output, original_name):
         print(f"写入HTML报告文件时出错: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        get_library_timings(component_name).add("report html", time.time() - html_start_time)
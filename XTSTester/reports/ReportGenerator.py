@@ -1,9 +1,13 @@
 import threading
 
-from reports.ExtractTestDetails import extract_test_details
+from reports.ExtractTestDetails import parse_test_output
+from reports.TestRunResult import TestRunResult
 from reports.GenerateTestReport import generate_test_report
 from reports.GenerateAllureReport import generate_allure_report
 from reports.GenerateHtmlReport import generate_html_report, update_overall_results
+from reports.ExcelResultWriter import flush_excel_results
+from core.LibraryCatalog import get_library_catalog
+from utils.stage_timing import stage_timer, pop_library_timings
 
 import sys
 import os
@@ -44,6 +48,17 @@ parallel_completed_count = 0
 parallel_total_count = 0
 parallel_lock = threading.Lock()
 
+# 保护all_libraries_results，调度器的多个测试线程会同时生成报告
+results_lock = threading.Lock()
+
+# 是否在本进程中汇总总体结果；多进程任务队列的工作进程关闭汇总，由主进程统一记录
+collect_overall_results = True
+
+def set_overall_results_collection(enabled):
+    """设置生成报告时是否把库结果汇总到本进程的总体结果中"""
+    global collect_overall_results
+    collect_overall_results = enabled
+
 def set_parallel_mode(is_parallel, total_processes=0):
     """设置是否为并行模式"""
     global is_parallel_mode, parallel_total_count, parallel_completed_count
@@ -64,7 +79,7 @@ def generate_reports(test_names, output, original_name):
 
     参数:
         test_names: 测试用例名称列表
-        output: 测试输出结果
+        output: 解析好的TestRunResult（或原始测试输出）
         original_name: 被测试库的名称
 
     异常:
@@ -74,39 +89,59 @@ def generate_reports(test_names, output, original_name):
         all_libraries_results: 存储所有库的测试结果
     """
     try:
-        global all_libraries_results
-        
-        # 确保output是字符串类型
-        if not isinstance(output, str):
-            print(f"警告：测试输出不是字符串类型 (实际类型: {type(output)})，尝试转换")
-            if isinstance(output, (tuple, list)) and len(output) > 0:
-                output = str(output[0])
-            else:
-                output = str(output) if output is not None else ""
-        
-        # 解析测试结果（只需解析一次）
-        extracted_data = extract_test_details(output)
-        
-        # 从返回的字典中提取各个部分
-        test_results = extracted_data["test_results"]
-        summary = extracted_data["summary"]
-        class_times = extracted_data["class_times"]
+        # 使用已解析的测试结果，兼容直接传入原始输出字符串
+        if isinstance(output, TestRunResult):
+            run_result = output
+        else:
+            if not isinstance(output, str):
+                print(f"警告：测试输出不是字符串类型 (实际类型: {type(output)})，尝试转换")
+            run_result = parse_test_output(output, original_name)
 
         try:
             # 生成HTML详细报告
-            generate_test_report(test_names, output, original_name)  # 使用original_name而不是library_name
+            generate_test_report(test_names, run_result, original_name)  # 使用original_name而不是library_name
         except Exception as html_err:
             print(f"生成HTML报告时出错: {str(html_err)}")
         
         try:
             # 生成Allure报告
-            generate_allure_report(test_results, original_name)  # 使用original_name而不是library_name
+            with stage_timer(original_name, "report allure"):
+                generate_allure_report(run_result, original_name)  # 使用original_name而不是library_name
         except Exception as allure_err:
             print(f"生成Allure报告时出错: {str(allure_err)}")
+
+        # 报告生成是库的最后一个阶段，此时收齐该库的阶段耗时
+        if run_result.stage_timings is None:
+            run_result.stage_timings = pop_library_timings(original_name)
         
         # 更新总体结果
-        lib_status = "passed" if summary["failed"] == 0 and summary["error"] == 0 else "failed"
+        if collect_overall_results:
+            record_library_result(run_result, original_name)
         
+        print(f"\n库 {original_name} 的测试报告已生成")  # 使用original_name而不是library_name
+        
+    except Exception as e:
+        print(f"生成报告时出错: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def record_library_result(run_result, original_name, repo_group=None):
+    """
+    将一个库的测试结果汇总到总体结果中，并更新总体结果文件
+
+    参数:
+        run_result: 库的TestRunResult
+        original_name: Excel中的库名
+        repo_group: 库所属的仓库组（仅作为报告中的标签），默认从三方库目录获取
+    """
+    global all_libraries_results
+    summary = run_result.summary()
+    if repo_group is None:
+        entry = get_library_catalog().get(original_name)
+        repo_group = entry.group if entry else None
+    lib_status = "passed" if summary["failed"] == 0 and summary["error"] == 0 else "failed"
+
+    with results_lock:
         # 添加当前库的结果到全局结果中
         all_libraries_results["total"] += summary["total"]
         all_libraries_results["passed"] += summary["passed"]
@@ -114,33 +149,36 @@ def generate_reports(test_names, output, original_name):
         all_libraries_results["total_libs"] += 1
         if lib_status == "passed":
             all_libraries_results["passed_libs"] += 1
-            
+
         # 添加库的详细信息
-        all_libraries_results["libraries"].append({
+        library_result = {
             "name": original_name,  # 使用original_name而不是library_name
             "passed": summary["passed"],
             "failed": summary["failed"],
             "total": summary["total"],
             "status": lib_status,
-            "test_results": test_results,  # 保存详细的测试结果
+            "test_results": run_result.test_results(),  # 保存详细的测试结果
             "summary": summary  # 保存摘要信息
-        })
-        
+        }
+        if repo_group:
+            library_result["repo_type"] = repo_group
+        if run_result.commit:
+            library_result["commit"] = run_result.commit
+        if run_result.stage_timings:
+            library_result["stage_timings"] = run_result.stage_timings
+        all_libraries_results["libraries"].append(library_result)
+
         # 更新总体结果文件（但不生成最终报告）
         update_overall_results(all_libraries_results)
-        
-        print(f"\n库 {original_name} 的测试报告已生成")  # 使用original_name而不是library_name
-        
-    except Exception as e:
-        print(f"生成报告时出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
 
 def generate_final_report():
     """在所有库测试完成后生成最终的HTML总览报告"""
     try:
         global all_libraries_results
-        
+
+        # 将本次运行缓存的测试结果一次性写回Excel
+        flush_excel_results()
+
         # 在所有库测试完成后生成最终报告并自动打开
         report_path = generate_html_report(all_libraries_results)
         if report_path and os.path.exists(report_path):
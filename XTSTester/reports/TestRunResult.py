@@ -0,0 +1,293 @@
+"""
+测试运行结果模型
+
+TestRunResult（库） -> TestClassResult（测试类） -> TestCaseResult（测试方法）
+
+由TestOutputParser解析一次`aa test`输出后生成，并在HTML、Allure、JSON、Excel
+报告以及overall_results汇总之间传递，避免各环节重复解析原始输出。
+需要旧版字典结构（test_results / summary / class_times）的地方使用to_dict()。
+"""
+
+
+# aa test提前终止时，代表测试类中正在运行或未运行的测试的占位测试名
+ABORTED_TEST_NAME = "abortedTest"
+
+# 首次运行被提前终止、重跑时才运行的测试的first_status
+NOT_RUN_STATUS = "not run"
+
+
+class TestCaseResult:
+    """
+    单个测试方法的结果
+
+    失败后重跑过的测试，status为最后一次的状态，first_status为首次运行的状态
+    （首次运行时没有运行为NOT_RUN_STATUS），attempts为运行次数；首次失败、重跑通过的测试为flaky。
+    """
+    __slots__ = ("name", "status", "time_ms", "error_stack", "error_message", "first_status", "attempts")
+
+    def __init__(self, name, status="unknown", time_ms=0, error_stack=None, error_message=None,
+                 first_status=None, attempts=1):
+        self.name = name
+        self.status = status
+        self.time_ms = time_ms
+        self.error_stack = error_stack
+        self.error_message = error_message
+        self.first_status = first_status
+        self.attempts = attempts
+
+    @property
+    def flaky(self):
+        """首次运行失败、重跑后通过"""
+        return self.status == "passed" and self.first_status not in (None, "passed", NOT_RUN_STATUS)
+
+    @property
+    def time(self):
+        """显示用的耗时字符串，至少为1ms"""
+        return f"{max(1, self.time_ms)}ms"
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "status": self.status,
+            "time": self.time,
+            "time_ms": self.time_ms
+        }
+        if self.error_stack:
+            data["error_stack"] = self.error_stack
+        if self.error_message:
+            data["error_message"] = self.error_message
+        if self.attempts > 1:
+            data["first_status"] = self.first_status
+            data["attempts"] = self.attempts
+            data["flaky"] = self.flaky
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        time_ms = data.get("time_ms")
+        if time_ms is None:
+            try:
+                time_ms = int(str(data.get("time", "0")).replace("ms", "").strip())
+            except ValueError:
+                time_ms = 0
+        return cls(data.get("name", "unknown"), data.get("status", "unknown"), time_ms,
+                   data.get("error_stack"), data.get("error_message"),
+                   data.get("first_status"), data.get("attempts", 1))
+
+
+class TestClassResult:
+    """单个测试类（describe）的结果"""
+    __slots__ = ("name", "suite_time_ms", "tests")
+
+    def __init__(self, name, suite_time_ms=0):
+        self.name = name
+        self.suite_time_ms = suite_time_ms
+        self.tests = {}
+
+    def get_or_add_test(self, test_name):
+        """获取测试方法结果，不存在时创建"""
+        test = self.tests.get(test_name)
+        if test is None:
+            test = TestCaseResult(test_name)
+            self.tests[test_name] = test
+        return test
+
+    @property
+    def tests_time_ms(self):
+        """测试方法耗时之和"""
+        return sum(test.time_ms for test in self.tests.values())
+
+    @property
+    def passed(self):
+        """测试类中的测试是否全部通过"""
+        return all(test.status == "passed" for test in self.tests.values())
+
+
+class TestRunResult:
+    """
+    一个库的完整测试结果
+
+    commit为被测仓库的提交SHA，stage_timings为该库各阶段耗时（秒，见utils.stage_timing），
+    尚未收集时为None。aa test被提前终止时aborted为终止原因，结果不完整，不作为该提交的
+    有效测试结果。
+    """
+    __slots__ = ("library", "classes", "task_time_ms", "commit", "stage_timings", "aborted")
+
+    def __init__(self, library=None, task_time_ms=0, commit=None):
+        self.library = library
+        self.classes = {}
+        self.task_time_ms = task_time_ms
+        self.commit = commit
+        self.stage_timings = None
+        self.aborted = None
+
+    def get_or_add_class(self, class_name):
+        """获取测试类结果，不存在时创建"""
+        test_class = self.classes.get(class_name)
+        if test_class is None:
+            test_class = TestClassResult(class_name)
+            self.classes[class_name] = test_class
+        return test_class
+
+    def iter_tests(self):
+        """遍历所有(测试类, 测试方法)"""
+        for test_class in self.classes.values():
+            for test in test_class.tests.values():
+                yield test_class, test
+
+    # ---------- 统计 ----------
+
+    def class_times(self):
+        """测试类耗时，全部为0时从测试方法耗时计算"""
+        class_times = {name: test_class.suite_time_ms for name, test_class in self.classes.items()}
+        if all(class_time == 0 for class_time in class_times.values()):
+            class_times = {name: test_class.tests_time_ms for name, test_class in self.classes.items()}
+        return class_times
+
+    def total_time_ms(self):
+        """总耗时：优先taskconsuming，其次测试类耗时之和，最后测试方法耗时之和"""
+        if self.task_time_ms:
+            return self.task_time_ms
+        total_time = sum(test_class.suite_time_ms for test_class in self.classes.values())
+        if total_time == 0:
+            total_time = sum(test_class.tests_time_ms for test_class in self.classes.values())
+        return total_time
+
+    def summary(self):
+        """测试摘要，结构与extract_test_details返回的summary一致，flaky为重跑后通过的测试数"""
+        total = passed = error = flaky = 0
+        for _, test in self.iter_tests():
+            total += 1
+            if test.status == "passed":
+                passed += 1
+            elif test.status == "error":
+                error += 1
+            if test.flaky:
+                flaky += 1
+        return {
+            "total": total,
+            "passed": passed,
+            "failed": total - passed - error,
+            "error": error,
+            "ignored": 0,
+            "flaky": flaky,
+            "total_time_ms": self.total_time_ms()
+        }
+
+    # ---------- 失败重跑 ----------
+
+    def failed_classes(self):
+        """有测试未通过的测试类（不含表示库级错误的ErrorTestClass）"""
+        return [name for name, test_class in self.classes.items()
+                if name != "ErrorTestClass" and not test_class.passed]
+
+    def apply_rerun(self, rerun_result):
+        """
+        合并失败测试类的重跑结果
+
+        只更新此前未通过的测试：最终状态取重跑的状态，保留首次运行的状态和错误信息；
+        重跑没有结果的测试（如重跑被提前终止）保持原状态。首次运行被提前终止时没有运行的
+        测试按重跑结果加入（first_status为NOT_RUN_STATUS），测试类有了重跑结果后删除
+        代表未运行测试的ABORTED_TEST_NAME占位测试；重跑完整结束且不再有占位测试时清除aborted。
+        """
+        for class_name, rerun_class in rerun_result.classes.items():
+            test_class = self.classes.get(class_name)
+            if test_class is None:
+                continue
+            placeholder = test_class.tests.get(ABORTED_TEST_NAME)
+            rerun_tests = {test_name: rerun_test for test_name, rerun_test in rerun_class.tests.items()
+                           if rerun_test.status != "unknown"}
+            if placeholder is not None and any(test_name != ABORTED_TEST_NAME for test_name in rerun_tests):
+                del test_class.tests[ABORTED_TEST_NAME]
+                rerun_tests.pop(ABORTED_TEST_NAME, None)
+            for test_name, rerun_test in rerun_tests.items():
+                test = test_class.tests.get(test_name)
+                if test is None:
+                    test_class.tests[test_name] = TestCaseResult(
+                        test_name, rerun_test.status, rerun_test.time_ms, rerun_test.error_stack,
+                        rerun_test.error_message, NOT_RUN_STATUS,
+                        placeholder.attempts + 1 if placeholder is not None else 2)
+                    continue
+                if test.status == "passed":
+                    continue
+                if test.first_status is None:
+                    test.first_status = test.status
+                test.attempts += 1
+                test.status = rerun_test.status
+                test.time_ms = rerun_test.time_ms
+                if rerun_test.status != "passed":
+                    test.error_stack = rerun_test.error_stack or test.error_stack
+                    test.error_message = rerun_test.error_message or test.error_message
+
+        if self.aborted and not rerun_result.aborted and not any(
+                ABORTED_TEST_NAME in test_class.tests for test_class in self.classes.values()):
+            self.aborted = None
+
+    def flaky_tests(self):
+        """重跑后通过的(测试类名, 测试方法名)列表"""
+        return [(test_class.name, test.name) for test_class, test in self.iter_tests() if test.flaky]
+
+    # ---------- 旧版字典结构 ----------
+
+    def test_results(self):
+        """测试类名到测试方法字典列表的映射"""
+        return {name: [test.to_dict() for test in test_class.tests.values()]
+                for name, test_class in self.classes.items()}
+
+    def to_dict(self):
+        return {
+            "test_results": self.test_results(),
+            "summary": self.summary(),
+            "class_times": self.class_times()
+        }
+
+    @classmethod
+    def from_dict(cls, data, library=None):
+        """从旧版字典结构（或仅test_results部分）构建"""
+        if isinstance(data, dict) and "test_results" in data:
+            test_results = data.get("test_results") or {}
+            class_times = data.get("class_times") or {}
+            task_time_ms = (data.get("summary") or {}).get("total_time_ms", 0)
+        else:
+            test_results = data if isinstance(data, dict) else {}
+            class_times = {}
+            task_time_ms = 0
+
+        run_result = cls(library, task_time_ms)
+        for class_name, tests in test_results.items():
+            if not isinstance(tests, list):
+                continue
+            test_class = run_result.get_or_add_class(class_name)
+            test_class.suite_time_ms = class_times.get(class_name, 0)
+            for test in tests:
+                if isinstance(test, dict):
+                    test_case = TestCaseResult.from_dict(test)
+                    test_class.tests[test_case.name] = test_case
+        return run_result
+
+    @classmethod
+    def merge(cls, library, results):
+        """
+        合并同一个库的多个分片结果
+
+        各分片在不同设备上并行运行，总耗时取耗时最长的分片。
+        """
+        merged = cls(library)
+        for run_result in results:
+            merged.commit = merged.commit or run_result.commit
+            merged.aborted = merged.aborted or run_result.aborted
+            for class_name, test_class in run_result.classes.items():
+                merged_class = merged.get_or_add_class(class_name)
+                merged_class.suite_time_ms = max(merged_class.suite_time_ms, test_class.suite_time_ms)
+                merged_class.tests.update(test_class.tests)
+            merged.task_time_ms = max(merged.task_time_ms, run_result.total_time_ms())
+        return merged
+
+    @classmethod
+    def from_error(cls, library, error_message, test_name="errorTest", commit=None):
+        """构建表示库级错误的结果（ErrorTestClass中一个error状态的测试）"""
+        run_result = cls(library, task_time_ms=1, commit=commit)
+        test_class = run_result.get_or_add_class("ErrorTestClass")
+        test_class.suite_time_ms = 1
+        test_class.tests[test_name] = TestCaseResult(test_name, "error", 1, error_message=error_message)
+        return run_result
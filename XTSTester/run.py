@@ -10,9 +10,10 @@ from colorama import init, Fore
 from reports.ReportGenerator import generate_final_report
 from utils.config import EXCEL_FILE_PATH, PROJECT_DIR
 from main import run_all_libraries
-from utils.config import SDK_API_MAPPING, set_sdk_version, set_release_mode
+from utils.config import SDK_API_MAPPING, set_sdk_version, set_release_mode, set_test_sharding, set_rerun_failed
 from parallel.parallel_runner import run_parallel_tests
-from core.ReadExcel import read_libraries_from_excel, filter_library_by_repo_type
+from core.ReadExcel import read_libraries_from_excel
+from core.LibraryCatalog import get_library_catalog
 from ui.web_ui import start_web_ui
 from reports.ReportGenerator import set_parallel_mode
 
@@ -27,15 +28,20 @@ def show_welcome_message():
     print("     示例: python run.py --group openharmony-sig --sdk-version 5.0.4 --release-mode y")
     print("\n  2. 交互模式: 不带参数运行，通过交互方式配置测试")
     print("     示例: python run.py")
-    print("\n  3. 并行模式: 同时测试三个仓库组")
-    print("     示例: python run.py --parallel")
+    print("\n  3. 并行模式: 多个工作进程共享任务队列测试所有仓库组")
+    print("     示例: python run.py --parallel --workers 4")
     print("\n可用参数:")
     print("  --group        指定仓库组 (openharmony-sig, openharmony-tpc, openharmony_tpc_samples)")
     print("  --libs-file    包含库列表的文件路径")
     print("  --output-dir   输出目录")
     print("  --sdk-version  SDK版本，例如5.0.4")
     print("  --release-mode 是否开启release模式编译 (y/n)")
-    print("  --parallel     并行运行三个仓库组")
+    print("  --parallel     多进程并行运行所有仓库组")
+    print("  --workers      并行模式下的工作进程数")
+    print("  --build-workers 同时克隆、配置和构建的库数量")
+    print("  --test-workers  同时在设备上运行测试的库数量（默认每台已连接设备一个）")
+    print("  --shard-tests   将单个库的测试类按历史耗时分片到多台设备上运行")
+    print("  --rerun-failed  失败的测试类在已安装的包上最多重跑N次，重跑通过的测试标记为flaky")
     print(f"{Fore.CYAN}{'='*80}{Fore.RESET}\n")
 
 
@@ -48,8 +54,16 @@ def parse_arguments():
     parser.add_argument('--output-dir', help='输出目录')
     parser.add_argument('--sdk-version', help='SDK版本，例如5.0.4')
     parser.add_argument('--release-mode', choices=['y', 'n'], help='是否开启release模式编译')
-    parser.add_argument('--parallel', action='store_true', help='是否并行运行三个仓库组')
+    parser.add_argument('--parallel', action='store_true', help='是否多进程并行运行所有仓库组')
+    parser.add_argument('--workers', type=int, help='并行模式下共享中央任务队列的工作进程数')
     parser.add_argument('--specific-libraries', action='append', help='指定要测试的特定库名称，可多次使用此参数指定多个库')
+    parser.add_argument('--build-workers', type=int, help='准备阶段（克隆、配置、构建）的并发库数量')
+    parser.add_argument('--prefetch-workers', type=int, help='预取阶段同时克隆或更新的仓库数量')
+    parser.add_argument('--test-workers', type=int, help='测试阶段（设备上运行测试）的并发库数量，默认每台设备一个')
+    parser.add_argument('--changed-only', action='store_true', help='只测试上游提交或构建配置有变化的库，其余库复用上次的测试结果')
+    parser.add_argument('--shard-tests', action='store_true', help='将单个库的测试类按历史耗时分片到多台设备上运行')
+    parser.add_argument('--rerun-failed', type=int, metavar='N',
+                        help='失败的测试类在已安装的包上最多重跑N次，重跑通过的测试标记为flaky')
     return parser.parse_args()
 
 
@@ -179,23 +193,30 @@ def main():
             set_sdk_version(args.sdk_version)
         if hasattr(args, 'release_mode') and args.release_mode:
             set_release_mode(args.release_mode == 'y')
+        if getattr(args, 'shard_tests', False):
+            set_test_sharding(True)
+        if getattr(args, 'rerun_failed', None):
+            set_rerun_failed(args.rerun_failed)
     
-    # 如果指定了并行运行，则启动并行处理
+    # 如果指定了并行运行，则由多进程任务队列执行所有仓库组并生成最终报告
     if args.parallel:
         print("\n启动并行测试模式...\n")
-        # 设置并行模式（3个仓库组）
-        set_parallel_mode(True, 3)
         run_parallel_tests(args)
-    else:
-        # 单进程模式
-        set_parallel_mode(False)
-        print(f"\n开始执行 {args.group} 仓库组的测试...\n")
+        return
+
+    # 单进程模式
+    set_parallel_mode(False)
+    print(f"\n开始执行 {args.group} 仓库组的测试...\n")
 
     # Create args namespace with output_dir and repo_type
     args_namespace = argparse.Namespace(
         output_dir=args.output_dir if hasattr(args, 'output_dir') and args.output_dir else os.path.join(PROJECT_DIR, "results"),
         repo_type=args.group if hasattr(args, 'group') else "default",
-        specific_libraries=args.specific_libraries if hasattr(args, 'specific_libraries') else None
+        specific_libraries=args.specific_libraries if hasattr(args, 'specific_libraries') else None,
+        prepare_workers=getattr(args, 'build_workers', None),
+        test_workers=getattr(args, 'test_workers', None),
+        prefetch_workers=getattr(args, 'prefetch_workers', None),
+        changed_only=getattr(args, 'changed_only', False)
     )
 
     libraries, _, urls = read_libraries_from_excel()
@@ -205,8 +226,7 @@ def main():
         libraries = args.specific_libraries
     # 否则，按仓库类型过滤
     elif hasattr(args, 'group') and args.group and args.group != "auto":
-        libraries = [lib for lib in libraries
-                     if filter_library_by_repo_type(lib, args.group)]
+        libraries = [entry.name for entry in get_library_catalog().by_group(args.group)]
         print(f"过滤后库数量: {len(libraries)}")
 
     # 记录开始时间
@@ -15,7 +15,48 @@ ohpm_path = os.path.join(DEVECO_DIR, r"tools\ohpm\bin\ohpm.bat")
 # 报告相关配置
 PROJECT_DIR = os.getcwd()
 EXCEL_FILE_PATH = os.path.join(PROJECT_DIR, "data", "三方库测试表-UI库.xlsx")
+LIBRARY_CATALOG_CACHE_FILE = os.path.join(PROJECT_DIR, "data", ".cache", "library_catalog.pickle")  # 三方库目录解析缓存
+EXCEL_FLUSH_INTERVAL = 0  # 测试结果累积多少个库后写回Excel，0表示只在运行结束时写回
+SCHEDULER_PREPARE_WORKERS = 1  # 同时克隆、配置和构建的库数量
+SCHEDULER_TEST_WORKERS = 0  # 同时在设备上运行测试的库数量，0表示每台设备一个
+PARALLEL_WORKERS = 3  # 并行模式下共享中央任务队列的工作进程数
+HDC_DEVICE_SERIALS = []  # 用于测试的hdc设备序列号，为空时通过hdc list targets自动发现
+DEVICE_LOCK_DIR = os.path.join(PROJECT_DIR, "data", ".cache", "devices")  # 设备租用的跨进程锁文件目录
+DEVICE_ACQUIRE_TIMEOUT = 2 * 3600  # 测试阶段等待空闲设备的最长时间（秒），超时后该库记为error
+TEST_SHARD_MAX_DEVICES = 0  # 测试类分片时单个库最多使用的设备数，0表示不限制
+INSTALL_IF_CHANGED = True  # 设备上已安装内容相同的签名包时跳过卸载、发送和安装（只清除应用数据）
+FLAKY_TESTS_FILE = os.path.join(PROJECT_DIR, "data", ".cache", "flaky_tests.json")  # 重跑后通过的不稳定测试及其历史统计
+DEVICE_INSTALLS_FILE = os.path.join(PROJECT_DIR, "data", ".cache", "device_installs.json")  # 每台设备上各应用已安装的签名包哈希
+GIT_MIRROR_DIR = os.environ.get("XTS_GIT_MIRROR_DIR", os.path.join(os.path.expanduser("~"), ".xtstester", "git-mirrors"))  # 裸镜像仓库缓存目录，多个XTSTester检出共享
+GIT_MIRROR_REFRESH_INTERVAL = 1800  # 镜像距上次fetch超过该时间（秒）才重新fetch，同一次运行的各工作进程只fetch一次
+REPO_PREFETCH_WORKERS = 4  # 预取阶段同时克隆或更新的仓库数量，0表示关闭预取
+REPO_PREFETCH_PER_HOST = 2  # 预取阶段同一主机（如gitcode.com）同时获取的仓库数量上限
+TESTED_REVISIONS_FILE = os.path.join(PROJECT_DIR, "data", ".cache", "tested_revisions.json")  # 每个库上次测试的提交和构建配置，用于只测试有变化的库
+LS_REMOTE_WORKERS = 16  # 变化检测时同时执行git ls-remote的数量
+OHPM_CACHE_DIR = os.environ.get("XTS_OHPM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".xtstester", "ohpm-cache"))  # 按依赖哈希缓存的oh_modules，多个XTSTester检出共享
+OHPM_CACHE_ENABLED = True  # 依赖声明未变化时从缓存恢复oh_modules，不再执行ohpm install
+OHPM_REGISTRY = "https://ohpm.openharmony.cn/ohpm/"  # ohpm公共registry
+OHPM_REGISTRY_MIRROR = ""  # 本地ohpm registry镜像（如内网ohpm-repo）地址，设置后优先使用，可离线安装
+ARTIFACT_CACHE_DIR = os.environ.get("XTS_ARTIFACT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".xtstester", "artifacts"))  # 按源码和构建配置指纹缓存的签名HAP/HSP
+ARTIFACT_CACHE_ENABLED = True  # 源码和构建配置未变化时直接使用缓存的签名产物，跳过hvigor构建
+HVIGOR_MAX_DAEMONS = 2  # 本机同时存活的hvigor守护进程上限，0表示所有构建使用--no-daemon
+HVIGOR_DAEMON_LOCK_DIR = os.path.join(os.path.expanduser("~"), ".xtstester", "hvigor-daemons")  # 守护进程名额的跨进程锁文件目录
+GIT_SPARSE_CHECKOUT = True  # 带子目录的库（如openharmony_tpc_samples）使用blobless部分克隆并只稀疏检出所需子目录
+COMMAND_LOG_DIR = os.path.join(PROJECT_DIR, "results", "logs")  # 每个库的子进程输出日志（<库名>.log）
+COMMAND_TIMEOUTS = {"git": 1800, "ohpm": 1200, "hvigor": 3600, "hdc": 300, "aa test": 3600}  # 各阶段子进程的超时时间（秒），超时后终止整个进程树
+COMMAND_OUTPUT_TAIL_LINES = 200  # 子进程输出在内存中保留的行数（用于错误信息），完整输出只写入日志
+COMMAND_ECHO_OUTPUT = True  # 是否同时将子进程输出打印到控制台
+AA_TEST_CLASS_TIME_BUDGET = 900  # 单个测试类的运行时间预算（秒），超过后提前终止aa test并保留已完成的结果，0表示不限制
+ADAPTIVE_TEST_TIMEOUT = True  # 按历史耗时为每次aa test计算用例超时（-s timeout）和测试类时间预算，False时使用下面的默认值和AA_TEST_CLASS_TIME_BUDGET
+TEST_TIMEOUT_P99_MULTIPLIER = 3.0  # 用例超时和测试类时间预算为历史耗时p99的倍数
+TEST_TIMEOUT_DEFAULT_MS = 15000  # 没有历史记录的测试类使用的用例超时（毫秒）
+TEST_TIMEOUT_FLOOR_MS = 5000  # 用例超时下限（毫秒）
+TEST_TIMEOUT_CEILING_MS = 120000  # 用例超时上限（毫秒）
+CLASS_TIME_BUDGET_FLOOR = 60  # 按历史计算的测试类时间预算下限（秒），上限为AA_TEST_CLASS_TIME_BUDGET
+TEST_TIMING_HISTORY_FILE = os.path.join(PROJECT_DIR, "data", ".cache", "test_timing_history.json")  # 各库测试方法和测试类的历史耗时
+TEST_TIMING_HISTORY_SIZE = 20  # 每个测试方法/测试类保留的最近耗时样本数
 REPORT_DIR = os.path.join(PROJECT_DIR, "results", "test-reports")  # HTML详细报告
+TEST_JSON_DIR = os.path.join(PROJECT_DIR, "TestJson")  # 每个库的测试结果JSON（含测试类耗时历史）
 ALLURE_RESULTS_DIR = os.path.join(PROJECT_DIR, "results", "allure-results")  # Allure报告
 ALLURE_REPORT_DIR = os.path.join(PROJECT_DIR, "results", "allure-report")
 HTML_REPORT_DIR = os.path.join(PROJECT_DIR, "results", "html-report")  # HTML总览报告
@@ -126,4 +167,29 @@ def set_release_mode(enable):
 
 def get_release_mode():
     """获取是否启用release模式编译"""
-    return enable_release_mode
\ No newline at end of file
+    return enable_release_mode
+
+# 测试类分片模式的全局变量
+enable_test_sharding = False
+def set_test_sharding(enable):
+    """设置是否将单个库的测试类分片到多台设备上运行"""
+    global enable_test_sharding
+    enable_test_sharding = enable
+    print(f"测试类分片已{'启用' if enable else '禁用'}")
+
+def get_test_sharding():
+    """获取是否启用测试类分片"""
+    return enable_test_sharding
+
+# 失败测试类重跑次数的全局变量
+rerun_failed_attempts = 0
+def set_rerun_failed(attempts):
+    """设置失败的测试类在已安装的包上重跑的次数，0表示不重跑"""
+    global rerun_failed_attempts
+    rerun_failed_attempts = max(0, int(attempts or 0))
+    if rerun_failed_attempts:
+        print(f"失败的测试类最多重跑 {rerun_failed_attempts} 次")
+
+def get_rerun_failed():
+    """获取失败测试类的重跑次数"""
+    return rerun_failed_attempts
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+跨进程文件锁
+
+基于O_CREAT|O_EXCL创建锁文件实现，Windows和Linux下均可使用，
+用于串行化多个并行进程对同一文件（如三方库测试表）的写入。
+
+锁文件中记录持有者的进程ID和主机名，持有者是本机已经退出的进程时立即清理残留锁，
+不必等到stale_after。
+
+使用方法:
+    from utils.file_lock import FileLock
+    with FileLock(path + ".lock"):
+        ...
+"""
+import os
+import socket
+import time
+
+
+class FileLockTimeout(Exception):
+    """在指定时间内未能获取文件锁"""
+
+
+def pid_exists(pid):
+    """本机上进程是否仍在运行"""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        # Windows下os.kill会终止进程，通过OpenProcess查询
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            # ERROR_INVALID_PARAMETER表示进程不存在，其他错误（如权限不足）视为存在
+            return kernel32.GetLastError() != 87
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FileLock:
+    """简单的跨进程文件锁，支持with语句"""
+
+    def __init__(self, lock_path, timeout=300, poll_interval=0.2, stale_after=1800):
+        """
+        参数:
+            lock_path: 锁文件路径
+            timeout: 获取锁的超时时间（秒）
+            poll_interval: 重试间隔（秒）
+            stale_after: 锁文件超过该时间（秒）未释放视为残留锁，自动清理（持有进程已退出时立即清理）
+        """
+        self.lock_path = lock_path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._fd = None
+
+    def acquire(self):
+        """获取锁，超时抛出FileLockTimeout"""
+        lock_dir = os.path.dirname(self.lock_path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, f"{os.getpid()} {socket.gethostname()}".encode())
+                return
+            except FileExistsError:
+                if self._remove_if_stale():
+                    # 残留锁已清理，立即重试
+                    continue
+                if time.time() >= deadline:
+                    raise FileLockTimeout(f"获取文件锁超时: {self.lock_path}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+        try:
+            os.close(self._fd)
+        finally:
+            self._fd = None
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+
+    def owner(self):
+        """返回锁文件记录的持有者(进程ID, 主机名)，锁不存在或无法读取时返回None"""
+        try:
+            with open(self.lock_path, "r", encoding="utf-8") as f:
+                content = f.read().split()
+        except OSError:
+            return None
+        if not content or not content[0].isdigit():
+            # 锁文件刚创建、尚未写入进程ID
+            return None
+        return int(content[0]), content[1] if len(content) > 1 else None
+
+    def _owner_exited(self, owner):
+        """锁的持有者是否为本机上已经退出的进程"""
+        if owner is None:
+            return False
+        pid, host = owner
+        if host is not None and host != socket.gethostname():
+            return False
+        return not pid_exists(pid)
+
+    def _remove_if_stale(self):
+        """清理进程异常退出后残留的锁文件，清理后返回True"""
+        try:
+            owner = self.owner()
+            if self._owner_exited(owner):
+                # 删除前确认锁文件没有被其他进程重新获取
+                if self.owner() == owner:
+                    print(f"警告：锁文件 {self.lock_path} 的持有进程 {owner[0]} 已退出，清理残留锁")
+                    os.remove(self.lock_path)
+                    return True
+            elif time.time() - os.path.getmtime(self.lock_path) > self.stale_after:
+                print(f"警告：清理残留的锁文件 {self.lock_path}")
+                os.remove(self.lock_path)
+                return True
+        except OSError:
+            pass
+        return False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
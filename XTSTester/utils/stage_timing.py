@@ -0,0 +1,107 @@
+"""
+分阶段耗时统计
+
+按库记录每个阶段的耗时（秒）：目录查询、克隆/更新、配置改写、ohpm安装、每次hvigor调用、
+hdc卸载/发送/安装、aa test（含流式解析）和各报告生成。同一阶段执行多次（如多个分片各自安装）
+时耗时累加。各阶段可能在不同线程中执行，统计通过库名关联。
+
+耗时随TestRunResult.stage_timings写入每个库的结果和overall_results，
+summarize_stage_timings在HTML总览报告中汇总各阶段的p50/p95。
+
+使用方法:
+    from utils.stage_timing import stage_timer, pop_library_timings
+    with stage_timer("commonmark", "ohpm install"):
+        ...
+    run_result.stage_timings = pop_library_timings("commonmark")
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimings:
+    """一个库各阶段的耗时"""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """累加阶段耗时"""
+        with self._lock:
+            self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds, 3)
+
+    @contextmanager
+    def measure(self, stage):
+        """统计with语句块的耗时（无论成功或失败）"""
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add(stage, time.time() - start_time)
+
+
+# 库名 -> StageTimings
+_library_timings = {}
+_library_timings_lock = threading.Lock()
+
+
+def get_library_timings(library_name):
+    """获取库的耗时统计，不存在时创建"""
+    with _library_timings_lock:
+        timings = _library_timings.get(library_name)
+        if timings is None:
+            timings = StageTimings()
+            _library_timings[library_name] = timings
+        return timings
+
+
+def stage_timer(library_name, stage):
+    """统计库某个阶段耗时的上下文管理器"""
+    return get_library_timings(library_name).measure(stage)
+
+
+def pop_library_timings(library_name):
+    """
+    取出库的阶段耗时字典，之后该库的统计重新开始
+
+    返回的字典与统计对象共享，取出后（如报告生成阶段）记录的耗时仍会写入该字典。
+    """
+    with _library_timings_lock:
+        timings = _library_timings.pop(library_name, None)
+    return timings.stages if timings is not None else {}
+
+
+def percentile(sorted_values, percent):
+    """最近秩法计算百分位数"""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_stage_timings(stage_timings_list):
+    """
+    汇总多个库的阶段耗时
+
+    参数:
+        stage_timings_list: 每个库的阶段耗时字典列表
+
+    返回:
+        阶段名 -> {"count", "total", "p50", "p95", "max"}，按总耗时从大到小排列
+    """
+    values = {}
+    for stage_timings in stage_timings_list:
+        for stage, seconds in (stage_timings or {}).items():
+            values.setdefault(stage, []).append(seconds)
+
+    summary = {}
+    for stage, stage_values in values.items():
+        stage_values.sort()
+        summary[stage] = {
+            "count": len(stage_values),
+            "total": round(sum(stage_values), 3),
+            "p50": percentile(stage_values, 50),
+            "p95": percentile(stage_values, 95),
+            "max": stage_values[-1]
+        }
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total"], reverse=True))